@@ -0,0 +1,653 @@
+"""
+Load test the app with concurrent simulated sessions.
+
+Each simulated session does what a browser would: it loads the page, opens the
+websocket with the initial values of the page's inputs, reports every output as
+visible (including those in dynamic UI), applies the input updates sent by the
+server, and then follows a scenario of input changes: open the Binding tab, toggle
+binding sources, pick regulators and select a row of the main table.
+
+The report gives the latency percentiles of each step, from the input change until
+the session is idle again, and of each output, from the input change until its last
+update. The event loop lag of the server is measured as the time it takes to answer a
+request for a page which does not exist. With ``--serve`` or ``--pid``, the CPU and
+RSS of the server process and its children (the compute pool) are sampled too.
+
+Run from the repo root. To measure offline, record the backend first and then serve
+the app with the replay backend (see the README):
+
+.. code-block:: bash
+
+    TFBPSHINY_BACKEND=replay poetry run python -m benchmarks.load_test \\
+        --serve --sessions 20 --ramp 10
+
+    # or, against an app which is already running
+    poetry run python -m benchmarks.load_test --url http://127.0.0.1:8000 \\
+        --pid <server pid> --sessions 20
+
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlencode, urljoin
+
+import aiohttp
+import numpy as np
+
+# ---- Page parsing ----
+
+
+class PageParser(HTMLParser):
+    """Collect the ids of the outputs in a page, and the initial values of its
+    inputs, as the shiny input bindings would report them."""
+
+    def __init__(self):
+        super().__init__()
+        self.inputs: dict[str, Any] = {}
+        self.outputs: set[str] = set()
+        self._tabset: str | None = None
+        self._group: str | None = None
+        self._select: str | None = None
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        attr = {name: value or "" for name, value in attrs}
+        id = attr.get("id", "")
+        classes = attr.get("class", "").split()
+
+        if id and (
+            tag == "shiny-data-frame"
+            or any(c.startswith("shiny-") and c.endswith("-output") for c in classes)
+        ):
+            self.outputs.add(id)
+        elif tag == "ul" and "shiny-tab-input" in classes:
+            self._tabset = id
+            self.inputs[id] = None
+        elif tag == "a" and self._tabset and "data-value" in attr:
+            if self.inputs[self._tabset] is None or "active" in classes:
+                self.inputs[self._tabset] = attr["data-value"]
+        elif id and (
+            "shiny-input-checkboxgroup" in classes
+            or "shiny-input-radiogroup" in classes
+        ):
+            self._group = id
+            self.inputs[id] = [] if "shiny-input-checkboxgroup" in classes else None
+        elif tag == "input" and attr.get("name") == self._group and self._group:
+            if "checked" in attr:
+                if attr.get("type") == "checkbox":
+                    self.inputs[self._group].append(attr.get("value"))
+                else:
+                    self.inputs[self._group] = attr.get("value")
+        elif tag == "input" and id:
+            input_type = attr.get("type", "text")
+            if input_type == "checkbox":
+                self.inputs[id] = "checked" in attr
+            elif input_type == "number":
+                value = attr.get("value", "")
+                self.inputs[id] = float(value) if value else None
+            elif input_type in ("text", "password", "email", "search"):
+                self.inputs[id] = attr.get("value", "")
+        elif tag == "select" and id:
+            self._select = id
+            self.inputs[id] = [] if "multiple" in attr else None
+        elif tag == "option" and self._select and "selected" in attr:
+            if isinstance(self.inputs[self._select], list):
+                self.inputs[self._select].append(attr.get("value"))
+            else:
+                self.inputs[self._select] = attr.get("value")
+        elif id and ("action-button" in classes or "action-link" in classes):
+            # sent with its type, as the browser does, so that the server does not
+            # treat the initial 0 as a click
+            self.inputs[f"{id}:shiny.action"] = 0
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "select":
+            self._select = None
+        elif tag == "ul":
+            self._tabset = None
+
+
+def parse_page(html: str) -> tuple[dict[str, Any], set[str]]:
+    """
+    Find the inputs and outputs of a page, or of dynamic UI.
+
+    :param html: The HTML
+    :return: The initial values of the inputs, keyed on id, and the output ids
+
+    """
+    parser = PageParser()
+    parser.feed(html)
+    return parser.inputs, parser.outputs
+
+
+# ---- Scenarios ----
+
+
+@dataclass
+class Step:
+    """A step of a scenario. `updates` returns the input values to send."""
+
+    name: str
+    updates: Callable[["SimulatedSession"], Awaitable[dict[str, Any]]]
+
+
+def set_input(name: str, id: str, value: Any) -> Step:
+    async def updates(session: "SimulatedSession") -> dict[str, Any]:
+        return {id: value}
+
+    return Step(name, updates)
+
+
+def pick_choices(name: str, id: str, n: int = 1) -> Step:
+    """Pick `n` random choices of a selectize input which is searched on the
+    server, as if the user typed nothing and clicked on them."""
+
+    async def updates(session: "SimulatedSession") -> dict[str, Any]:
+        choices = await session.selectize_choices(id)
+        if not choices:
+            return {}
+        values = session.random.sample(
+            [choice["value"] for choice in choices], min(n, len(choices))
+        )
+        return {id: values if isinstance(session.inputs.get(id), list) else values[0]}
+
+    return Step(name, updates)
+
+
+def select_rows(name: str, id: str, rows: list[int]) -> Step:
+    return set_input(name, f"{id}_cell_selection", {"type": "row", "rows": rows})
+
+
+SCENARIOS: dict[str, list[Step]] = {
+    "browse": [
+        set_input("open binding tab", "tab", "binding_tab"),
+        set_input(
+            "select 2 binding sources",
+            "binding_tab_ui-selected_sources",
+            ["harbison_chip", "chipexo_pugh_allevents"],
+        ),
+        set_input(
+            "select 3 binding sources",
+            "binding_tab_ui-selected_sources",
+            ["harbison_chip", "chipexo_pugh_allevents", "brent_nf_cc"],
+        ),
+        set_input("open individual tab", "tab", "individual_compare_tab"),
+        pick_choices("pick a regulator", "compare_individual-regulator"),
+        select_rows(
+            "select a main table row",
+            "compare_individual-main_table-main_table-table",
+            [0],
+        ),
+        pick_choices(
+            "compare 2 regulators", "compare_individual-compare_regulators", n=2
+        ),
+    ],
+}
+
+
+# ---- Simulated sessions ----
+
+
+@dataclass
+class SessionResult:
+    step_latencies: dict[str, list[float]] = field(
+        default_factory=lambda: defaultdict(list)
+    )
+    output_latencies: dict[str, list[float]] = field(
+        default_factory=lambda: defaultdict(list)
+    )
+    errors: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    timeouts: int = 0
+    failures: list[str] = field(default_factory=list)
+
+
+class SimulatedSession:
+    """A browser session of the app, driven through the websocket protocol."""
+
+    def __init__(
+        self,
+        http: aiohttp.ClientSession,
+        url: str,
+        result: SessionResult,
+        seed: int = 0,
+        quiet: float = 0.5,
+        timeout: float = 60.0,
+    ):
+        self.http = http
+        self.url = url.rstrip("/") + "/"
+        self.result = result
+        self.random = random.Random(seed)
+        self.quiet = quiet
+        self.timeout = timeout
+        self.inputs: dict[str, Any] = {}
+        self.outputs: set[str] = set()
+        self.selectize_urls: dict[str, str] = {}
+        self._ws: aiohttp.ClientWebSocketResponse | None = None
+        self._reader: asyncio.Task | None = None
+        self._busy = False
+        self._pending: set[str] = set()
+        # the time of the last message which is part of a response, and of the first
+        # message after the last request
+        self._last_message = 0.0
+        self._acknowledged: float | None = None
+        self._updated: dict[str, float] = {}
+
+    async def connect(self) -> None:
+        """Load the page, and open the websocket with every output visible."""
+        async with self.http.get(self.url) as response:
+            response.raise_for_status()
+            inputs, outputs = parse_page(await response.text())
+        self.inputs.update(inputs)
+        self.outputs |= outputs
+        data = {**inputs, **self._visibility(outputs)}
+        self._ws = await self.http.ws_connect(urljoin(self.url, "websocket/"))
+        self._reader = asyncio.create_task(self._read())
+        await self._send("init", data)
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+        if self._ws is not None:
+            await self._ws.close()
+
+    @staticmethod
+    def _visibility(outputs: set[str]) -> dict[str, Any]:
+        return {f".clientdata_output_{id}_hidden": False for id in outputs}
+
+    async def _send(self, method: str, data: dict[str, Any]) -> None:
+        assert self._ws is not None
+        self._last_message = time.monotonic()
+        self._acknowledged = None
+        await self._ws.send_str(json.dumps({"method": method, "data": data}))
+
+    async def _read(self) -> None:
+        assert self._ws is not None
+        async for message in self._ws:
+            if message.type != aiohttp.WSMsgType.TEXT:
+                break
+            now = time.monotonic()
+            if self._acknowledged is None:
+                self._acknowledged = now
+            data = json.loads(message.data)
+            # every session is sent an empty "values" message whenever any session
+            # flushes, so those are not part of a response
+            if any(data.values()):
+                self._last_message = now
+            updates = self._handle(data)
+            if updates:
+                await self._send("update", updates)
+
+    def _handle(self, message: dict[str, Any]) -> dict[str, Any]:
+        # returns the input updates which a browser would send in response
+        updates: dict[str, Any] = {}
+        if "busy" in message:
+            self._busy = message["busy"] == "busy"
+        if message.get("progress", {}).get("type") == "binding":
+            progress = message["progress"]["message"]
+            if progress.get("persistent"):
+                self._pending.add(progress["id"])
+        for id, value in message.get("values", {}).items():
+            self._updated[id] = time.monotonic()
+            self._pending.discard(id)
+            if isinstance(value, dict) and "html" in value:
+                # dynamic UI: report its outputs as visible and its inputs' values
+                inputs, outputs = parse_page(value["html"])
+                new_inputs = {k: v for k, v in inputs.items() if k not in self.inputs}
+                self.inputs.update(new_inputs)
+                updates.update(new_inputs)
+                updates.update(self._visibility(outputs - self.outputs))
+                self.outputs |= outputs
+        for id in message.get("errors", {}):
+            self._updated[id] = time.monotonic()
+            self._pending.discard(id)
+            self.result.errors[id] += 1
+        for input_message in message.get("inputMessages", []):
+            id, body = input_message["id"], input_message["message"]
+            if "url" in body:
+                self.selectize_urls[id] = body["url"]
+            for key in ("value", "selected"):
+                if key in body:
+                    value = body[key]
+                    # a single select takes the first of the values sent to it
+                    if isinstance(value, list) and not isinstance(
+                        self.inputs.get(id), list
+                    ):
+                        value = value[0] if value else None
+                    self.inputs[id] = value
+                    updates[id] = value
+        return updates
+
+    async def selectize_choices(self, id: str) -> list[dict[str, str]]:
+        """The choices of a server-side selectize input, as the browser fetches them
+        when the input is opened."""
+        if id not in self.selectize_urls:
+            self.result.failures.append(f"{id} has no server-side choices")
+            return []
+        query = urlencode({"query": "", "field": '["label"]', "conju": "and"})
+        url = urljoin(self.url, self.selectize_urls[id])
+        async with self.http.get(f"{url}&{query}") as response:
+            response.raise_for_status()
+            return await response.json()
+
+    async def settle(self) -> float:
+        """
+        Wait until the server has finished responding to the last request: it has
+        answered, it is idle, no output is waiting on an extended task, and no part of
+        a response has arrived for `quiet` seconds.
+
+        :return: The time at which the response ended
+
+        """
+        start = time.monotonic()
+        while True:
+            await asyncio.sleep(0.05)
+            now = time.monotonic()
+            if (
+                self._acknowledged is not None
+                and not self._busy
+                and not self._pending
+                and now - self._last_message >= self.quiet
+            ):
+                return max(self._last_message, self._acknowledged)
+            if now - start > self.timeout:
+                self.result.timeouts += 1
+                return now
+
+    async def run_step(self, step: Step) -> None:
+        updates = await step.updates(self)
+        if not updates:
+            self.result.failures.append(f"{step.name}: nothing to update")
+            return
+        self.inputs.update(updates)
+        self._updated.clear()
+        start = time.monotonic()
+        await self._send("update", updates)
+        end = await self.settle()
+        self.result.step_latencies[step.name].append(end - start)
+        for id, updated in self._updated.items():
+            self.result.output_latencies[id].append(updated - start)
+
+
+async def run_session(
+    http: aiohttp.ClientSession,
+    url: str,
+    steps: list[Step],
+    result: SessionResult,
+    seed: int,
+    think: float,
+    quiet: float,
+    timeout: float,
+) -> None:
+    session = SimulatedSession(http, url, result, seed, quiet, timeout)
+    try:
+        start = time.monotonic()
+        await session.connect()
+        result.step_latencies["load"].append(await session.settle() - start)
+        for step in steps:
+            await asyncio.sleep(session.random.uniform(0, 2 * think))
+            await session.run_step(step)
+    except Exception as exc:
+        result.failures.append(f"{type(exc).__name__}: {exc}")
+    finally:
+        await session.close()
+
+
+async def probe_loop_lag(
+    http: aiohttp.ClientSession, url: str, lags: list[float], interval: float
+) -> None:
+    # the server answers a request for a missing page without doing any work, on the
+    # event loop which serves the sessions, so the time to answer is the loop's lag
+    probe_url = urljoin(url.rstrip("/") + "/", "loadtest-probe")
+    while True:
+        start = time.monotonic()
+        async with http.get(probe_url) as response:
+            await response.read()
+        lags.append(time.monotonic() - start)
+        await asyncio.sleep(interval)
+
+
+# ---- Server resources ----
+
+
+def process_tree_usage(pid: int) -> tuple[float, int]:
+    """
+    The CPU time and RSS of a process and its children, from /proc (Linux only).
+
+    :param pid: The process id
+    :return: The CPU time in seconds, and the RSS in bytes
+
+    """
+    cpu, rss = 0.0, 0
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    ticks = os.sysconf("SC_CLK_TCK")
+    for proc in Path("/proc").iterdir():
+        if not proc.name.isdigit():
+            continue
+        try:
+            # the command in the second field may contain spaces
+            fields = (proc / "stat").read_text().rsplit(")", 1)[1].split()
+            if int(proc.name) != pid and int(fields[1]) != pid:
+                continue
+            cpu += (int(fields[11]) + int(fields[12])) / ticks
+            rss += int((proc / "statm").read_text().split()[1]) * page_size
+        except (FileNotFoundError, ProcessLookupError, IndexError):
+            continue
+    return cpu, rss
+
+
+async def sample_resources(
+    pid: int, samples: list[tuple[float, int]], interval: float = 0.5
+) -> None:
+    previous_cpu, _ = process_tree_usage(pid)
+    previous = time.monotonic()
+    while True:
+        await asyncio.sleep(interval)
+        cpu, rss = process_tree_usage(pid)
+        now = time.monotonic()
+        samples.append((100 * (cpu - previous_cpu) / (now - previous), rss))
+        previous_cpu, previous = cpu, now
+
+
+# ---- Reporting ----
+
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {"n": 0}
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {
+        "n": len(values),
+        "p50": round(float(p50), 4),
+        "p90": round(float(p90), 4),
+        "p99": round(float(p99), 4),
+        "max": round(float(max(values)), 4),
+    }
+
+
+def summarize(
+    results: list[SessionResult],
+    lags: list[float],
+    resources: list[tuple[float, int]],
+    elapsed: float,
+) -> dict[str, Any]:
+    steps: dict[str, list[float]] = defaultdict(list)
+    outputs: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    for result in results:
+        for name, values in result.step_latencies.items():
+            steps[name].extend(values)
+        for id, values in result.output_latencies.items():
+            outputs[id].extend(values)
+        for id, n in result.errors.items():
+            errors[id] += n
+    summary: dict[str, Any] = {
+        "sessions": len(results),
+        "elapsed": round(elapsed, 2),
+        "steps": {name: percentiles(values) for name, values in steps.items()},
+        "outputs": {id: percentiles(values) for id, values in sorted(outputs.items())},
+        "output_errors": dict(errors),
+        "timeouts": sum(result.timeouts for result in results),
+        "failures": [failure for result in results for failure in result.failures],
+        "loop_lag": percentiles(lags),
+    }
+    if resources:
+        cpu = [sample[0] for sample in resources]
+        rss = [sample[1] for sample in resources]
+        summary["server"] = {
+            "cpu_percent_mean": round(float(np.mean(cpu)), 1),
+            "cpu_percent_max": round(float(max(cpu)), 1),
+            "rss_mb_max": round(max(rss) / 1024**2, 1),
+        }
+    return summary
+
+
+def print_summary(summary: dict[str, Any]) -> None:
+    def table(title: str, rows: dict[str, dict[str, float]]) -> None:
+        print(f"\n{title}")
+        print(f"  {'':<48} {'n':>5} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}")
+        for name, stats in rows.items():
+            if stats["n"]:
+                print(
+                    f"  {name[:48]:<48} {stats['n']:>5} {stats['p50']:>8.3f} "
+                    f"{stats['p90']:>8.3f} {stats['p99']:>8.3f} {stats['max']:>8.3f}"
+                )
+
+    print(f"{summary['sessions']} sessions in {summary['elapsed']} s")
+    table("Step latency (s)", summary["steps"])
+    table("Output latency (s)", summary["outputs"])
+    table("Event loop lag (s)", {"probe request": summary["loop_lag"]})
+    if "server" in summary:
+        server = summary["server"]
+        print(
+            f"\nServer CPU {server['cpu_percent_mean']}% mean, "
+            f"{server['cpu_percent_max']}% max. RSS {server['rss_mb_max']} MB max"
+        )
+    print(
+        f"\n{sum(summary['output_errors'].values())} output errors, "
+        f"{summary['timeouts']} step timeouts, {len(summary['failures'])} failures"
+    )
+    for failure in sorted(set(summary["failures"])):
+        print(f"  {failure}")
+
+
+# ---- Main ----
+
+
+async def wait_for_server(
+    url: str, server: subprocess.Popen | None = None, timeout: float = 120.0
+) -> None:
+    start = time.monotonic()
+    async with aiohttp.ClientSession() as http:
+        while True:
+            try:
+                async with http.get(url) as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            if server is not None and server.poll() is not None:
+                raise RuntimeError(f"The app exited with code {server.returncode}")
+            if time.monotonic() - start > timeout:
+                raise TimeoutError(f"The app did not start at {url}")
+            await asyncio.sleep(0.5)
+
+
+async def run(args: argparse.Namespace, pid: int | None) -> dict[str, Any]:
+    steps = SCENARIOS[args.scenario]
+    results = [SessionResult() for _ in range(args.sessions)]
+    lags: list[float] = []
+    resources: list[tuple[float, int]] = []
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as http:
+        monitors = [asyncio.create_task(probe_loop_lag(http, args.url, lags, 0.2))]
+        if pid is not None:
+            monitors.append(asyncio.create_task(sample_resources(pid, resources)))
+
+        async def start_session(i: int) -> None:
+            await asyncio.sleep(i * args.ramp / args.sessions)
+            await run_session(
+                http,
+                args.url,
+                steps,
+                results[i],
+                seed=args.seed + i,
+                think=args.think,
+                quiet=args.quiet,
+                timeout=args.timeout,
+            )
+
+        start = time.monotonic()
+        await asyncio.gather(*[start_session(i) for i in range(args.sessions)])
+        elapsed = time.monotonic() - start
+        for monitor in monitors:
+            monitor.cancel()
+        await asyncio.gather(*monitors, return_exceptions=True)
+    return summarize(results, lags, resources, elapsed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument(
+        "--ramp", type=float, default=5.0, help="Seconds over which sessions start"
+    )
+    parser.add_argument("--scenario", choices=list(SCENARIOS), default="browse")
+    parser.add_argument(
+        "--think", type=float, default=1.0, help="Mean seconds between steps"
+    )
+    parser.add_argument(
+        "--quiet",
+        type=float,
+        default=0.5,
+        help="Seconds without messages after which a step is done",
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=60.0, help="Maximum seconds per step"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pid", type=int, help="The server process to sample")
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Start the app (`tfbpshiny shiny`) on the port of --url, and sample it",
+    )
+    parser.add_argument("--output", type=Path, help="Write the results as JSON")
+    args = parser.parse_args()
+
+    server = None
+    pid = args.pid
+    if args.serve:
+        port = args.url.rstrip("/").rsplit(":", 1)[-1]
+        server = subprocess.Popen(
+            [sys.executable, "-m", "tfbpshiny", "shiny", "--port", port]
+        )
+        pid = server.pid
+    try:
+        asyncio.run(wait_for_server(args.url, server))
+        summary = asyncio.run(run(args, pid))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print_summary(summary)
+    if args.output:
+        args.output.write_text(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
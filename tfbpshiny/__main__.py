@@ -1,12 +1,72 @@
 import argparse
+import multiprocessing
 import os
+from multiprocessing.connection import wait
 
 from shiny import run_app
 
 from configure_logger import LogLevel
 
 
+def _run_worker(port: int, host: str, worker_id: int) -> None:
+    os.environ["TFBPSHINY_WORKER_ID"] = str(worker_id)
+    run_app("tfbpshiny.app:app", port=port, host=host)
+
+
+def run_workers(port: int, host: str, workers: int) -> None:
+    """
+    Serve the app from `workers` processes, listening on consecutive ports starting
+    at `port`.
+
+    A Shiny session lives in the process which accepted its websocket, so the workers
+    do not share a port. Instead, the load balancer in front of the app (traefik, see
+    compose/production/traefik/traefik.yml) must list every worker port and use
+    sticky sessions. The workers share the caches which are stored outside of the
+    process, i.e. the DiskCache and the memory mapped predictor matrices.
+
+    If any worker exits, the others are terminated.
+
+    :param port: The port of the first worker
+    :param host: The host to bind the workers to
+    :param workers: The number of worker processes
+    :raises ValueError: If workers is less than 1
+
+    """
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+
+    processes = [
+        multiprocessing.Process(
+            target=_run_worker,
+            args=(port + i, host, i),
+            name=f"tfbpshiny-worker-{i}",
+        )
+        for i in range(workers)
+    ]
+    for i, process in enumerate(processes):
+        process.start()
+        print(f"Started {process.name} on {host}:{port + i}")
+
+    try:
+        wait([process.sentinel for process in processes])
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+            if process.exitcode not in (0, -15):
+                print(f"{process.name} exited with code {process.exitcode}")
+
+
 def run_shiny(args: argparse.Namespace) -> None:
+    if args.workers > 1:
+        if args.debug:
+            raise ValueError("--debug cannot be used with more than one worker")
+        run_workers(args.port, args.host, args.workers)
+        return
     kwargs: dict[str, object] = {"port": args.port, "host": args.host}
     if args.debug:
         kwargs.update({"reload": True, "reload_dirs": ["tfbpshiny/shiny_app"]})
@@ -52,6 +112,15 @@ def make_parser() -> argparse.ArgumentParser:
     shiny_parser.add_argument(
         "--host", type=str, default="127.0.0.1", help="Host to bind the Shiny app"
     )
+    shiny_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help=(
+            "Number of worker processes. Workers listen on consecutive ports "
+            "starting at --port, and require a load balancer with sticky sessions"
+        ),
+    )
     shiny_parser.set_defaults(func=run_shiny)
 
     # Example additional command:
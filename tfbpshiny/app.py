@@ -1,8 +1,9 @@
 import logging
 import os
 import time
+from collections.abc import Callable
 from pathlib import Path
-from typing import Literal, cast
+from typing import Any, Literal, cast
 
 from dotenv import load_dotenv
 from shiny import App, reactive, ui
@@ -30,7 +31,16 @@ from .tabs.perturbation_response_module import (
     perturbation_response_server,
     perturbation_response_ui,
 )
+from .utils.compute_pool import ComputePool
+from .utils.disk_cache import DiskCache
 from .utils.get_metadata_task import get_metadata_task
+from .utils.http_pool import HttpPool
+from .utils.metadata_store import MetadataStore
+from .utils.rank_response_replicate_plot_utils import (
+    create_rank_response_replicate_plots_by_source,
+)
+from .utils.replay_backend import ReplayBackend, ReplayMode
+from .utils.replicate_store import ReplicateStore
 
 # Only load .env if not running in production
 if not os.getenv("DOCKER_ENV"):
@@ -39,7 +49,13 @@ if not os.getenv("DOCKER_ENV"):
 logger = logging.getLogger("shiny")
 
 # configure the logger
-log_file = f"tfbpshiny_{time.strftime('%Y%m%d-%H%M%S')}.log"
+# when served by multiple workers (see `tfbpshiny shiny --workers`), each worker logs
+# to its own file
+worker_id = os.getenv("TFBPSHINY_WORKER_ID")
+log_file = (
+    f"tfbpshiny_{time.strftime('%Y%m%d-%H%M%S')}"
+    f"{f'_worker{worker_id}' if worker_id is not None else ''}.log"
+)
 log_level = int(os.getenv("TFBPSHINY_LOG_LEVEL", "10"))
 handler_type = cast(
     Literal["console", "file"], os.getenv("TFBPSHINY_LOG_HANDLER", "console")
@@ -51,6 +67,92 @@ configure_logger(
     log_file=log_file,
 )
 
+# ---- Process-wide HTTP connection pool shared by all API objects ----
+
+# every request which tfbpapi makes reuses the keep-alive connections of this pool,
+# rather than opening (and handshaking) new connections to the backend
+http_pool = HttpPool(
+    limit=int(os.getenv("TFBPSHINY_HTTP_LIMIT", "100")),
+    limit_per_host=int(os.getenv("TFBPSHINY_HTTP_LIMIT_PER_HOST", "10")),
+    keepalive_timeout=float(os.getenv("TFBPSHINY_HTTP_KEEPALIVE", "30")),
+    stats_interval=float(os.getenv("TFBPSHINY_HTTP_STATS_INTERVAL", "300")),
+    logger=logger,
+)
+http_pool.install("tfbpapi")
+
+# ---- The API classes of each dataset ----
+
+api_factories: dict[str, Callable[..., Any]] = {
+    "binding": BindingAPI,
+    "perturbation_response": ExpressionAPI,
+    "rank_response": RankResponseAPI,
+    "promotersetsig": PromoterSetSigAPI,
+    "bindingmanualqc": BindingManualQCAPI,
+}
+
+# Set TFBPSHINY_BACKEND to "record" to save every response of the database to
+# TFBPSHINY_REPLAY_DIR, and to "replay" to serve the saved responses instead of the
+# database, e.g. to measure performance offline
+backend = os.getenv("TFBPSHINY_BACKEND", "live")
+if backend != "live":
+    replay_backend = ReplayBackend(
+        os.getenv("TFBPSHINY_REPLAY_DIR", "replay"),
+        mode=cast(ReplayMode, backend),
+        latency=float(os.getenv("TFBPSHINY_REPLAY_LATENCY", "0")),
+        bandwidth=float(os.getenv("TFBPSHINY_REPLAY_BANDWIDTH", "0")),
+        error_rate=float(os.getenv("TFBPSHINY_REPLAY_ERROR_RATE", "0")),
+        seed=int(os.getenv("TFBPSHINY_REPLAY_SEED", "0")),
+        logger=logger,
+    )
+    logger.info(f"Using the {backend} backend in {replay_backend.path}")
+    api_factories = {
+        label: replay_backend.api_factory(label, api_class)
+        for label, api_class in api_factories.items()
+    }
+
+# ---- Process-wide metadata store shared by all sessions ----
+
+# The metadata is retrieved once per process and refreshed in the background after
+# TFBPSHINY_METADATA_TTL seconds. Sessions are served from memory in the meantime.
+metadata_store = MetadataStore(
+    ttl=float(os.getenv("TFBPSHINY_METADATA_TTL", "3600")), logger=logger
+)
+for label, api_factory in api_factories.items():
+    metadata_store.register(label, api_factory)
+
+# RankResponseAPI replicate data is cached on disk, and shared by all sessions and
+# worker processes. Changing TFBPSHINY_DATA_VERSION invalidates the cache. The
+# entries of other versions are removed once unused for TFBPSHINY_CACHE_VERSION_MAX_AGE
+replicate_cache = DiskCache(
+    os.getenv("TFBPSHINY_CACHE_DIR", Path.home() / ".cache" / "tfbpshiny"),
+    max_bytes=int(os.getenv("TFBPSHINY_CACHE_MAX_BYTES", str(1024**3))),
+    version=os.getenv("TFBPSHINY_DATA_VERSION", "1"),
+    version_max_age=float(os.getenv("TFBPSHINY_CACHE_VERSION_MAX_AGE", "604800")),
+    logger=logger,
+)
+
+# CPU-bound plot preparation runs in a pool of worker processes so that it does not
+# block the event loop. Set TFBPSHINY_COMPUTE_WORKERS to 0 to use a thread instead.
+compute_pool = ComputePool(
+    max_workers=int(os.getenv("TFBPSHINY_COMPUTE_WORKERS", "2")), logger=logger
+)
+
+# The replicate data and plots of each regulator. The regulators of a comparison are
+# fetched concurrently. The most popular regulators, and the neighbors of each
+# selection, are prefetched in the background
+replicate_store = ReplicateStore(
+    api_factories["rank_response"],
+    replicate_cache,
+    compute_pool,
+    create_rank_response_replicate_plots_by_source,
+    max_concurrency=int(os.getenv("TFBPSHINY_PREFETCH_CONCURRENCY", "1")),
+    fetch_concurrency=int(os.getenv("TFBPSHINY_FETCH_CONCURRENCY", "5")),
+    popular_regulators=int(os.getenv("TFBPSHINY_PREFETCH_POPULAR", "5")),
+    neighbors=int(os.getenv("TFBPSHINY_PREFETCH_NEIGHBORS", "1")),
+    max_bytes=int(os.getenv("TFBPSHINY_PREFETCH_MAX_BYTES", str(256 * 1024**2))),
+    logger=logger,
+)
+
 app_ui = ui.page_fillable(
     ui.panel_title(
         "TF Binding and Perturbation", window_title="TF Binding and Perturbation"
@@ -89,37 +191,28 @@ app_ui = ui.page_fillable(
 
 def app_server(input, output, session):
 
-    # ---- Instantiate API class instances and other static variables ----
-
-    # set up the API class instances
-    binding_api = BindingAPI()
-    bindingmanualq_api = BindingManualQCAPI()
-    expression_api = ExpressionAPI()
-    promotersetsig_api = PromoterSetSigAPI()
-    rank_response_api = RankResponseAPI()
-
     # ---- Instantiate reactives, and objects that store reactives ----
 
     # this reactive is used to execute the "init" function once when the app starts.
     # it is set to False after the first run and not used again
     initial_run = reactive.Value(True)
 
-    # ---- functions to get the metadata for the API class instances ----
+    # ---- functions to get the metadata from the shared metadata store ----
 
-    get_binding_metadata = get_metadata_task(binding_api, "binding", logger)
+    get_binding_metadata = get_metadata_task(metadata_store, "binding", logger)
     get_perturbation_response_metadata = get_metadata_task(
-        expression_api, "perturbation_response", logger
+        metadata_store, "perturbation_response", logger
     )
     get_rank_response_metadata = get_metadata_task(
-        rank_response_api, "rank_response", logger
+        metadata_store, "rank_response", logger
     )
 
     get_promotersetsig_metadata = get_metadata_task(
-        promotersetsig_api, "promotersetsig", logger
+        metadata_store, "promotersetsig", logger
     )
 
     get_bindingmanualqc_metadata = get_metadata_task(
-        bindingmanualq_api, "bindingmanualqc", logger
+        metadata_store, "bindingmanualqc", logger
     )
 
     # ---- Main server logic ----
@@ -160,6 +253,7 @@ def app_server(input, output, session):
         "compare_individual",
         rank_response_metadata=get_rank_response_metadata,
         bindingmanualqc_result=get_bindingmanualqc_metadata,
+        replicate_store=replicate_store,
         logger=logger,
     )
 
@@ -1,3 +1,5 @@
+from collections import OrderedDict
+from collections.abc import Iterable
 from logging import Logger
 
 import pandas as pd
@@ -5,6 +7,8 @@ import plotly.express as px
 from shiny import Inputs, Outputs, Session, module
 from shinywidgets import output_widget, render_plotly
 
+from ..utils.identity_cache import IdentityCache
+
 
 def cluster_corr_matrix_both(corr: pd.DataFrame) -> pd.DataFrame:
     from scipy.cluster.hierarchy import leaves_list, linkage
@@ -18,6 +22,80 @@ def cluster_corr_matrix_both(corr: pd.DataFrame) -> pd.DataFrame:
     return ordered
 
 
+class ClusteredCorrelation:
+    """
+    The correlation matrix of a static DataFrame, and its clustered ordering, computed
+    once and shared by every session.
+
+    The full correlation matrix is computed the first time it is needed. Clustered
+    matrices for column subsets are sliced from the full matrix, so a subset only
+    requires re-clustering its own rows/columns. Up to `max_subsets` clustered subsets
+    are memoized.
+
+    """
+
+    def __init__(self, df: pd.DataFrame, max_subsets: int = 32):
+        """
+        Initialize the cache.
+
+        :param df: The DataFrame whose columns are correlated. Must not be mutated
+        :param max_subsets: The number of clustered column subsets to memoize
+
+        """
+        self.df = df
+        self.max_subsets = max_subsets
+        self._corr: pd.DataFrame | None = None
+        self._clustered: OrderedDict[tuple[str, ...] | None, pd.DataFrame] = (
+            OrderedDict()
+        )
+
+    @property
+    def corr(self) -> pd.DataFrame:
+        """The correlation matrix of all columns."""
+        if self._corr is None:
+            self._corr = self.df.corr()
+        return self._corr
+
+    def clustered(self, columns: Iterable[str] | None = None) -> pd.DataFrame:
+        """
+        Return the clustered correlation matrix, optionally for a subset of columns.
+
+        :param columns: The columns to include. If None, all columns are included
+        :return: The correlation matrix with rows and columns in leaf order
+        :raises KeyError: If any of the columns are not in the DataFrame
+
+        """
+        key = tuple(sorted(columns)) if columns is not None else None
+        if key in self._clustered:
+            self._clustered.move_to_end(key)
+            return self._clustered[key]
+
+        corr = self.corr if key is None else self.corr.loc[list(key), list(key)]
+        clustered = cluster_corr_matrix_both(corr)
+
+        self._clustered[key] = clustered
+        if len(self._clustered) > self.max_subsets:
+            self._clustered.popitem(last=False)
+        return clustered
+
+
+# Process-wide cache of the correlation matrices of the static input frames
+_correlation_cache: IdentityCache[ClusteredCorrelation] = IdentityCache()
+
+
+def get_clustered_correlation(df: pd.DataFrame) -> ClusteredCorrelation:
+    """
+    Get the process-wide ClusteredCorrelation for a DataFrame. Every session that
+    passes the same (static) DataFrame shares the same correlation matrix and
+    clustering, which are computed only once.
+
+    :param df: The DataFrame whose columns are correlated. Must not be mutated
+    :return: The shared ClusteredCorrelation for `df`
+
+    """
+    return _correlation_cache.get(df, lambda: ClusteredCorrelation(df))
+
+
 @module.ui
 def correlation_matrix_ui():
     return output_widget("correlation_matrix_plot")
@@ -39,6 +117,9 @@ def correlation_matrix_server(
     static dataframe -- this needs to be changed when the predictors df are retrieved
     from the db.
 
+    The correlation matrix and its clustering are computed once per process and shared
+    by all sessions (see `get_clustered_correlation`).
+
     :param tf_binding_df: A pandas dataframe with the binding or perturbation response
         data. The index should be the target symbol and the columns should be the
         binding or perturbation response data. NOTE the TODO in the description
@@ -46,14 +127,15 @@ def correlation_matrix_server(
     :return: None
 
     """
+    correlation = get_clustered_correlation(tf_binding_df)
 
     @render_plotly
     def correlation_matrix_plot():
         if tf_binding_df.empty or tf_binding_df.shape[1] < 2:
             return px.scatter(title="Not enough data to compute correlation")
 
-        # Compute correlation matrix
-        clustered_corr = cluster_corr_matrix_both(tf_binding_df.corr())
+        # Retrieve the (cached) clustered correlation matrix
+        clustered_corr = correlation.clustered()
 
         fig = px.imshow(
             clustered_corr,
@@ -56,12 +56,16 @@ def dto_distributions_server(
                 "These will be removed from the plot:\n%s",
                 metadata.loc[na_mask, cols_to_show].drop_duplicates(),
             )
-            metadata = metadata.loc[~na_mask].copy()
+            metadata = metadata.loc[~na_mask]
 
-        metadata.loc[:, "dto_empirical_pvalue"] = neg_log10_transform(
-            metadata.loc[:, "dto_empirical_pvalue"]
+        # the metadata is shared between sessions, so transform a copy
+        metadata = metadata.assign(
+            dto_empirical_pvalue=neg_log10_transform(metadata["dto_empirical_pvalue"])
         )
 
         return create_distribution_plot(
-            metadata, "dto_empirical_pvalue", "-log10(DTO Empirical P-value)"
+            metadata,
+            "dto_empirical_pvalue",
+            "-log10(DTO Empirical P-value)",
+            summarize=True,
         )
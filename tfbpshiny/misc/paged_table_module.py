@@ -0,0 +1,326 @@
+from collections.abc import Callable, Iterable
+from logging import Logger
+from typing import Literal
+
+import numpy as np
+import pandas as pd
+from shiny import Inputs, Outputs, Session, module, reactive, render, req, ui
+
+# note that these aren't part of the public API. Possibly unstable
+from shiny.render._data_frame_utils._styles import as_browser_style_infos
+from shiny.render._data_frame_utils._types import StyleInfo
+
+
+def _sort_key(values: pd.Series) -> pd.Series:
+    """Sort columns of formatted numbers (e.g. "1.23e-04" or "12%") by their value."""
+    if pd.api.types.is_numeric_dtype(values) or isinstance(
+        values.dtype, pd.CategoricalDtype
+    ):
+        return values
+    numeric = pd.to_numeric(values.astype(str).str.rstrip("%"), errors="coerce")
+    if numeric.notna().sum() == values.notna().sum():
+        return numeric
+    return values
+
+
+def filter_and_sort(
+    df: pd.DataFrame,
+    query: str = "",
+    sort_by: str | None = None,
+    descending: bool = False,
+) -> pd.DataFrame:
+    """
+    Filter the rows of a DataFrame to those where any column contains `query`
+    (ignoring case), and sort them.
+
+    :param df: The DataFrame
+    :param query: The text to search for. If empty, all rows are kept
+    :param sort_by: The column to sort by. If None, or not a column, the order of
+        `df` is kept. Columns of formatted numbers are sorted by value
+    :param descending: Whether to sort in descending order
+    :return: The filtered and sorted rows of `df`, with the original index
+
+    """
+    if query:
+        matches = [
+            df[col].astype(str).str.contains(query, case=False, regex=False).to_numpy()
+            for col in df.columns
+        ]
+        df = df[np.logical_or.reduce(matches)] if matches else df
+    if sort_by is not None and sort_by in df.columns:
+        # mergesort is stable, so ties keep their order
+        df = df.sort_values(
+            sort_by, ascending=not descending, kind="mergesort", key=_sort_key
+        )
+    return df
+
+
+def page_count(n_rows: int, page_size: int) -> int:
+    """The number of pages needed for `n_rows`. An empty table has one page."""
+    return max(1, -(-n_rows // page_size))
+
+
+def update_selection(
+    selected: frozenset, page_ids: Iterable, selected_page_ids: Iterable
+) -> frozenset:
+    """
+    Replace the selected ids of one page, and keep those of the other pages.
+
+    :param selected: The ids selected on every page
+    :param page_ids: The ids of the rows of the page
+    :param selected_page_ids: The ids of the rows selected on the page
+    :return: The ids selected on every page
+
+    """
+    return frozenset((selected - frozenset(page_ids)) | frozenset(selected_page_ids))
+
+
+@module.ui
+def paged_table_ui():
+    return ui.div(
+        ui.output_ui("controls"),
+        ui.output_data_frame("table"),
+        ui.output_ui("pager"),
+    )
+
+
+@module.server
+def paged_table_server(
+    input: Inputs,
+    output: Outputs,
+    session: Session,
+    *,
+    data: reactive.calc,
+    logger: Logger,
+    page_size: int = 25,
+    page_threshold: int = 100,
+    selection_mode: Literal["none", "row", "rows"] = "none",
+    id_column: str | None = None,
+    styles: Callable[[pd.DataFrame], StyleInfo | None] | None = None,
+) -> reactive.calc:
+    """
+    A table which keeps the prepared frame on the server and sends only the rows of
+    the current page to the browser. Filtering and sorting are done on the server, on
+    the full frame, so the size of each update is bounded by `page_size` regardless of
+    the number of rows.
+
+    A frame of at most `page_threshold` rows is sent whole, without the paging, filter
+    and sort controls, and is sorted by clicking the column headers as usual. In a
+    paged table the headers do not sort, since they could only sort the current page.
+
+    The selection is kept by row id, so the rows selected on one page stay selected
+    when another page is shown, and are selected again when their page is shown.
+
+    :param data: A reactive calc returning the DataFrame to display
+    :param logger: A logger object
+    :param page_size: The number of rows on each page
+    :param page_threshold: The number of rows above which the table is paged
+    :param selection_mode: The DataGrid selection mode
+    :param id_column: The column which identifies the rows of `data` for the
+        selection. If None, the index of `data` is used
+    :param styles: An optional function which is passed the rows of the current page
+        (with a 0-based index) and returns the DataGrid styles for the page. It may
+        read reactive values. When they change, only the new styles are sent to the
+        already-rendered page, rather than the page itself
+    :return: A reactive calc returning the selected rows of `data` as a DataFrame
+
+    """
+    page = reactive.value(0)
+    # the ids of the selected rows, on every page
+    selected_ids = reactive.value(frozenset())
+    # whether the selection of the current page is being restored, see below
+    restoring = reactive.value(False)
+
+    def row_ids(df: pd.DataFrame) -> pd.Series:
+        return df[id_column] if id_column is not None else df.index.to_series()
+
+    def control(name: str, default):
+        # the controls are rendered once the table is known to be paged, so their
+        # values may not have arrived yet
+        value = input[name]
+        return value() if value.is_set() else default
+
+    @reactive.calc
+    def paged():
+        return len(data()) > page_threshold
+
+    @render.ui
+    def controls():
+        if not paged():
+            return None
+        columns = data().columns
+        with reactive.isolate():
+            sort_by = control("sort_by", "")
+            query = control("query", "")
+            descending = control("descending", False)
+        return ui.div(
+            ui.input_text("query", label=None, placeholder="Filter rows", value=query),
+            ui.input_select(
+                "sort_by",
+                label=None,
+                choices={"": "Sort by", **{col: col for col in columns}},
+                selected=sort_by if sort_by in columns else "",
+            ),
+            ui.input_switch("descending", label="Descending", value=descending),
+            # a click on a column header would sort only the rows of the page
+            ui.tags.style(
+                f"#{session.ns('table')} thead th {{ pointer-events: none; }}"
+            ),
+            class_="d-flex gap-2 align-items-center",
+        )
+
+    @render.ui
+    def pager():
+        if not paged():
+            return None
+        return ui.div(
+            ui.input_action_button("previous", "Previous", class_="btn-sm"),
+            ui.output_text("page_info", inline=True),
+            ui.input_action_button("next", "Next", class_="btn-sm"),
+            class_="d-flex gap-2 align-items-center",
+        )
+
+    @reactive.calc
+    def filtered():
+        if not paged():
+            return data()
+        return filter_and_sort(
+            data(),
+            query=control("query", "").strip(),
+            sort_by=control("sort_by", "") or None,
+            descending=control("descending", False),
+        )
+
+    @reactive.calc
+    def n_pages():
+        return page_count(len(filtered()), page_size)
+
+    @reactive.effect
+    @reactive.event(filtered)
+    def _():
+        # return to the first page when the rows change
+        page.set(0)
+
+    @reactive.effect
+    @reactive.event(input.previous)
+    def _():
+        page.set(max(page.get() - 1, 0))
+
+    @reactive.effect
+    @reactive.event(input.next)
+    def _():
+        page.set(min(page.get() + 1, n_pages() - 1))
+
+    @reactive.calc
+    def window():
+        if not paged():
+            return filtered()
+        start = min(page.get(), n_pages() - 1) * page_size
+        return filtered().iloc[start : start + page_size]
+
+    @render.text
+    def page_info():
+        return (
+            f"Page {min(page.get(), n_pages() - 1) + 1} of {n_pages()} "
+            f"({len(filtered())} rows)"
+        )
+
+    @reactive.calc
+    def page_rows():
+        return window().reset_index(drop=True)
+
+    @render.data_frame
+    def table():
+        df_window = page_rows()
+        logger.debug(
+            f"Rendering {session.ns('table')}: {len(df_window)} of "
+            f"{len(data())} rows"
+        )
+        # the styles are sent with the page, but a change to the values they read
+        # must not re-render it. See style_patch
+        with reactive.isolate():
+            page_styles = styles(df_window) if styles is not None else None
+        return render.DataGrid(
+            df_window,
+            selection_mode=selection_mode,
+            styles=page_styles,
+        )
+
+    if styles is not None:
+
+        @reactive.calc
+        def style_patch():
+            # only the reactive values read by `styles` invalidate the patch. A new page
+            # is rendered with its own styles
+            with reactive.isolate():
+                df_window = page_rows()
+            return as_browser_style_infos(styles(df_window) or [], into_data=df_window)
+
+        @reactive.effect
+        @reactive.event(style_patch, ignore_init=True)
+        async def _():
+            logger.debug(f"Updating the styles of {session.ns('table')}")
+            # this is the message which the DataGrid itself sends to update its styles
+            # after a cell edit
+            await table._send_message_to_browser(
+                "updateStyles", {"styles": style_patch()}
+            )
+
+    if selection_mode != "none":
+
+        @reactive.effect
+        @reactive.event(data)
+        def _():
+            # drop the ids which are no longer in the table
+            with reactive.isolate():
+                selected = selected_ids.get()
+            if selected:
+                selected_ids.set(selected & frozenset(row_ids(data())))
+
+        @reactive.effect
+        @reactive.event(page_rows)
+        def _():
+            with reactive.isolate():
+                selected = selected_ids.get()
+                page_ids = row_ids(window())
+            rows = [i for i, id in enumerate(page_ids) if id in selected]
+            restoring.set(bool(rows))
+            if not rows:
+                return
+
+            async def restore():
+                await table.update_cell_selection({"type": "row", "rows": rows})
+
+            # the browser clears the selection when it renders a page, so the rows
+            # of the page which were selected are selected again once it is sent
+            session.on_flushed(restore, once=True)
+
+        @reactive.effect
+        @reactive.event(input.table_cell_selection)
+        def _():
+            # the selection sent by the browser, rather than table.cell_selection,
+            # which is also invalidated when a page is rendered
+            rows = (input.table_cell_selection() or {}).get("rows") or []
+            with reactive.isolate():
+                page_ids = row_ids(window())
+                if restoring.get():
+                    restoring.set(False)
+                    if not rows:
+                        # the selection of the previous page was cleared, before the
+                        # selection of this page is restored
+                        return
+                selected_ids.set(
+                    update_selection(
+                        selected_ids.get(),
+                        page_ids,
+                        [page_ids.iloc[row] for row in rows if row < len(page_ids)],
+                    )
+                )
+
+    @reactive.calc
+    def selected_rows():
+        req(selection_mode != "none")
+        df = data()
+        return df[row_ids(df).isin(selected_ids()).to_numpy()]
+
+    return selected_rows
@@ -1,12 +1,183 @@
+import operator
+from collections.abc import Iterable
+from functools import reduce
 from logging import Logger
 from typing import Literal
 
+import numpy as np
 import pandas as pd
-from shiny import reactive
+from shiny import reactive, ui
 
+from ..utils.identity_cache import IdentityCache
 from ..utils.source_name_lookup import get_source_name_dict
 
 
+class RegulatorIntersectionIndex:
+    """
+    An index of which regulators are present in which data sources.
+
+    Each regulator is assigned an integer id (its position in the sorted list of
+    regulators), and each source is stored as a bitset (a python int) in which bit i is
+    set if regulator i is present in the source. N-way intersections and unions are
+    then single bitwise operations, and counts are popcounts.
+
+    """
+
+    def __init__(self, regulators: pd.Index, membership: dict[str, np.ndarray]):
+        """
+        Initialize the index. Use `from_metadata` to build an index from a metadata
+        DataFrame.
+
+        :param regulators: The regulators. The position of each regulator is its id
+        :param membership: A dictionary mapping each source to a boolean array of
+            length len(regulators) which is True where the regulator is present
+
+        """
+        self.regulators = regulators
+        self._membership = membership
+        self._bitsets = {
+            source: int.from_bytes(
+                np.packbits(mask, bitorder="little").tobytes(), "little"
+            )
+            for source, mask in membership.items()
+        }
+
+    @classmethod
+    def from_metadata(
+        cls,
+        metadata: pd.DataFrame,
+        source_col: str = "source_name",
+        regulator_col: str = "regulator_symbol",
+    ) -> "RegulatorIntersectionIndex":
+        """
+        Build the index from a metadata DataFrame.
+
+        :param metadata: DataFrame with (at least) the `source_col` and
+            `regulator_col` columns
+        :param source_col: The column which identifies the source
+        :param regulator_col: The column which identifies the regulator
+        :return: A RegulatorIntersectionIndex
+
+        """
+        pairs = metadata[[source_col, regulator_col]].dropna()
+        codes, regulators = pd.factorize(pairs[regulator_col], sort=True)
+        sources = pairs[source_col].to_numpy()
+
+        membership = {}
+        for source in pd.unique(sources):
+            mask = np.zeros(len(regulators), dtype=bool)
+            mask[codes[sources == source]] = True
+            membership[source] = mask
+
+        return cls(pd.Index(regulators), membership)
+
+    @property
+    def sources(self) -> list[str]:
+        """The sources in the index."""
+        return list(self._bitsets)
+
+    def bitset(self, source: str) -> int:
+        """
+        Return the bitset of a source. Sources not in the index are empty.
+
+        :param source: The source name
+        :return: The bitset of regulator ids present in the source
+
+        """
+        return self._bitsets.get(source, 0)
+
+    def count(self, source: str) -> int:
+        """
+        Return the number of regulators in a source.
+
+        :param source: The source name
+        :return: The number of regulators
+
+        """
+        return self.bitset(source).bit_count()
+
+    def intersection(self, sources: Iterable[str]) -> int:
+        """
+        Return the bitset of regulators present in every one of the sources.
+
+        :param sources: The source names
+        :return: A bitset. 0 if no sources are given
+
+        """
+        bitsets = [self.bitset(source) for source in sources]
+        return reduce(operator.and_, bitsets) if bitsets else 0
+
+    def union(self, sources: Iterable[str]) -> int:
+        """
+        Return the bitset of regulators present in any of the sources.
+
+        :param sources: The source names
+        :return: A bitset. 0 if no sources are given
+
+        """
+        return reduce(operator.or_, (self.bitset(source) for source in sources), 0)
+
+    def members(self, bitset: int) -> list[str]:
+        """
+        Return the regulators in a bitset.
+
+        :param bitset: A bitset, e.g. from `intersection`
+        :return: The list of regulators, in sorted order
+
+        """
+        n_bytes = (len(self.regulators) + 7) // 8
+        mask = np.unpackbits(
+            np.frombuffer(bitset.to_bytes(n_bytes, "little"), dtype=np.uint8),
+            bitorder="little",
+            count=len(self.regulators),
+        )
+        return self.regulators[mask.astype(bool)].tolist()
+
+    def exclusive_intersections(self, sources: list[str]) -> dict[tuple[str, ...], int]:
+        """
+        Return the UpSet-style exclusive intersection counts: for every combination of
+        the sources, the number of regulators present in exactly those sources (and
+        none of the other given sources). Combinations with no regulators are omitted.
+
+        :param sources: The source names
+        :return: A dictionary mapping a tuple of source names (in the order given) to
+            the number of regulators present in exactly those sources
+
+        """
+        if not sources:
+            return {}
+        # encode the set of sources that each regulator is present in as an integer
+        signature = np.zeros(len(self.regulators), dtype=np.int64)
+        for i, source in enumerate(sources):
+            mask = self._membership.get(source)
+            if mask is not None:
+                signature |= mask.astype(np.int64) << i
+        values, counts = np.unique(signature[signature > 0], return_counts=True)
+        return {
+            tuple(source for i, source in enumerate(sources) if value >> i & 1): int(n)
+            for value, n in zip(values, counts)
+        }
+
+
+# Process-wide cache of the index for each (shared) metadata DataFrame
+_index_cache: IdentityCache[RegulatorIntersectionIndex] = IdentityCache()
+
+
+def get_regulator_index(metadata: pd.DataFrame) -> RegulatorIntersectionIndex:
+    """
+    Get the process-wide RegulatorIntersectionIndex for a metadata DataFrame. The
+    index is built once per metadata frame, and shared by every session.
+
+    :param metadata: DataFrame containing metadata with 'source_name' and
+        'regulator_symbol' columns. Must not be mutated
+    :return: The RegulatorIntersectionIndex for `metadata`
+
+    """
+    return _index_cache.get(
+        metadata, lambda: RegulatorIntersectionIndex.from_metadata(metadata)
+    )
+
+
 def calculate_regulators_by_source(
     metadata: pd.DataFrame,
     selected_internal_names: list[str],
@@ -28,32 +199,23 @@ def calculate_regulators_by_source(
         return {}
 
     source_name_dict = get_source_name_dict(datatype)
+    index = get_regulator_index(metadata)
 
-    df_filtered = metadata[metadata["source_name"].isin(selected_internal_names)]
-
-    if df_filtered.empty:
+    present = [name for name in selected_internal_names if name in index.sources]
+    if not present:
         logger.warning(
             f"No data available for internal sources: {selected_internal_names}"
         )
         return {}
 
-    # Group by source_name and get lists of regulators
-    grouped = (
-        df_filtered.groupby("source_name")["regulator_symbol"].apply(list).to_dict()
-    )
-
-    # Convert to display names and sets
-    result = {}
-    for internal_name, regulator_list in grouped.items():
-        display_name = source_name_dict.get(internal_name, internal_name)
-        regulator_set = set(regulator_list)
-        result[display_name] = regulator_set
-
-    return result
+    return {
+        source_name_dict.get(name, name): set(index.members(index.bitset(name)))
+        for name in present
+    }
 
 
 def create_intersection_summary(
-    regulators_dict: dict[str, set[str]],
+    index: RegulatorIntersectionIndex,
     selected_internal_names: list[str],
     datatype: Literal["binding", "perturbation_response"],
     logger: Logger,
@@ -61,7 +223,14 @@ def create_intersection_summary(
     """
     Create intersection summary for the given sources.
 
-    :param regulators_dict: Dictionary mapping display source names to regulator sets
+    For one to three sources, the summary type is "single", "double" or "triple" and
+    includes the per-source counts and every intersection. For more than three sources
+    the type is "multiple" and includes the per-source counts and the N-way
+    intersection. Summaries of two or more sources also include the UpSet-style
+    "exclusive_intersections": a list of dicts with the display names of "sources" and
+    the "count" of regulators present in exactly those sources.
+
+    :param index: The RegulatorIntersectionIndex of the metadata
     :param selected_internal_names: List of selected internal source names (from UI)
     :param datatype: Either "binding" or "perturbation_response"
     :param logger: Logger instance
@@ -72,52 +241,88 @@ def create_intersection_summary(
         return {"type": "empty"}
 
     source_name_dict = get_source_name_dict(datatype)
-    selected_display_names = [
-        source_name_dict.get(name, name) for name in selected_internal_names
-    ]
+    names = list(selected_internal_names)
+    display_names = [source_name_dict.get(name, name) for name in names]
+    counts = [index.count(name) for name in names]
 
-    if len(selected_display_names) > 3:
-        selected_display_names = selected_display_names[:3]
+    if len(names) == 1:
+        return {"type": "single", "source": display_names[0], "count": counts[0]}
 
-    if len(selected_display_names) == 1:
-        source = selected_display_names[0]
-        count = len(regulators_dict.get(source, set()))
-        return {"type": "single", "source": source, "count": count}
+    exclusive_intersections = [
+        {
+            "sources": [source_name_dict.get(name, name) for name in combination],
+            "count": count,
+        }
+        for combination, count in sorted(
+            index.exclusive_intersections(names).items(),
+            key=lambda item: (-len(item[0]), -item[1]),
+        )
+    ]
 
-    elif len(selected_display_names) == 2:
-        source1, source2 = selected_display_names
-        set1 = regulators_dict.get(source1, set())
-        set2 = regulators_dict.get(source2, set())
-        intersection = set1 & set2
+    def n_shared(*sources: str) -> int:
+        return index.intersection(sources).bit_count()
 
-        return {
+    if len(names) == 2:
+        summary = {
             "type": "double",
-            "sources": [source1, source2],
-            "counts": [len(set1), len(set2)],
-            "intersection": len(intersection),
+            "sources": display_names,
+            "counts": counts,
+            "intersection": n_shared(*names),
+        }
+    elif len(names) == 3:
+        name1, name2, name3 = names
+        summary = {
+            "type": "triple",
+            "sources": display_names,
+            "counts": counts,
+            "pairwise_intersections": [
+                n_shared(name1, name2),
+                n_shared(name1, name3),
+                n_shared(name2, name3),
+            ],
+            "triple_intersection": n_shared(*names),
+        }
+    else:
+        summary = {
+            "type": "multiple",
+            "sources": display_names,
+            "counts": counts,
+            "intersection": n_shared(*names),
         }
 
-    elif len(selected_display_names) == 3:
-        source1, source2, source3 = selected_display_names
-        set1 = regulators_dict.get(source1, set())
-        set2 = regulators_dict.get(source2, set())
-        set3 = regulators_dict.get(source3, set())
+    summary["exclusive_intersections"] = exclusive_intersections
+    logger.debug(f"Intersection summary for {names}: {summary}")
+    return summary
 
-        # Calculate pairwise intersections
-        int_12 = set1 & set2
-        int_13 = set1 & set3
-        int_23 = set2 & set3
-        int_123 = set1 & set2 & set3
 
-        return {
-            "type": "triple",
-            "sources": [source1, source2, source3],
-            "counts": [len(set1), len(set2), len(set3)],
-            "pairwise_intersections": [len(int_12), len(int_13), len(int_23)],
-            "triple_intersection": len(int_123),
-        }
+def exclusive_intersections_ui(summary: dict, max_rows: int = 10) -> ui.Tag:
+    """
+    Render the "exclusive_intersections" of a summary: the number of regulators
+    present in exactly each combination of the selected sources.
+
+    :param summary: A summary returned by `create_intersection_summary`
+    :param max_rows: The maximum number of combinations to list. The largest
+        combinations are listed first
+    :return: A div with a heading and one line per combination. Empty if the summary
+        has no exclusive intersections
 
-    return {"type": "empty"}
+    """
+    combinations = summary.get("exclusive_intersections", [])
+    if not combinations:
+        return ui.div()
+    rows = [
+        ui.p(f"{' ∩ '.join(item['sources'])}: {item['count']} regulators")
+        for item in combinations[:max_rows]
+    ]
+    if len(combinations) > max_rows:
+        rows.append(
+            ui.p(f"... and {len(combinations) - max_rows} more", class_="text-muted")
+        )
+    return ui.div(
+        ui.h5("Regulators in Exactly These Sources:"),
+        *rows,
+        style="margin-top: 20px;",
+    )
 
 
 class SourceIntersectionCalculator:
@@ -183,9 +388,7 @@ class SourceIntersectionCalculator:
         :return: Summary dictionary
 
         """
-        regulators_dict = self.calculate_regulators_by_source(
-            metadata_task, selected_internal_names
-        )
+        index = get_regulator_index(metadata_task.result())
         return create_intersection_summary(
-            regulators_dict, selected_internal_names, self.datatype, self.logger
+            index, selected_internal_names, self.datatype, self.logger
         )
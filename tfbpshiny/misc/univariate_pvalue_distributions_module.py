@@ -40,5 +40,5 @@ def univariate_pvalue_distributions_server(
             return px.scatter(title="No data to plot")
 
         return create_distribution_plot(
-            metadata, "univariate_pvalue", "Univariate P-value"
+            metadata, "univariate_pvalue", "Univariate P-value", summarize=True
         )
@@ -39,4 +39,6 @@ def rank_response_distributions_server(
         if metadata.empty:
             return px.scatter(title="No data to plot")
 
-        return create_distribution_plot(metadata, "rank_25", "Rank Response P-value")
+        return create_distribution_plot(
+            metadata, "rank_25", "Rank Response P-value", summarize=True
+        )
@@ -1,14 +1,16 @@
 from logging import Logger
 
-from shiny import Inputs, Outputs, Session, module, reactive, render, req, ui
+import pandas as pd
+from shiny import Inputs, Outputs, Session, module, reactive, req, ui
 
 # note that this isn't part of the public API. Possibly unstable
 from shiny.render._data_frame_utils._types import StyleInfo
 
+from ..misc.paged_table_module import paged_table_server, paged_table_ui
 from ..utils.apply_column_names import apply_column_names
+from ..utils.identity_cache import IdentityCache
 from ..utils.rename_dataframe_data_sources import rename_dataframe_data_sources
-from ..utils.safe_percentage_format import safe_percentage_format
-from ..utils.safe_sci_notatation import safe_sci_notation
+from ..utils.vectorized_format import format_percentage, format_sci_notation
 
 # Replicate details table column metadata for selection
 RR_COLUMN_METADATA = {
@@ -77,6 +79,22 @@ RR_CHOICES_DICT = {
     key: ui.span(label, title=desc) for key, (label, desc) in RR_COLUMN_METADATA.items()
 }
 
+# The display format of the numeric columns. Each column is formatted in one
+# vectorized pass
+COLUMN_FORMATTERS = {
+    **{
+        col: format_sci_notation
+        for col in [
+            "univariate_pvalue",
+            "univariate_rsquared",
+            "dto_fdr",
+            "dto_empirical_pvalue",
+            "random_expectation",
+        ]
+    },
+    **{col: format_percentage for col in ["rank_25", "rank_50"]},
+}
+
 # Default selection for replicate details table
 DEFAULT_RR_COLUMNS = [
     "univariate_rsquared",
@@ -88,7 +106,7 @@ DEFAULT_RR_COLUMNS = [
 
 @module.ui
 def expression_source_table_ui():
-    return ui.output_data_frame("expression_source_table")
+    return paged_table_ui("expression_source_table")
 
 
 @module.server
@@ -114,18 +132,33 @@ def expression_source_table_server(
 
     """
 
-    @render.data_frame
-    def expression_source_table():
-        req(rr_metadata)
-        req(selected_columns)
+    # the formatted numeric columns of the current metadata frame. These are reused
+    # when the table is re-rendered for a change which does not affect them, e.g. the
+    # highlighted rows or the other selected columns
+    formatted_columns: IdentityCache[pd.Series] = IdentityCache(
+        maxsize=2 * len(COLUMN_FORMATTERS)
+    )
 
-        df_local = rr_metadata().copy()  # type: ignore
+    @reactive.calc
+    def source_metadata():
+        req(rr_metadata)
+        df_local = rr_metadata()  # type: ignore
 
         # Filter for specific expression source
-        df_local = df_local[df_local["expression_source"] == expression_source]
+        return df_local[df_local["expression_source"] == expression_source]
+
+    def format_column(df_local: pd.DataFrame, col: str) -> pd.Series:
+        formatter = COLUMN_FORMATTERS.get(col)
+        if formatter is None:
+            return df_local[col]
+        return formatted_columns.get(
+            df_local, lambda: formatter(df_local[col]), key=col
+        )
 
-        # Get selected promotersetsigs for highlighting
-        selected_promotersetsigs_local = selected_promotersetsigs.get()
+    @reactive.calc
+    def formatted_table():
+        req(selected_columns)
+        df_local = source_metadata()
 
         # Get selected columns from the accordion
         selected_cols = selected_columns()  # type: ignore
@@ -136,67 +169,48 @@ def expression_source_table_server(
         ]
 
         # Filter to only show columns that exist in the dataframe and are selected
-        available_columns = [col for col in columns_to_show if col in df_local.columns]
-
-        if available_columns:
-            df_local = df_local[available_columns]
-
-        df_local = rename_dataframe_data_sources(df_local)
+        available_columns = [
+            col for col in columns_to_show if col in df_local.columns
+        ] or list(df_local.columns)
 
-        sci_notation_cols = [
-            "univariate_pvalue",
-            "univariate_rsquared",
-            "dto_fdr",
-            "dto_empirical_pvalue",
-            "random_expectation",
-        ]
-
-        percentage_cols = [
-            "rank_25",
-            "rank_50",
-        ]
+        df_table = pd.DataFrame(
+            {col: format_column(df_local, col) for col in available_columns}
+        )
 
-        # Format scientific notation columns
-        existing_sci_cols = [
-            col for col in sci_notation_cols if col in df_local.columns
-        ]
-        if existing_sci_cols:
-            df_local[existing_sci_cols] = df_local[existing_sci_cols].applymap(
-                safe_sci_notation
-            )
-
-        # Format percentage columns
-        existing_percentage_cols = [
-            col for col in percentage_cols if col in df_local.columns
-        ]
-        if existing_percentage_cols:
-            df_local[existing_percentage_cols] = df_local[
-                existing_percentage_cols
-            ].applymap(safe_percentage_format)
+        df_table = rename_dataframe_data_sources(df_table)
 
         # Apply friendly column names from metadata
-        df_local = apply_column_names(df_local, RR_COLUMN_METADATA)
+        df_table = apply_column_names(df_table, RR_COLUMN_METADATA)
+
+        return df_table.reset_index(drop=True)
 
-        df_local.reset_index(drop=True, inplace=True)
+    def highlight_selected(df_page: pd.DataFrame) -> StyleInfo | None:
+        """Highlight the rows of the current page which match the selection."""
+        # Get selected promotersetsigs for highlighting
+        selected_promotersetsigs_local = selected_promotersetsigs.get()
 
         # Create styles for highlighting rows that match selection
         styles: StyleInfo | None = None
         if selected_promotersetsigs_local:
             promotersetsig_col = "id"
-            if promotersetsig_col in df_local.columns:
-                matching_rows = df_local[
-                    df_local[promotersetsig_col].isin(selected_promotersetsigs_local)
+            if promotersetsig_col in df_page.columns:
+                matching_rows = df_page[
+                    df_page[promotersetsig_col].isin(selected_promotersetsigs_local)
                 ].index.tolist()
 
                 if matching_rows:
                     styles = {
                         "rows": matching_rows,
-                        "cols": list(range(len(df_local.columns))),
+                        "cols": list(range(len(df_page.columns))),
                         "style": {"background-color": "#e6fffa"},
                     }
 
-        return render.DataGrid(
-            df_local,
-            selection_mode="none",
-            styles=styles,
-        )
+        return styles
+
+    # only the current page of the table is sent to the browser
+    paged_table_server(
+        "expression_source_table",
+        data=formatted_table,
+        styles=highlight_selected,
+        logger=logger,
+    )
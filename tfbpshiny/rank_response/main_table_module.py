@@ -1,7 +1,8 @@
 from logging import Logger
 
-from shiny import Inputs, Outputs, Session, module, reactive, render, req, ui
+from shiny import Inputs, Outputs, Session, module, reactive, req, ui
 
+from ..misc.paged_table_module import paged_table_server, paged_table_ui
 from ..utils.apply_column_names import apply_column_names
 from ..utils.rename_dataframe_data_sources import rename_dataframe_data_sources
 
@@ -49,7 +50,7 @@ DEFAULT_MAIN_TABLE_COLUMNS = [
 
 @module.ui
 def main_table_ui():
-    return ui.output_data_frame("main_table")
+    return paged_table_ui("main_table")
 
 
 @module.server
@@ -75,13 +76,11 @@ def main_table_server(
 
     """
 
-    df_local_reactive: reactive.value = reactive.Value()
-
-    @render.data_frame
-    def main_table():
+    @reactive.calc
+    def main_table_data():
         req(rr_metadata)
         req(selected_columns)
-        rr_df = rr_metadata().copy()  # type: ignore
+        rr_df = rr_metadata()  # type: ignore
 
         qc_df = bindingmanualqc_result.result()
 
@@ -135,25 +134,28 @@ def main_table_server(
         main_df.sort_index(ascending=True, inplace=True)
         main_df.reset_index(inplace=True)
 
-        df_local_reactive.set(main_df)
+        return main_df
 
-        return render.DataGrid(
-            main_df,
-            selection_mode="rows",
-        )
+    # a large table is paged, and only the current page is sent to the browser. The
+    # selection is kept by promotersetsig across pages
+    selected_rows = paged_table_server(
+        "main_table",
+        data=main_table_data,
+        selection_mode="rows",
+        id_column="id",
+        logger=logger,
+    )
 
     @reactive.calc
     def get_selected_promotersetsigs():
         """A reactive calc that gets from the main table the selected rows, and returns
         the set of promotersetsigs corresponding to those rows."""
-        req(df_local_reactive)
-        selected_rows = main_table.cell_selection()["rows"]
-        df_local = df_local_reactive.get()
-        if not selected_rows or df_local.empty:
+        df_local = selected_rows()
+        if df_local.empty:
             return set()
         promotersetsig_col = "id"
         if promotersetsig_col in df_local.columns:
-            return set(df_local.loc[list(selected_rows), promotersetsig_col])
+            return set(df_local[promotersetsig_col])
         return set()
 
     return get_selected_promotersetsigs
@@ -7,18 +7,16 @@ creates cells in the .py file).
 
 """
 
+import asyncio
 from logging import Logger
 
-from pandas.errors import EmptyDataError
 from shiny import Inputs, Outputs, Session, module, reactive, render, req, ui
 from shinywidgets import output_widget, render_plotly
-from tfbpapi import RankResponseAPI
 
+from ..utils.output_registry import OutputRegistry
 from ..utils.plot_formatter import plot_formatter
-from ..utils.rank_response_replicate_plot_utils import (
-    create_rank_response_replicate_plot,
-    prepare_rank_response_data,
-)
+from ..utils.rank_response_replicate_plot_utils import replicate_trace_visibility
+from ..utils.replicate_store import ReplicateStore, merge_replicate_data
 from ..utils.source_name_lookup import get_source_name_dict
 
 
@@ -43,18 +41,37 @@ def rank_response_replicate_plot_server(
     output: Outputs,
     session: Session,
     *,
-    selected_regulator: reactive.value,
+    selected_regulators: reactive.calc,
     selected_promotersetsigs: reactive.value,
+    rank_response_metadata: reactive.ExtendedTask,
+    replicate_store: ReplicateStore,
     logger: Logger,
 ):
     """
-    This function produces the reactive/render functions necessary to producing the rank
-    response replicate plots. All arguments must be passed as keyword arguments.
+    This function produces the reactive/render functions necessary to producing the
+    rank response replicate plots. All arguments must be passed as keyword arguments.
 
     Unlike most of the other modules, this does hit the database. It is an ExtendedTask
-    request and can be quite log if there are many replicates.
-
-    :param selected_regulator: A reactive value that contains the selected regulator
+    request and can be quite log if there are many replicates. The data and the
+    prepared plots are retrieved from `replicate_store`, which keeps them on local disk
+    and in memory, and prefetches the regulators which are likely to be selected. The
+    entries are keyed on the regulator's rank response metadata ids, so adding or
+    removing replicates in the database invalidates them.
+
+    More than one regulator can be selected, to compare their replicates. Their data
+    is retrieved concurrently, and streamed in one part per regulator and expression
+    condition. Each part is plotted, in a worker process so that a regulator with
+    many replicates does not block the other sessions, and shown as soon as it
+    arrives. Changing the selection cancels the fetch and plot preparation for the
+    previous one.
+
+    :param selected_regulators: A reactive calc that returns the list of selected
+        regulator ids
+    :param selected_promotersetsigs: A reactive value that contains the promotersetsigs
+        selected in the main table
+    :param rank_response_metadata: This is the result from a reactive.extended_task.
+        Result can be retrieved with .result()
+    :param replicate_store: The process-wide ReplicateStore
     :param logger: A logger object
     :return: A reactive value that contains the rank response metadata
 
@@ -63,85 +80,131 @@ def rank_response_replicate_plot_server(
 
     rr_metadata = reactive.Value()  # type: ignore
 
-    # Fetch data asynchronously -- see the main app for documentation on this pattern
-    # of async fetching
+    # The figures, keyed on expression source and then expression id. They are set
+    # by `fetch_plots` as each part of the data is plotted
+    plots = reactive.value({})
+
+    async def publish(plots_by_source, metadata):
+        # an extended task runs outside of the reactive graph, so the values are set
+        # under the reactive lock and flushed to send the partial plots right away
+        async with reactive.lock():
+            plots.set(plots_by_source)
+            if metadata is None:
+                rr_metadata.unset()
+            else:
+                rr_metadata.set(metadata)
+            await reactive.flush()
+
+    def merge_plots(plots_by_source, part):
+        merged = {
+            source: {**plots_by_source.get(source, {}), **part.get(source, {})}
+            for source in {*plots_by_source, *part}
+        }
+        return dict(sorted(merged.items()))
+
+    # Fetch the data and prepare the plots asynchronously -- see the main app for
+    # documentation on this pattern. The data is streamed from `replicate_store` one
+    # part at a time, and each part is plotted in a worker process as soon as it
+    # arrives, so the first plots are shown while the rest are still being retrieved
     @reactive.extended_task
-    async def fetch_data(regulator):
-        with ui.Progress(min=0, max=1) as p:
-            p.set(
-                0.5,
-                message="Pulling RankResponse data",
-                detail="This may take a while...",
-            )
-            rank_response_api = RankResponseAPI(
-                params={
-                    "regulator_id": regulator,
-                    "expression_conditions": (
-                        "expression_source=kemmeren_tfko;"
-                        "expression_source=mcisaac_oe,time=15"
-                    ),
-                }
+    async def fetch_plots(requests, total):
+        key = replicate_store.key_many(requests)
+        regulators = [regulator for regulator, _ in requests]
+        try:
+            # data which another session is still retrieving is streamed below
+            cached = await asyncio.gather(
+                *[replicate_store.cached(*request, wait=False) for request in requests]
             )
-            logger.info(
-                "Fetching data from RankResponseAPI with params: "
-                f"{rank_response_api.params}"
-            )
-            try:
-                result = await rank_response_api.read(retrieve_files=True)
-            except EmptyDataError as exc:
-                logger.error(f"Failed to fetch data for regulator {regulator}: {exc}")
-                result = {}
-            return result
-
-    @reactive.effect
-    def _():
-        req(selected_regulator)
-        selected_regulator_local = selected_regulator.get()
-        if selected_regulator_local:
-            logger.info(
-                f"Selected regulator for rank response "
-                f"plots: {selected_regulator_local}"
+            if all(result is not None for result in cached):
+                logger.info(
+                    f"Rank response data for regulators {regulators} read from cache"
+                )
+                rr_dict = merge_replicate_data(cached)
+                if not rr_dict:
+                    logger.warning("No data retrieved for plots.")
+                    await publish({}, None)
+                    return
+                await publish(
+                    await replicate_store.prepare(key, rr_dict), rr_dict["metadata"]
+                )
+                return
+
+            # title the plots of every part alike when regulators are compared
+            label_regulators = len(requests) > 1
+            parts = []
+            plots_by_source: dict = {}
+            with ui.Progress(min=0, max=max(total, 1)) as p:
+                p.set(
+                    0,
+                    message="Pulling RankResponse data",
+                    detail="This may take a while...",
+                )
+                async for part in replicate_store.stream(requests):
+                    parts.append(part)
+                    plots_by_source = merge_plots(
+                        plots_by_source,
+                        await replicate_store.prepare_part(part, label_regulators),
+                    )
+                    received = sum(len(x["metadata"]) for x in parts)
+                    p.set(received, detail=f"Plotted {received} of {total} replicates")
+                    await publish(
+                        plots_by_source, merge_replicate_data(parts)["metadata"]
+                    )
+        except Exception as exc:
+            # nothing reads the result of this task, so the error is reported here,
+            # and the plots of the previous selection are cleared
+            logger.error(f"Failed to plot regulators {regulators}: {exc}")
+            ui.notification_show(
+                f"Failed to plot the rank response replicates of "
+                f"{', '.join(regulators)}: {exc}",
+                type="error",
+                duration=None,
             )
-            fetch_data(selected_regulator_local)
+            await publish({}, None)
+            return
 
-    # Process fetched data into plot dictionary
-    @reactive.calc
-    def update_plot_dict():
-        rr_dict = fetch_data.result()
-        if not rr_dict:
+        if not parts:
             logger.warning("No data retrieved for plots.")
-            return {}
-
-        metadata = rr_dict.get("metadata")
-        rr_metadata.set(metadata)
-        expression_sources = metadata["expression_source"].unique()
-        # Sort the expression sources alphabetically for consistent plot order
-        sorted_expression_sources = sorted(list(expression_sources))
+            await publish({}, None)
+            return
         logger.info(
-            "Derived and sorted expression_sources order: %s",
-            list(sorted_expression_sources),
+            "Derived and sorted expression_sources order: %s", list(plots_by_source)
         )
+        await replicate_store.keep_prepared(key, plots_by_source)
 
-        plot_dict_by_source = {}
-        promotersetsig_set = set()
-        for source in sorted_expression_sources:  # Iterate over the sorted list
-            filtered_metadata = metadata[metadata["expression_source"] == source]
-            try:
-                promotersetsig_set.update(
-                    [str(x) for x in filtered_metadata.promotersetsig.unique().tolist()]
-                )
-            except AttributeError:
-                logger.warning(
-                    f"Expression source {source} has no promotersetsig data."
+    @reactive.effect
+    def _():
+        selected_regulators_local = [x for x in selected_regulators() if x]
+        req(selected_regulators_local)
+        logger.info(
+            f"Selected regulators for rank response plots: {selected_regulators_local}"
+        )
+        rank_response_metadata_local = rank_response_metadata.result()
+        requests = []
+        # the number of replicates which are retrieved, for the progress bar
+        total = 0
+        for regulator in selected_regulators_local:
+            replicate_store.record_access(regulator)
+            # the ids of the regulator's replicates identify the version of the data
+            requests.append(
+                (
+                    regulator,
+                    replicate_store.dataset_version(
+                        rank_response_metadata_local, regulator
+                    ),
                 )
-            plot_dict_by_source[source] = prepare_rank_response_data(
-                {"metadata": filtered_metadata, "data": rr_dict.get("data")}
             )
+            total += replicate_store.condition_replicates(
+                rank_response_metadata_local, regulator
+            )
+        # drop the work for a previous selection which is still running or queued,
+        # rather than waiting for it to finish
+        fetch_plots.cancel()
+        fetch_plots(requests, total)
 
-        # add random to the list so that it is initially visible
-        promotersetsig_set.add("Random")
-
-        return plot_dict_by_source
+    @reactive.calc
+    def update_plot_dict():
+        return plots()
 
     # Prepare dynamic UI
     @reactive.Calc
@@ -181,12 +244,51 @@ def rank_response_replicate_plot_server(
 
         return ui.div(*widgets)
 
+    # the plot outputs of the current regulator. The outputs of a previous regulator
+    # are removed when its plots are replaced
+    plot_outputs = OutputRegistry(output, name="replicate plot", logger=logger)
+    # the figure of each registered output, so that the plots which are already
+    # rendered are not sent again when another part of the data is plotted
+    rendered_figs: dict = {}
+
+    def set_trace_visibility(fig, selected_promotersetsig_local):
+        for trace, visible in zip(
+            fig["data"],
+            replicate_trace_visibility(fig["data"], selected_promotersetsig_local),
+        ):
+            if visible is not None:
+                trace["visible"] = visible
+
     def register_plot_output(plot_id, fig):
-        @output(id=plot_id)
+        # the figure is rendered once per regulator, with the selection at that time
         @render_plotly
-        def _():
+        def plot():
+            with reactive.isolate():
+                set_trace_visibility(fig, selected_promotersetsigs.get())
             return plot_formatter(fig)
 
+        # a change to the selection then only restyles the traces whose visibility
+        # changes, in the figure which is already in the browser
+        @reactive.effect
+        def restyle():
+            widget = plot.widget
+            visibility = replicate_trace_visibility(
+                widget.data, selected_promotersetsigs.get()
+            )
+            changed = [
+                i
+                for i, (trace, visible) in enumerate(zip(widget.data, visibility))
+                if visible is not None and trace.visible != visible
+            ]
+            if changed:
+                logger.debug(f"Restyling {len(changed)} traces of {plot_id}")
+                widget.plotly_restyle(
+                    {"visible": [visibility[i] for i in changed]},
+                    trace_indexes=changed,
+                )
+
+        plot_outputs.register(plot_id, plot, restyle)
+
     # Render dynamic UI
     @output
     @render.ui
@@ -219,38 +321,32 @@ def rank_response_replicate_plot_server(
     def overexpression_expression_container():
         return prepare_source_ui("mcisaac_oe")
 
-    # Render plots dynamically
+    # Render plots dynamically. This does not depend on the selection, so each figure
+    # is sent to the browser once per regulator
     @reactive.effect()
     def _():
         plots_by_source = update_plot_dict()
         if not plots_by_source:
+            plot_outputs.retain([])
+            rendered_figs.clear()
             logger.warning("No rank response replicate plots to render.")
             return
 
+        plot_ids = []
         for source, plots_dict in plots_by_source.items():
-            for expression_id, fig in create_rank_response_replicate_plot(
-                plots_dict
-            ).items():
+            for expression_id, fig in plots_dict.items():
                 plot_id = f"plot_{source}_{expression_id}"
-                selected_promotersetsig_local = selected_promotersetsigs.get()
-
-                if selected_promotersetsig_local:
-                    for trace in fig["data"]:
-                        if trace["meta"]:
-                            logger.debug(
-                                f"Setting visibility for trace {trace['name']} "
-                                f"based on selected promotersetsig: "
-                                f"{trace['meta']['promotersetsig']}"
-                            )
-                            trace["visible"] = (
-                                True
-                                if int(trace["meta"]["promotersetsig"])
-                                in selected_promotersetsig_local
-                                else "legendonly"
-                            )
-
-                register_plot_output(plot_id, fig)
-
-        logger.info("Rank response plots rendered successfully.")
+                if rendered_figs.get(plot_id) is not fig:
+                    register_plot_output(plot_id, fig)
+                    rendered_figs[plot_id] = fig
+                plot_ids.append(plot_id)
+        plot_outputs.retain(plot_ids)
+        for plot_id in set(rendered_figs) - set(plot_ids):
+            del rendered_figs[plot_id]
+
+        logger.info(
+            "Rank response plots rendered successfully. "
+            f"{len(plot_outputs)} plot outputs in session {session.id}"
+        )
 
     return rr_metadata
@@ -17,6 +17,7 @@ from ..rank_response.distributions_module import (
 from ..utils.accordion_item_config import AccordionItemConfig
 from ..utils.create_accordion_panel import create_accordion_panel
 from ..utils.rename_dataframe_data_sources import get_source_name_dict
+from ..utils.source_pair_index import get_source_pair_index
 
 # these are used in the UI to set choices for the binding and perturbation response
 # choices. The display is the display name, the value is the data source level
@@ -205,7 +206,8 @@ def all_regulator_compare_server(
         This function filters the rank response metadata based on the selected data
         sources and returns the filtered DataFrame.
 
-        :return: A filtered DataFrame based on the selected data sources
+        :return: A filtered DataFrame based on the selected data sources. The frame is
+            shared between sessions and must not be mutated
 
         """
         rr_local = rank_response_metadata.result()
@@ -222,28 +224,17 @@ def all_regulator_compare_server(
             perturbation_response_data_sources,
         )
 
-        fltr_df = rr_local[
-            rr_local["binding_source"].isin(binding_data_sources)
-            & rr_local["expression_source"].isin(perturbation_response_data_sources)
-        ]
-
+        # the filtered frames are memoized on the selection and shared by every
+        # session
+        fltr_df = get_source_pair_index(rr_local).filter(
+            binding_data_sources,
+            perturbation_response_data_sources,
+            only_shared_regulators=only_shared_regulators,
+        )
         if only_shared_regulators:
-            regulator_sets = fltr_df.groupby(["binding_source", "expression_source"])[
-                "regulator_symbol"
-            ].apply(set)
-
-            if not regulator_sets.empty:
-                # get the intersection of all sets
-                shared_regulators = set.intersection(*regulator_sets)
-                # retain only the rows with the shared regulators
-                fltr_df = fltr_df[fltr_df["regulator_symbol"].isin(shared_regulators)]
-                logger.info(
-                    "Filtered to only shared regulators. "
-                    f"Resulting rows: {len(fltr_df)}"
-                )
-            else:
-                # No valid data, return empty DataFrame with same structure
-                fltr_df = fltr_df.iloc[0:0]
+            logger.info(
+                f"Filtered to only shared regulators. Resulting rows: {len(fltr_df)}"
+            )
 
         # Filter the rank response metadata based on the selected data sources
         return fltr_df
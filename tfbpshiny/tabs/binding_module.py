@@ -1,14 +1,17 @@
 from logging import Logger
 
-import pandas as pd
 from shiny import Inputs, Outputs, Session, module, reactive, render, ui
 
 from ..misc.correlation_plot_module import (
     correlation_matrix_server,
     correlation_matrix_ui,
 )
-from ..misc.source_intersection_calculator import SourceIntersectionCalculator
+from ..misc.source_intersection_calculator import (
+    SourceIntersectionCalculator,
+    exclusive_intersections_ui,
+)
 from ..utils.create_accordion_panel import create_accordion_panel
+from ..utils.predictor_store import load_predictor_matrix
 from ..utils.source_name_lookup import get_source_name_dict
 
 
@@ -21,7 +24,7 @@ def binding_ui():
         "Source Selection",
         ui.input_checkbox_group(
             "selected_sources",
-            label="Select Binding Sources (0-3):",
+            label="Select Binding Sources:",
             choices=binding_source_dict,
             selected=[],
         ),
@@ -272,8 +275,8 @@ def binding_server(
     """
 
     # TODO: retrieving the predictors should be from the db as a reactive.extended_task
-    tf_binding_df = pd.read_csv("tmp/shiny_data/cc_predictors_normalized.csv")
-    tf_binding_df.set_index("target_symbol", inplace=True)
+    # the matrix is memory mapped and shared by every session and worker process
+    tf_binding_df = load_predictor_matrix("tmp/shiny_data/cc_predictors_normalized.csv")
     correlation_matrix_server(
         "binding_corr_matrix",
         tf_binding_df=tf_binding_df,
@@ -296,19 +299,18 @@ def binding_server(
 
         logger.debug(f"binding_module: selected internal names from UI: {selected}")
 
-        # Limit to maximum 3 selections
-        if len(selected) > 3:
-            ui.update_checkbox_group("selected_sources", selected=selected[:3])
-            selected = selected[:3]
-
         if not selected:
             return ui.div(
                 ui.h4("How to Use"),
-                ui.p("Select 1-3 binding sources from the sidebar to see:"),
+                ui.p("Select one or more binding sources from the sidebar to see:"),
                 ui.tags.ul(
                     ui.tags.li("Number of regulators in each selected source"),
                     ui.tags.li("Intersections between sources (when 2+ selected)"),
-                    ui.tags.li("Three-way intersection (when 3 selected)"),
+                    ui.tags.li("Intersection of every source (when 3+ selected)"),
+                    ui.tags.li(
+                        "Regulators in exactly each combination of sources "
+                        "(when 2+ selected)"
+                    ),
                 ),
                 style="text-align: center; margin-top: 50px;",
             )
@@ -352,6 +354,7 @@ def binding_server(
                     ui.p(f"Intersection: {intersection} regulators"),
                     style="margin-top: 30px;",
                 ),
+                exclusive_intersections_ui(summary),
             )
 
         elif summary["type"] == "triple":
@@ -375,6 +378,23 @@ def binding_server(
                     ui.p(f"{source1} ∩ {source2} ∩ {source3}: {int_123} regulators"),
                     style="margin-top: 20px;",
                 ),
+                exclusive_intersections_ui(summary),
+            )
+
+        elif summary["type"] == "multiple":
+            return ui.div(
+                ui.h4(f"{len(summary['sources'])} Sources Selected"),
+                ui.div(
+                    ui.h5("Individual Sources:"),
+                    *[
+                        ui.p(f"{source}: {count} regulators")
+                        for source, count in zip(summary["sources"], summary["counts"])
+                    ],
+                    ui.h5("Intersection of Every Source:"),
+                    ui.p(f"{summary['intersection']} regulators"),
+                    style="margin-top: 20px;",
+                ),
+                exclusive_intersections_ui(summary),
             )
 
         return ui.div(
@@ -1,6 +1,6 @@
 from logging import Logger
 
-from shiny import Inputs, Outputs, Session, module, reactive, render, ui
+from shiny import Inputs, Outputs, Session, module, reactive, render, req, ui
 
 from ..rank_response.expression_source_table_module import (
     DEFAULT_RR_COLUMNS,
@@ -20,6 +20,14 @@ from ..rank_response.replicate_plot_module import (
     rank_response_replicate_plot_tfko_ui,
 )
 from ..utils.create_accordion_panel import create_accordion_panel
+from ..utils.regulator_choice_index import (
+    get_regulator_choice_index,
+    update_regulator_selectize,
+)
+from ..utils.replicate_store import ReplicateStore
+
+# the maximum number of regulators which can be compared with the selected regulator
+MAX_COMPARE_REGULATORS = 4
 
 
 def rr_plot_panel(label: str, output_id: str) -> ui.nav_panel:
@@ -48,6 +56,13 @@ def individual_regulator_compare_ui():
             selected=None,
             choices=[],
         ),
+        ui.input_selectize(
+            "compare_regulators",
+            label="Compare With",
+            choices=[],
+            multiple=True,
+            options={"maxItems": MAX_COMPARE_REGULATORS},
+        ),
     )
 
     main_table_columns_panel = create_accordion_panel(
@@ -111,7 +126,10 @@ def individual_regulator_compare_ui():
                     ui.tags.b("Main Selection Table"),
                     " on the right "
                     "to isolate a sample/samples in the plots and highlight the "
-                    "corresponding rows in the replicate details table.",
+                    "corresponding rows in the replicate details table. Add "
+                    "regulators to ",
+                    ui.tags.b("Compare With"),
+                    " to show their plots and replicates alongside.",
                 ),
                 ui.tags.ul(
                     ui.tags.li(
@@ -211,6 +229,7 @@ def individual_regulator_compare_server(
     *,
     rank_response_metadata: reactive.ExtendedTask,
     bindingmanualqc_result: reactive.ExtendedTask,
+    replicate_store: ReplicateStore,
     logger: Logger,
 ) -> None:
     """
@@ -222,6 +241,8 @@ def individual_regulator_compare_server(
         Result can be retrieved with .result()
     :param bindingmanualqc_result: This is the result from a reactive.extended_task.
         Result can be retrieved with .result()
+    :param replicate_store: The process-wide ReplicateStore for the rank response
+        replicate data and plots
     :param logger: A logger object
 
     """
@@ -253,7 +274,7 @@ def individual_regulator_compare_server(
     def _():
         """Update the regulator ui drop down selector based on the
         rank_response_metadata."""
-        rank_response_metadata_local = rank_response_metadata.result()
+        regulator_index = get_regulator_choice_index(rank_response_metadata.result())
 
         input_switch_value = input.symbol_locus_tag_switch.get()
 
@@ -263,27 +284,65 @@ def individual_regulator_compare_server(
             "regulator_symbol" if input_switch_value else "regulator_locus_tag"
         )
 
-        logger.info("regulator_col: %s", regulator_col)
-
-        regulator_dict = (
-            rank_response_metadata_local[["regulator_id", regulator_col]]
-            .drop_duplicates()
-            .sort_values(by=regulator_col)
-            .set_index("regulator_id")
-            .to_dict(orient="dict")
+        logger.info(
+            "regulator_col: %s, number of regulators: %s",
+            regulator_col,
+            len(regulator_index),
         )
 
-        logger.info("regulator_dict: %s", regulator_dict.keys())
+        # the choices are searched on the server, so only the matches are sent to
+        # the browser. Keep the current regulators selected when the label changes
+        with reactive.isolate():
+            selected = input.regulator()
+            compare_selected = list(input.compare_regulators() or [])
+
+        update_regulator_selectize(
+            session, "regulator", regulator_index, regulator_col, selected=selected
+        )
+        update_regulator_selectize(
+            session,
+            "compare_regulators",
+            regulator_index,
+            regulator_col,
+            selected=compare_selected,
+        )
 
-        ui.update_select("regulator", choices=regulator_dict)
+    @reactive.calc
+    def selected_regulators():
+        """The selected regulator, followed by the regulators it is compared with."""
+        regulators = [input.regulator(), *(input.compare_regulators() or [])]
+        return list(dict.fromkeys(x for x in regulators if x))
 
     rr_metadata = rank_response_replicate_plot_server(
         "rank_response_replicate_plot",
-        selected_regulator=input.regulator,
+        selected_regulators=selected_regulators,
         selected_promotersetsigs=selected_promotersetsigs_reactive,
+        rank_response_metadata=rank_response_metadata,
+        replicate_store=replicate_store,
         logger=logger,
     )
 
+    @reactive.effect
+    def _():
+        """Prefetch the regulators which are likely to be selected next: the
+        neighbors of the selected regulator in the selector, and the most popular."""
+        selected_regulator = input.regulator()
+        req(selected_regulator)
+        rank_response_metadata_local = rank_response_metadata.result()
+        with reactive.isolate():
+            regulator_col = (
+                "regulator_symbol"
+                if input.symbol_locus_tag_switch.get()
+                else "regulator_locus_tag"
+            )
+
+        neighbors = get_regulator_choice_index(rank_response_metadata_local).neighbors(
+            selected_regulator, regulator_col, n=replicate_store.neighbors
+        )
+        replicate_store.prefetch(
+            [*neighbors, *replicate_store.popular()], rank_response_metadata_local
+        )
+
     @reactive.calc
     def has_column_changes():
         """Reactive to check if there are changes in column selection."""
@@ -1,14 +1,17 @@
 from logging import Logger
 
-import pandas as pd
 from shiny import Inputs, Outputs, Session, module, reactive, render, ui
 
 from ..misc.correlation_plot_module import (
     correlation_matrix_server,
     correlation_matrix_ui,
 )
-from ..misc.source_intersection_calculator import SourceIntersectionCalculator
+from ..misc.source_intersection_calculator import (
+    SourceIntersectionCalculator,
+    exclusive_intersections_ui,
+)
 from ..utils.create_accordion_panel import create_accordion_panel
+from ..utils.predictor_store import load_predictor_matrix
 from ..utils.source_name_lookup import get_source_name_dict
 
 
@@ -21,7 +24,7 @@ def perturbation_response_ui():
         "Source Selection",
         ui.input_checkbox_group(
             "selected_sources",
-            label="Select Perturbation Response Sources (0-3):",
+            label="Select Perturbation Response Sources:",
             choices=perturbation_source_dict,
             selected=[],
         ),
@@ -293,8 +296,8 @@ def perturbation_response_server(
     """
 
     # TODO: retrieving the response should be from the db as a reactive.extended_task
-    tf_pr_df = pd.read_csv("tmp/shiny_data/response_data.csv")
-    tf_pr_df.set_index("target_symbol", inplace=True)
+    # the matrix is memory mapped and shared by every session and worker process
+    tf_pr_df = load_predictor_matrix("tmp/shiny_data/response_data.csv")
     correlation_matrix_server(
         "perturbation_corr_matrix",
         tf_binding_df=tf_pr_df,
@@ -319,21 +322,21 @@ def perturbation_response_server(
             f"perturbation_response_module: selected internal names from UI: {selected}"
         )
 
-        # Limit to maximum 3 selections
-        if len(selected) > 3:
-            ui.update_checkbox_group("selected_sources", selected=selected[:3])
-            selected = selected[:3]
-
         if not selected:
             return ui.div(
                 ui.h4("How to Use"),
                 ui.p(
-                    "Select 1-3 perturbation response sources from the sidebar to see:"
+                    "Select one or more perturbation response sources from the sidebar "
+                    "to see:"
                 ),
                 ui.tags.ul(
                     ui.tags.li("Number of regulators in each selected source"),
                     ui.tags.li("Intersections between sources (when 2+ selected)"),
-                    ui.tags.li("Three-way intersection (when 3 selected)"),
+                    ui.tags.li("Intersection of every source (when 3+ selected)"),
+                    ui.tags.li(
+                        "Regulators in exactly each combination of sources "
+                        "(when 2+ selected)"
+                    ),
                 ),
                 style="text-align: center; margin-top: 50px;",
             )
@@ -377,6 +380,7 @@ def perturbation_response_server(
                     ui.p(f"Intersection: {intersection} regulators"),
                     style="margin-top: 30px;",
                 ),
+                exclusive_intersections_ui(summary),
             )
 
         elif summary["type"] == "triple":
@@ -400,6 +404,23 @@ def perturbation_response_server(
                     ui.p(f"{source1} ∩ {source2} ∩ {source3}: {int_123} regulators"),
                     style="margin-top: 20px;",
                 ),
+                exclusive_intersections_ui(summary),
+            )
+
+        elif summary["type"] == "multiple":
+            return ui.div(
+                ui.h4(f"{len(summary['sources'])} Sources Selected"),
+                ui.div(
+                    ui.h5("Individual Sources:"),
+                    *[
+                        ui.p(f"{source}: {count} regulators")
+                        for source, count in zip(summary["sources"], summary["counts"])
+                    ],
+                    ui.h5("Intersection of Every Source:"),
+                    ui.p(f"{summary['intersection']} regulators"),
+                    style="margin-top: 20px;",
+                ),
+                exclusive_intersections_ui(summary),
             )
 
         return ui.div(
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tfbpshiny.misc.correlation_plot_module import (
+    ClusteredCorrelation,
+    cluster_corr_matrix_both,
+    get_clustered_correlation,
+)
+
+
+@pytest.fixture
+def tf_df():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        rng.random((100, 6)), columns=[f"TF{i}" for i in range(6)]
+    ).rename_axis("target_symbol")
+
+
+def test_clustered_matches_direct_computation(tf_df):
+    correlation = ClusteredCorrelation(tf_df)
+
+    pd.testing.assert_frame_equal(
+        correlation.clustered(), cluster_corr_matrix_both(tf_df.corr())
+    )
+
+
+def test_subset_matches_direct_computation(tf_df):
+    correlation = ClusteredCorrelation(tf_df)
+    columns = ["TF4", "TF0", "TF2"]
+
+    expected = cluster_corr_matrix_both(tf_df[sorted(columns)].corr())
+
+    pd.testing.assert_frame_equal(correlation.clustered(columns), expected)
+
+
+def test_results_are_memoized(tf_df, monkeypatch):
+    correlation = ClusteredCorrelation(tf_df)
+    correlation.clustered()
+    correlation.clustered(["TF0", "TF1"])
+
+    def fail(*args, **kwargs):
+        raise AssertionError("corr should not be recomputed")
+
+    monkeypatch.setattr(tf_df, "corr", fail)
+
+    # the full matrix is reused for subsets, and the order of the columns is ignored
+    assert correlation.clustered(["TF1", "TF0"]) is correlation.clustered(
+        ["TF0", "TF1"]
+    )
+    correlation.clustered(["TF3", "TF5"])
+
+
+def test_shared_between_callers(tf_df):
+    assert get_clustered_correlation(tf_df) is get_clustered_correlation(tf_df)
+    assert get_clustered_correlation(tf_df) is not get_clustered_correlation(
+        tf_df.copy()
+    )
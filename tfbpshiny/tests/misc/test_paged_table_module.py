@@ -0,0 +1,72 @@
+import pandas as pd
+import pytest
+
+from tfbpshiny.misc.paged_table_module import (
+    filter_and_sort,
+    page_count,
+    update_selection,
+)
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame(
+        {
+            "id": [3, 1, 2, 4],
+            "binding_source": [
+                "ChIP-chip",
+                "Calling Cards",
+                "ChIP-exo",
+                "Calling Cards",
+            ],
+            "rank_25": [0.5, 0.1, 0.5, None],
+        },
+        index=[10, 11, 12, 13],
+    )
+
+
+def test_filter_matches_any_column_ignoring_case(df):
+    assert filter_and_sort(df, "calling").index.tolist() == [11, 13]
+    assert filter_and_sort(df, "3").index.tolist() == [10]
+    assert filter_and_sort(df, "").index.tolist() == [10, 11, 12, 13]
+    assert filter_and_sort(df, "no match").empty
+
+
+def test_sort_is_stable(df):
+    assert filter_and_sort(df, sort_by="rank_25").index.tolist() == [11, 10, 12, 13]
+    assert filter_and_sort(df, sort_by="rank_25", descending=True).index.tolist() == [
+        10,
+        12,
+        11,
+        13,
+    ]
+    # an unknown column keeps the original order
+    assert filter_and_sort(df, sort_by="unknown_column").index.tolist() == [
+        10,
+        11,
+        12,
+        13,
+    ]
+
+
+@pytest.mark.parametrize("n_rows,expected", [(0, 1), (1, 1), (25, 1), (26, 2), (75, 3)])
+def test_page_count(n_rows, expected):
+    assert page_count(n_rows, 25) == expected
+
+
+def test_sort_formatted_numbers_by_value():
+    df = pd.DataFrame(
+        {
+            "pvalue": ["1.00e-03", "9.00e-05", None, "2.00e+00"],
+            "rank_25": ["9%", "10%", "100%", None],
+        }
+    )
+    assert filter_and_sort(df, sort_by="pvalue").index.tolist() == [1, 0, 3, 2]
+    assert filter_and_sort(df, sort_by="rank_25").index.tolist() == [0, 1, 2, 3]
+
+
+def test_update_selection_keeps_other_pages():
+    selected = frozenset({1, 2, 30})
+    # rows 1 and 2 are on the page, and only 2 is still selected
+    assert update_selection(selected, [1, 2, 3], [2, 3]) == {2, 3, 30}
+    assert update_selection(selected, [1, 2, 3], []) == {30}
@@ -0,0 +1,130 @@
+import logging
+from itertools import combinations
+
+import pandas as pd
+import pytest
+
+from tfbpshiny.misc.source_intersection_calculator import (
+    RegulatorIntersectionIndex,
+    calculate_regulators_by_source,
+    create_intersection_summary,
+    exclusive_intersections_ui,
+    get_regulator_index,
+)
+
+logger = logging.getLogger("shiny")
+
+REGULATORS = {
+    "harbison_chip": {"ACE2", "GCN4", "HAP2", "MSN2"},
+    "chipexo_pugh_allevents": {"GCN4", "HAP2", "SWI6"},
+    "brent_nf_cc": {"GCN4", "MSN2", "SWI6", "YAP1"},
+}
+
+
+@pytest.fixture
+def metadata():
+    rows = [
+        {"source_name": source, "regulator_symbol": regulator, "replicate": rep}
+        for source, regulators in REGULATORS.items()
+        for regulator in sorted(regulators)
+        # duplicate rows (replicates) must not affect the counts
+        for rep in range(2)
+    ]
+    return pd.DataFrame(rows)
+
+
+def test_counts_intersections_and_unions(metadata):
+    index = RegulatorIntersectionIndex.from_metadata(metadata)
+    sources = list(REGULATORS)
+
+    for source in sources:
+        assert index.count(source) == len(REGULATORS[source])
+        assert set(index.members(index.bitset(source))) == REGULATORS[source]
+
+    for n in range(1, len(sources) + 1):
+        for combination in combinations(sources, n):
+            expected_intersection = set.intersection(
+                *[REGULATORS[s] for s in combination]
+            )
+            expected_union = set.union(*[REGULATORS[s] for s in combination])
+            assert (
+                set(index.members(index.intersection(combination)))
+                == expected_intersection
+            )
+            assert set(index.members(index.union(combination))) == expected_union
+
+    assert index.count("not_a_source") == 0
+    assert index.intersection([]) == 0
+
+
+def test_exclusive_intersections(metadata):
+    index = RegulatorIntersectionIndex.from_metadata(metadata)
+
+    result = index.exclusive_intersections(list(REGULATORS))
+
+    assert result == {
+        ("harbison_chip",): 1,  # ACE2
+        ("brent_nf_cc",): 1,  # YAP1
+        ("harbison_chip", "chipexo_pugh_allevents"): 1,  # HAP2
+        ("harbison_chip", "brent_nf_cc"): 1,  # MSN2
+        ("chipexo_pugh_allevents", "brent_nf_cc"): 1,  # SWI6
+        ("harbison_chip", "chipexo_pugh_allevents", "brent_nf_cc"): 1,  # GCN4
+    }
+    assert sum(result.values()) == len(set.union(*REGULATORS.values()))
+
+
+def test_triple_summary(metadata):
+    index = get_regulator_index(metadata)
+
+    summary = create_intersection_summary(index, list(REGULATORS), "binding", logger)
+
+    assert summary["type"] == "triple"
+    assert summary["sources"] == ["ChIP-chip", "ChIP-exo", "Calling Cards"]
+    assert summary["counts"] == [4, 3, 4]
+    assert summary["pairwise_intersections"] == [2, 2, 2]
+    assert summary["triple_intersection"] == 1
+    assert summary["exclusive_intersections"][0] == {
+        "sources": ["ChIP-chip", "ChIP-exo", "Calling Cards"],
+        "count": 1,
+    }
+
+
+def test_single_and_empty_summary(metadata):
+    index = get_regulator_index(metadata)
+
+    assert create_intersection_summary(index, [], "binding", logger) == {
+        "type": "empty"
+    }
+    assert create_intersection_summary(index, ["brent_nf_cc"], "binding", logger) == {
+        "type": "single",
+        "source": "Calling Cards",
+        "count": 4,
+    }
+
+
+def test_calculate_regulators_by_source(metadata):
+    result = calculate_regulators_by_source(
+        metadata, ["harbison_chip", "brent_nf_cc"], "binding", logger
+    )
+
+    assert result == {
+        "ChIP-chip": REGULATORS["harbison_chip"],
+        "Calling Cards": REGULATORS["brent_nf_cc"],
+    }
+    assert (
+        calculate_regulators_by_source(metadata, ["missing"], "binding", logger) == {}
+    )
+
+
+def test_index_is_shared(metadata):
+    assert get_regulator_index(metadata) is get_regulator_index(metadata)
+
+
+def test_exclusive_intersections_ui(metadata):
+    index = RegulatorIntersectionIndex.from_metadata(metadata)
+    summary = create_intersection_summary(index, list(REGULATORS), "binding", logger)
+
+    html = str(exclusive_intersections_ui(summary, max_rows=2))
+    assert "ChIP-chip ∩ ChIP-exo ∩ Calling Cards: 1 regulators" in html
+    assert f"and {len(summary['exclusive_intersections']) - 2} more" in html
+    assert str(exclusive_intersections_ui({"type": "single"})) == "<div></div>"
@@ -0,0 +1,25 @@
+import pytest
+
+from tfbpshiny.__main__ import make_parser, run_shiny, run_workers
+
+
+def test_workers_default_to_one():
+    args = make_parser().parse_args(["shiny"])
+    assert args.workers == 1
+
+
+def test_workers_option():
+    args = make_parser().parse_args(["shiny", "--workers", "4", "--port", "8010"])
+    assert args.workers == 4
+    assert args.port == 8010
+
+
+def test_run_workers_requires_a_worker():
+    with pytest.raises(ValueError):
+        run_workers(8000, "127.0.0.1", 0)
+
+
+def test_debug_requires_a_single_worker():
+    args = make_parser().parse_args(["shiny", "--workers", "2", "--debug"])
+    with pytest.raises(ValueError):
+        run_shiny(args)
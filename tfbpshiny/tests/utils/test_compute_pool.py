@@ -0,0 +1,48 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from tfbpshiny.utils.compute_pool import ComputePool
+
+
+def slow_pid(seconds: float) -> int:
+    time.sleep(seconds)
+    return os.getpid()
+
+
+@pytest.fixture
+def pool():
+    pool = ComputePool(max_workers=1)
+    yield pool
+    pool.shutdown()
+
+
+def test_run_in_worker_process(pool):
+    pid = asyncio.run(pool.run(slow_pid, 0))
+    assert pid != os.getpid()
+
+
+def test_run_in_thread():
+    pool = ComputePool(max_workers=0)
+    assert asyncio.run(pool.run(slow_pid, 0)) == os.getpid()
+
+
+def test_invalid_max_workers():
+    with pytest.raises(ValueError):
+        ComputePool(max_workers=-1)
+
+
+def test_cancel_queued_job(pool):
+    async def run():
+        running = asyncio.create_task(pool.run(slow_pid, 0.5))
+        queued = asyncio.create_task(pool.run(slow_pid, 0))
+        await asyncio.sleep(0.1)
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        # the running job is unaffected
+        return await running
+
+    assert isinstance(asyncio.run(run()), int)
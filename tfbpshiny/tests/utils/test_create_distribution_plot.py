@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tfbpshiny.utils.create_distribution_plot import (
+    create_distribution_plot,
+    summarize_distribution,
+)
+
+
+@pytest.fixture
+def distribution_df():
+    rng = np.random.default_rng(0)
+    n = 3000
+    df = pd.DataFrame(
+        {
+            "binding_source": rng.choice(
+                ["harbison_chip", "chipexo_pugh_allevents", "brent_nf_cc"], n
+            ),
+            "expression_source": rng.choice(["mcisaac_oe", "kemmeren_tfko"], n),
+            "value": rng.standard_cauchy(n),
+        }
+    )
+    df.loc[::97, "value"] = np.nan
+    return df
+
+
+def test_summarize_distribution_matches_numpy(distribution_df):
+    stats, outliers = summarize_distribution(
+        distribution_df, "value", max_outliers=None
+    )
+
+    assert len(stats) == 6
+    for row in stats.itertuples(index=False):
+        values = distribution_df.loc[
+            (distribution_df["binding_source"] == row.binding_source)
+            & (distribution_df["expression_source"] == row.expression_source),
+            "value",
+        ].dropna()
+        q1, median, q3 = np.quantile(values, [0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        inliers = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+
+        assert row.n == len(values)
+        assert row.q1 == pytest.approx(q1)
+        assert row.median == pytest.approx(median)
+        assert row.q3 == pytest.approx(q3)
+        assert row.lowerfence == inliers.min()
+        assert row.upperfence == inliers.max()
+
+        group_outliers = outliers.loc[
+            (outliers["binding_source"] == row.binding_source)
+            & (outliers["expression_source"] == row.expression_source),
+            "value",
+        ]
+        assert len(group_outliers) == len(values) - len(inliers)
+
+
+def test_summarize_distribution_caps_outliers(distribution_df):
+    _, outliers = summarize_distribution(distribution_df, "value", max_outliers=5)
+    _, outliers_again = summarize_distribution(distribution_df, "value", max_outliers=5)
+
+    counts = outliers.groupby(["binding_source", "expression_source"]).size()
+    assert (counts <= 5).all()
+    # the sample is deterministic
+    pd.testing.assert_frame_equal(outliers, outliers_again)
+
+
+def test_create_distribution_plot_summarize(distribution_df):
+    fig = create_distribution_plot(
+        distribution_df, "value", "Value", summarize=True, max_outliers=5
+    )
+
+    boxes = [trace for trace in fig.data if trace.type == "box"]
+    assert len(boxes) == 6
+    # only the summary statistics are sent to the browser
+    assert all(box.y is None and len(box.q1) == 1 for box in boxes)
+    # the size of each group is shown on hover
+    stats, _ = summarize_distribution(distribution_df, "value")
+    for n in stats["n"]:
+        assert sum(f"n = {n}<" in box.hovertemplate for box in boxes) == 1
+    assert sum(box.showlegend for box in boxes) == 3
+    assert {a.text for a in fig.layout.annotations} >= {"Overexpression", "2014 TFKO"}
+    points = sum(len(trace.y) for trace in fig.data if trace.type == "scatter")
+    assert points <= 6 * 5
+
+
+@pytest.mark.parametrize("rows", [slice(0, 0), slice(None)])
+def test_summarize_without_values(distribution_df, rows):
+    df = distribution_df.iloc[rows].assign(value=np.nan)
+
+    stats, outliers = summarize_distribution(df, "value")
+    fig = create_distribution_plot(df, "value", "Value", summarize=True)
+
+    assert stats.empty and outliers.empty
+    assert {"q1", "median", "q3", "lowerfence", "upperfence", "n"} <= set(stats.columns)
+    assert list(outliers.columns) == ["binding_source", "expression_source", "value"]
+    assert not any(trace.type == "box" for trace in fig.data)
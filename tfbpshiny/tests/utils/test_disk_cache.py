@@ -0,0 +1,92 @@
+import os
+
+import pandas as pd
+import pytest
+
+from tfbpshiny.utils.disk_cache import DiskCache
+
+
+@pytest.fixture
+def rr_dict():
+    return {
+        "metadata": pd.DataFrame({"id": [1, 2], "expression_source": ["a", "b"]}),
+        "data": {"1": pd.DataFrame({"rank_bin": [5, 10], "responsive": [1, 0]})},
+    }
+
+
+def test_round_trip(tmp_path, rr_dict):
+    cache = DiskCache(tmp_path)
+    key = cache.key(regulator_id="1", expression_conditions="x")
+
+    assert cache.get(key) is None
+    cache.set(key, rr_dict)
+    res = cache.get(key)
+
+    pd.testing.assert_frame_equal(res["metadata"], rr_dict["metadata"])
+    pd.testing.assert_frame_equal(res["data"]["1"], rr_dict["data"]["1"])
+
+
+def test_key_is_content_addressed():
+    assert DiskCache.key(a=1, b="x") == DiskCache.key(b="x", a=1)
+    assert DiskCache.key(a=1, b="x") != DiskCache.key(a=2, b="x")
+
+
+def test_lru_eviction(tmp_path):
+    cache = DiskCache(tmp_path)
+    payload = b"x" * 1000
+    keys = [cache.key(i=i) for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.set(key, payload)
+        os.utime(cache._file(key), (i, i))
+
+    # access the first entry so that the second entry is the least recently used
+    cache.get(keys[0])
+    cache.max_bytes = 2500
+    cache.evict()
+
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[2]) is not None
+
+
+def test_version_change_invalidates(tmp_path, rr_dict):
+    key = DiskCache.key(regulator_id="1")
+    DiskCache(tmp_path, version="1").set(key, rr_dict)
+
+    assert DiskCache(tmp_path, version="1").get(key) is not None
+    assert DiskCache(tmp_path, version="2").get(key) is None
+    # a process may still use version 1, so its entries are kept
+    assert DiskCache(tmp_path, version="1").get(key) is not None
+
+
+def test_unused_versions_are_removed(tmp_path, rr_dict):
+    key = DiskCache.key(regulator_id="1")
+    old = DiskCache(tmp_path, version="1")
+    old.set(key, rr_dict)
+    recent = DiskCache(tmp_path, version="2")
+    recent.set(key, rr_dict)
+    for path in [old.path, old._file(key)]:
+        os.utime(path, (0, 0))
+
+    DiskCache(tmp_path, version="3", version_max_age=3600)
+
+    assert not old.path.exists()
+    assert recent.get(key) is not None
+
+
+def test_disabled_cache(tmp_path, rr_dict):
+    cache = DiskCache(tmp_path / "cache", max_bytes=0)
+    key = cache.key(regulator_id="1")
+    cache.set(key, rr_dict)
+
+    assert cache.get(key) is None
+    assert not (tmp_path / "cache").exists()
+
+
+def test_unreadable_entry_is_removed(tmp_path):
+    cache = DiskCache(tmp_path)
+    key = cache.key(regulator_id="1")
+    cache._file(key).write_bytes(b"not a pickle")
+
+    assert cache.get(key) is None
+    assert not cache._file(key).exists()
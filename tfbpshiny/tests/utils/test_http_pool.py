@@ -0,0 +1,144 @@
+import asyncio
+import sys
+from types import ModuleType
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from tfbpshiny.utils.http_pool import HttpPool
+
+
+async def serve(handler):
+    app = web.Application()
+    app.router.add_get("/", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"http://127.0.0.1:{port}/"
+
+
+@pytest.fixture
+def fake_package(monkeypatch):
+    """A package with a module which uses aiohttp the way tfbpapi does."""
+    module = ModuleType("fakeapi.records")
+    module.aiohttp = aiohttp  # type: ignore
+    imported = ModuleType("fakeapi.files")
+    imported.ClientSession = aiohttp.ClientSession  # type: ignore
+    monkeypatch.setitem(sys.modules, "fakeapi", ModuleType("fakeapi"))
+    monkeypatch.setitem(sys.modules, "fakeapi.records", module)
+    monkeypatch.setitem(sys.modules, "fakeapi.files", imported)
+    return module, imported
+
+
+def test_install(fake_package):
+    module, imported = fake_package
+    pool = HttpPool()
+
+    assert sorted(pool.install("fakeapi")) == ["fakeapi.files", "fakeapi.records"]
+
+    assert module.aiohttp.ClientSession == pool.session
+    assert imported.ClientSession == pool.session
+    # the rest of the namespace, and aiohttp itself, are unchanged
+    assert module.aiohttp.ClientTimeout is aiohttp.ClientTimeout
+    assert aiohttp.ClientSession is not pool.session
+
+
+def test_sessions_share_connections(fake_package):
+    module, _ = fake_package
+    pool = HttpPool(limit_per_host=2)
+    pool.install("fakeapi")
+    encodings = []
+
+    async def handler(request):
+        encodings.append(request.headers.get("Accept-Encoding"))
+        return web.Response(text="x" * 1000)
+
+    async def run():
+        runner, url = await serve(handler)
+        try:
+            # a new session per request, as in tfbpapi's .read()
+            for _ in range(3):
+                async with module.aiohttp.ClientSession() as session:
+                    async with session.get(url) as response:
+                        assert await response.text() == "x" * 1000
+            assert not pool.connector.closed
+        finally:
+            await pool.close()
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+    stats = pool.stats()
+    assert stats["requests"] == 3
+    assert stats["connections_created"] == 1
+    assert stats["connections_reused"] == 2
+    assert stats["reuse_ratio"] == pytest.approx(0.667)
+    # aiohttp asks for compressed responses by default
+    assert all("gzip" in encoding for encoding in encodings)
+
+
+def test_bound_to_one_loop():
+    pool = HttpPool(stats_interval=0)
+
+    async def open_connector():
+        return pool.connector
+
+    loop = asyncio.new_event_loop()
+    try:
+        connector = loop.run_until_complete(open_connector())
+        # the connections of the first loop can not be used in another one
+        with pytest.raises(RuntimeError):
+            asyncio.run(open_connector())
+        loop.run_until_complete(pool.close())
+        assert connector.closed
+        # once closed, the pool is reopened in the loop which uses it
+        other = asyncio.run(open_connector())
+        assert other is not connector
+    finally:
+        loop.close()
+
+    # the connector of a loop which was closed without closing the pool is replaced
+    assert asyncio.run(open_connector()) is not other
+
+
+def test_stats_logged_periodically(caplog):
+    pool = HttpPool(stats_interval=0.05)
+
+    async def handler(request):
+        return web.Response(text="x")
+
+    async def run():
+        runner, url = await serve(handler)
+        try:
+            async with pool.session() as session:
+                async with session.get(url) as response:
+                    await response.text()
+            await asyncio.sleep(0.12)
+        finally:
+            await pool.close()
+            await runner.cleanup()
+
+    with caplog.at_level("INFO", logger="shiny"):
+        asyncio.run(run())
+
+    lines = [r.message for r in caplog.records if "requests" in r.message]
+    # nothing is logged for an interval without requests
+    assert len(lines) == 1
+    assert lines[0].startswith("HTTP connection pool: 1 requests, 0 errors")
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"limit": -1},
+        {"limit_per_host": 1.5},
+        {"keepalive_timeout": 0},
+        {"stats_interval": -1},
+    ],
+)
+def test_invalid_limits(kwargs):
+    with pytest.raises(ValueError):
+        HttpPool(**kwargs)
@@ -0,0 +1,42 @@
+import pytest
+
+from tfbpshiny.utils.identity_cache import IdentityCache
+
+
+def test_value_is_created_once_per_object():
+    cache: IdentityCache[list] = IdentityCache()
+    obj_1, obj_2 = object(), object()
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return []
+
+    assert cache.get(obj_1, factory) is cache.get(obj_1, factory)
+    assert cache.get(obj_2, factory) is not cache.get(obj_1, factory)
+    assert len(calls) == 2
+
+
+def test_additional_key():
+    cache: IdentityCache[str] = IdentityCache()
+    obj = object()
+
+    assert cache.get(obj, lambda: "a", key="a") == "a"
+    assert cache.get(obj, lambda: "b", key="b") == "b"
+    assert cache.get(obj, lambda: "c", key="a") == "a"
+
+
+def test_lru_eviction():
+    cache: IdentityCache[int] = IdentityCache(maxsize=2)
+    objs = [object() for _ in range(3)]
+    for i, obj in enumerate(objs):
+        cache.get(obj, lambda i=i: i)
+
+    assert len(cache) == 2
+    # the first object was evicted, so the factory is called again
+    assert cache.get(objs[0], lambda: -1) == -1
+
+
+def test_invalid_maxsize():
+    with pytest.raises(ValueError):
+        IdentityCache(maxsize=0)
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tfbpshiny.misc.source_intersection_calculator import RegulatorIntersectionIndex
+from tfbpshiny.utils.metadata_schema import MetadataSchema
+from tfbpshiny.utils.source_pair_index import SourcePairIndex
+
+
+def make_metadata(n=300, seed=0, binding_sources=("harbison_chip", "brent_nf_cc")):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "id": np.arange(n),
+            "regulator_id": rng.integers(1, 40, n),
+            "composite_binding": np.where(rng.random(n) < 0.5, np.nan, 7.0),
+            "binding_source": rng.choice(list(binding_sources), n),
+            "expression_source": rng.choice(["mcisaac_oe", "kemmeren_tfko"], n),
+            "regulator_symbol": rng.choice([f"TF{i}" for i in range(30)], n),
+            "genomic_inserts": rng.integers(0, 10_000, n),
+            "dto_empirical_pvalue": rng.random(n) * 1e-100,
+        }
+    )
+
+
+def test_apply_schema_dtypes():
+    df = make_metadata()
+    typed = MetadataSchema().apply(df)
+
+    assert isinstance(typed["binding_source"].dtype, pd.CategoricalDtype)
+    assert isinstance(typed["regulator_symbol"].dtype, pd.CategoricalDtype)
+    assert typed["id"].dtype == "Int64"
+    # a missing foreign key is NA, rather than turning the column into floats
+    assert typed["composite_binding"].dtype == "Int64"
+    assert (
+        typed["composite_binding"].isna().sum() == df["composite_binding"].isna().sum()
+    )
+    assert typed["genomic_inserts"].dtype == np.int32
+    # floats are not downcast
+    assert typed["dto_empirical_pvalue"].dtype == np.float64
+    assert typed.memory_usage(deep=True).sum() < df.memory_usage(deep=True).sum()
+
+    # the values are unchanged
+    pd.testing.assert_frame_equal(
+        typed.astype(df.dtypes.to_dict()), df, check_dtype=False
+    )
+    # the input is not modified
+    assert df["binding_source"].dtype != "category"
+
+
+def test_dtypes_are_stable_across_refreshes():
+    schema = MetadataSchema()
+    first = schema.apply(make_metadata(seed=0))
+    second = schema.apply(make_metadata(seed=1))
+    assert first["binding_source"].dtype is second["binding_source"].dtype
+
+    # a new value extends the categories
+    third = schema.apply(
+        make_metadata(binding_sources=("harbison_chip", "chipexo_pugh_allevents"))
+    )
+    assert list(third["binding_source"].dtype.categories) == [
+        "brent_nf_cc",
+        "chipexo_pugh_allevents",
+        "harbison_chip",
+    ]
+
+
+def test_invalid_id_column():
+    df = make_metadata()
+    df["regulator_id"] = "not_a_number"
+    with pytest.raises(TypeError):
+        MetadataSchema().apply(df)
+
+
+def test_indices_are_unchanged_by_schema():
+    df = make_metadata()
+    typed = MetadataSchema().apply(df)
+
+    selection = (["harbison_chip"], ["mcisaac_oe", "kemmeren_tfko"], True)
+    pd.testing.assert_index_equal(
+        SourcePairIndex(typed).filter(*selection).index,
+        SourcePairIndex(df).filter(*selection).index,
+    )
+
+    index = RegulatorIntersectionIndex.from_metadata(df, source_col="binding_source")
+    typed_index = RegulatorIntersectionIndex.from_metadata(
+        typed, source_col="binding_source"
+    )
+    assert list(typed_index.regulators) == list(index.regulators)
+    assert typed_index.count("brent_nf_cc") == index.count("brent_nf_cc")
@@ -0,0 +1,110 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+from tfbpshiny.utils.metadata_store import MetadataStore
+
+
+class FakeAPI:
+    """Stand-in for a tfbpapi API class that counts calls to .read()"""
+
+    calls = 0
+
+    def __init__(self):
+        FakeAPI.calls += 1
+        self.call = FakeAPI.calls
+
+    async def read(self):
+        await asyncio.sleep(0.01)
+        return {"metadata": pd.DataFrame({"call": [self.call]})}
+
+
+class BrokenAPI:
+    """Stand-in for a tfbpapi API class whose .read() fails"""
+
+    async def read(self):
+        raise RuntimeError("database unavailable")
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    FakeAPI.calls = 0
+
+
+def test_concurrent_gets_share_one_fetch():
+    store = MetadataStore(ttl=60)
+    store.register("binding", FakeAPI)
+
+    async def run():
+        return await asyncio.gather(*[store.get("binding") for _ in range(50)])
+
+    results = asyncio.run(run())
+
+    assert FakeAPI.calls == 1
+    assert all(res is results[0] for res in results)
+    assert store.version("binding") == 1
+
+
+def test_fresh_value_is_served_from_memory():
+    store = MetadataStore(ttl=60)
+    store.register("binding", FakeAPI)
+
+    async def run():
+        await store.get("binding")
+        return await store.get("binding")
+
+    res = asyncio.run(run())
+
+    assert FakeAPI.calls == 1
+    assert res["call"].tolist() == [1]
+
+
+def test_stale_value_is_served_while_refreshing():
+    store = MetadataStore(ttl=60)
+    store.register("binding", FakeAPI)
+
+    async def run():
+        await store.get("binding")
+        store.invalidate("binding")
+        stale = await store.get("binding")
+        # give the background refresh a chance to finish
+        await asyncio.sleep(0.05)
+        fresh = await store.get("binding")
+        return stale, fresh
+
+    stale, fresh = asyncio.run(run())
+
+    assert stale["call"].tolist() == [1]
+    assert fresh["call"].tolist() == [2]
+    assert store.version("binding") == 2
+
+
+def test_failed_refresh_keeps_stale_value():
+    store = MetadataStore(ttl=60)
+    store.register("binding", FakeAPI)
+
+    async def run():
+        first = await store.get("binding")
+        store._api_factories["binding"] = BrokenAPI
+        store.invalidate()
+        await store.get("binding")
+        await asyncio.sleep(0.05)
+        return first, await store.get("binding")
+
+    first, after = asyncio.run(run())
+
+    assert after is first
+    assert store.version("binding") == 1
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        MetadataStore(ttl=0)
+
+    store = MetadataStore()
+    store.register("binding", FakeAPI)
+    with pytest.raises(ValueError):
+        store.register("binding", FakeAPI)
+    with pytest.raises(KeyError):
+        asyncio.run(store.get("not_registered"))
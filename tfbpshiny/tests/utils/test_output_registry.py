@@ -0,0 +1,77 @@
+import pytest
+from shiny import reactive
+
+from tfbpshiny.utils.output_registry import OutputRegistry
+
+
+class FakeOutputs:
+    """Records the outputs registered with, and removed from, a session."""
+
+    def __init__(self):
+        self.outputs = {}
+
+    def __call__(self, *, id):
+        def set_renderer(renderer):
+            self.outputs[id] = renderer
+            return renderer
+
+        return set_renderer
+
+    def remove(self, id):
+        del self.outputs[id]
+
+
+class FakeEffect:
+    def __init__(self):
+        self.destroyed = False
+
+    def destroy(self):
+        self.destroyed = True
+
+
+@pytest.fixture
+def output():
+    return FakeOutputs()
+
+
+def count(registry):
+    with reactive.isolate():
+        return registry.count.get()
+
+
+def test_register_replaces_output(output):
+    registry = OutputRegistry(output)
+    effect_1, effect_2 = FakeEffect(), FakeEffect()
+
+    registry.register("plot_a", "renderer 1", effect_1)
+    registry.register("plot_a", "renderer 2", effect_2)
+
+    assert output.outputs == {"plot_a": "renderer 2"}
+    assert effect_1.destroyed and not effect_2.destroyed
+    assert len(registry) == 1
+    assert count(registry) == 1
+
+
+def test_retain_removes_stale_outputs(output):
+    registry = OutputRegistry(output)
+    effects = {id: FakeEffect() for id in ["plot_a", "plot_b", "plot_c"]}
+    for id, effect in effects.items():
+        registry.register(id, f"renderer {id}", effect)
+    assert count(registry) == 3
+
+    registry.retain(["plot_b", "plot_d"])
+
+    assert list(output.outputs) == ["plot_b"]
+    assert "plot_b" in registry and "plot_a" not in registry
+    assert [effect.destroyed for effect in effects.values()] == [True, False, True]
+    assert count(registry) == 1
+
+    registry.retain([])
+    assert output.outputs == {}
+    assert count(registry) == 0
+
+
+def test_remove_unregistered_id_is_ignored(output):
+    registry = OutputRegistry(output)
+    registry.remove("plot_a")
+    assert len(registry) == 0
@@ -0,0 +1,97 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tfbpshiny.utils.predictor_store import (
+    convert_csv_to_store,
+    load_predictor_matrix,
+)
+
+
+@pytest.fixture
+def matrix_csv(tmp_path):
+    path = tmp_path / "predictors.csv"
+    pd.DataFrame(
+        {
+            "target_symbol": ["GENE1", "GENE2", "GENE3"],
+            "TF1": [1, 2, 3],
+            "TF2": [0.1, 0.5, 0.2],
+        }
+    ).to_csv(path, index=False)
+    yield path
+    load_predictor_matrix.cache_clear()
+
+
+def test_matches_read_csv(matrix_csv):
+    expected = pd.read_csv(matrix_csv).set_index("target_symbol").astype(float)
+
+    df = load_predictor_matrix(matrix_csv)
+
+    pd.testing.assert_frame_equal(df, expected)
+    assert matrix_csv.with_suffix(".store.json").exists()
+    assert len(list(matrix_csv.parent.glob("predictors.*.npy"))) == 1
+    assert len(list(matrix_csv.parent.glob("predictors.*.index.json"))) == 1
+
+
+def test_values_are_memory_mapped_and_shared(matrix_csv):
+    df = load_predictor_matrix(matrix_csv)
+
+    base = df.to_numpy()
+    while base is not None and not isinstance(base, np.memmap):
+        base = base.base
+    assert isinstance(base, np.memmap)
+    assert not df.to_numpy().flags.writeable
+    # every caller in the process shares the same frame
+    assert load_predictor_matrix(matrix_csv) is df
+
+
+def test_store_is_rebuilt_when_csv_changes(matrix_csv):
+    load_predictor_matrix(matrix_csv)
+    load_predictor_matrix.cache_clear()
+
+    pd.DataFrame({"target_symbol": ["GENE1"], "TF3": [7.0]}).to_csv(
+        matrix_csv, index=False
+    )
+    # make sure the csv is newer than the store
+    store_mtime = matrix_csv.with_suffix(".store.json").stat().st_mtime
+    os.utime(matrix_csv, (store_mtime + 10, store_mtime + 10))
+
+    df = load_predictor_matrix(matrix_csv)
+
+    assert list(df.columns) == ["TF3"]
+    assert df.loc["GENE1", "TF3"] == 7.0
+    # the files of the previous version are removed
+    assert len(list(matrix_csv.parent.glob("predictors.*.npy"))) == 1
+    assert len(list(matrix_csv.parent.glob("predictors.*.index.json"))) == 1
+
+
+def test_store_is_swapped_as_a_pair(matrix_csv):
+    first = load_predictor_matrix(matrix_csv)
+    load_predictor_matrix.cache_clear()
+
+    # another process converts the csv while the first version is in use
+    npy_path, index_path = convert_csv_to_store(matrix_csv)
+
+    assert npy_path.stem.split(".")[1] == index_path.name.split(".")[1]
+    second = load_predictor_matrix(matrix_csv)
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_mismatched_labels_raise(matrix_csv):
+    _, index_path = convert_csv_to_store(matrix_csv)
+    labels = json.loads(index_path.read_text())
+    index_path.write_text(json.dumps({**labels, "index": labels["index"][:2]}))
+
+    with pytest.raises(ValueError):
+        load_predictor_matrix(matrix_csv)
+
+
+def test_non_numeric_columns_raise(tmp_path):
+    path = tmp_path / "bad.csv"
+    pd.DataFrame({"target_symbol": ["GENE1"], "TF1": ["x"]}).to_csv(path, index=False)
+
+    with pytest.raises(ValueError):
+        load_predictor_matrix(path)
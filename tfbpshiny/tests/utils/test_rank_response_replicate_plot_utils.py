@@ -0,0 +1,202 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import pytest
+from scipy.stats import binomtest
+
+from tfbpshiny.utils.rank_response_replicate_plot_utils import (
+    binom_ci,
+    compute_rank_response,
+    create_rank_response_replicate_plots_by_source,
+    parse_binomtest_results,
+    process_plot_data,
+    random_expectation_ci,
+    replicate_trace_visibility,
+    vectorized_binomtest,
+)
+
+
+def scalar_binomtest(k, n, p, alternative):
+    """The per-row scipy result that vectorized_binomtest replaces."""
+    return np.array(
+        [
+            parse_binomtest_results(
+                binomtest(int(ki), int(ni), float(pi), alternative=alternative)
+            )
+            for ki, ni, pi in zip(k, n, p)
+        ]
+    )
+
+
+@pytest.fixture
+def random_trials():
+    rng = np.random.default_rng(42)
+    n = rng.integers(1, 200, 300)
+    k = np.array([rng.integers(0, ni + 1) for ni in n])
+    p = rng.choice([0.0, 0.05, 0.1, 0.25, 0.5, 1.0, rng.random()], len(n))
+    return k, n, p
+
+
+@pytest.mark.parametrize("alternative", ["two-sided", "less", "greater"])
+def test_vectorized_binomtest_parity(random_trials, alternative):
+    k, n, p = random_trials
+
+    statistic, pvalue, ci_lower, ci_upper = vectorized_binomtest(
+        k, n, p, alternative=alternative
+    )
+    expected = scalar_binomtest(k, n, p, alternative)
+
+    np.testing.assert_array_equal(statistic, expected[:, 0])
+    # the p-values use the same algorithm as scipy and are identical
+    np.testing.assert_array_equal(pvalue, expected[:, 1])
+    # scipy finds the CI bounds with brentq, which has an absolute tolerance of 2e-12
+    np.testing.assert_allclose(ci_lower, expected[:, 2], rtol=0, atol=1e-11)
+    np.testing.assert_allclose(ci_upper, expected[:, 3], rtol=0, atol=1e-11)
+
+
+def test_vectorized_binomtest_invalid_input():
+    with pytest.raises(ValueError):
+        vectorized_binomtest([3], [2], [0.5])
+    with pytest.raises(ValueError):
+        vectorized_binomtest([1], [2], [1.5])
+    with pytest.raises(ValueError):
+        vectorized_binomtest([1], [2], [0.5], alternative="bad")
+
+
+def rank_response_input(n_bins: int = 30, step: int = 5, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    n_genes = n_bins * step
+    return pd.DataFrame(
+        {
+            "rank_bin": np.repeat(np.arange(step, n_genes + 1, step), step),
+            "responsive": rng.random(n_genes) < 0.3,
+            "random": 0.12,
+        }
+    )
+
+
+def test_compute_rank_response_parity():
+    df = rank_response_input()
+
+    result = compute_rank_response(df)
+    expected = scalar_binomtest(
+        result["n_successes"], result["rank_bin"], result["random"], "two-sided"
+    )
+
+    assert list(result.columns) == [
+        "rank_bin",
+        "n_responsive_in_rank",
+        "random",
+        "n_successes",
+        "response_ratio",
+        "pvalue",
+        "ci_lower",
+        "ci_upper",
+    ]
+    np.testing.assert_array_equal(result["response_ratio"], expected[:, 0])
+    np.testing.assert_array_equal(result["pvalue"], expected[:, 1])
+    np.testing.assert_allclose(result["ci_lower"], expected[:, 2], atol=1e-11)
+    np.testing.assert_allclose(result["ci_upper"], expected[:, 3], atol=1e-11)
+
+
+def test_compute_rank_response_non_exact_method():
+    df = rank_response_input()
+
+    result = compute_rank_response(df, method="wilson")
+
+    assert result[["ci_lower", "ci_upper"]].notna().all().all()
+    assert (result["ci_lower"] <= result["response_ratio"]).all()
+    assert (result["ci_upper"] >= result["response_ratio"]).all()
+
+
+@pytest.mark.parametrize("n_bins,step,random_prob", [(150, 5, 0.12), (50, 10, 0.3)])
+def test_random_expectation_ci_matches_binom_ci(n_bins, step, random_prob):
+    lower, upper = random_expectation_ci(n_bins, step, random_prob)
+
+    expected = [binom_ci(n, random_prob) for n in range(5, n_bins + 1, step)]
+
+    np.testing.assert_array_equal(lower, [x[0] for x in expected])
+    np.testing.assert_array_equal(upper, [x[1] for x in expected])
+
+
+def test_random_expectation_ci_is_shared_and_read_only():
+    df = rank_response_input()
+
+    plot_data_1 = process_plot_data(df)
+    plot_data_2 = process_plot_data(rank_response_input(seed=1))
+
+    assert plot_data_1["ci"] is plot_data_2["ci"]
+    assert len(plot_data_1["ci"][0]) == len(plot_data_1["x"])
+    with pytest.raises(ValueError):
+        plot_data_1["ci"][0][0] = 1.0
+
+
+def test_create_rank_response_replicate_plots_by_source():
+    metadata = pd.DataFrame(
+        {
+            "id": [1, 2, 3],
+            "expression": [10, 10, 20],
+            "promotersetsig": [100, 101, 100],
+            "binding_source": "harbison_chip",
+            "expression_source": ["mcisaac_oe", "mcisaac_oe", "kemmeren_tfko"],
+        }
+    )
+    rr_dict = {
+        "metadata": metadata,
+        "data": {str(i): rank_response_input(seed=i) for i in metadata["id"]},
+    }
+
+    plots_by_source = create_rank_response_replicate_plots_by_source(rr_dict)
+
+    assert list(plots_by_source) == ["kemmeren_tfko", "mcisaac_oe"]
+    assert list(plots_by_source["mcisaac_oe"]) == ["10"]
+    fig = plots_by_source["mcisaac_oe"]["10"]
+    # two replicates, plus the random line and its CI
+    assert len(fig.data) == 5
+    # the result is returned from a worker process, so it must survive pickling
+    assert pickle.loads(pickle.dumps(plots_by_source))["mcisaac_oe"]["10"] == fig
+
+
+def test_replicate_trace_visibility():
+    traces = go.Figure(
+        [
+            go.Scatter(x=[1], y=[1], meta={"promotersetsig": "100"}),
+            go.Scatter(x=[1], y=[1], meta={"promotersetsig": "101"}),
+            go.Scatter(x=[1], y=[1], name="Random"),
+        ]
+    ).data
+
+    assert replicate_trace_visibility(traces, {100}) == [True, "legendonly", None]
+    # an empty selection shows every replicate
+    assert replicate_trace_visibility(traces, set()) == [True, True, None]
+    assert replicate_trace_visibility(traces, None) == [True, True, None]
+
+
+def test_plots_of_several_regulators_are_titled():
+    metadata = pd.DataFrame(
+        {
+            "id": [1, 2],
+            "expression": [10, 20],
+            "promotersetsig": [100, 101],
+            "binding_source": "harbison_chip",
+            "expression_source": "mcisaac_oe",
+            "regulator_symbol": ["GAL4", "MIG1"],
+        }
+    )
+    rr_dict = {
+        "metadata": metadata,
+        "data": {str(i): rank_response_input(seed=i) for i in metadata["id"]},
+    }
+
+    plots = create_rank_response_replicate_plots_by_source(rr_dict)["mcisaac_oe"]
+
+    assert plots["10"].layout.title.text.startswith("GAL4: ")
+    assert plots["20"].layout.title.text.startswith("MIG1: ")
+
+    # a single regulator is not named
+    single = create_rank_response_replicate_plots_by_source(
+        {"metadata": metadata.iloc[:1], "data": rr_dict["data"]}
+    )["mcisaac_oe"]
+    assert single["10"].layout.title.text == "Rank Response for Expression ID 10"
@@ -0,0 +1,139 @@
+import json
+
+import pandas as pd
+import pytest
+from starlette.requests import Request
+
+from tfbpshiny.utils.regulator_choice_index import (
+    RegulatorChoiceIndex,
+    get_regulator_choice_index,
+    update_regulator_selectize,
+)
+
+
+@pytest.fixture
+def metadata():
+    return pd.DataFrame(
+        {
+            "regulator_id": [3, 1, 2, 3, 4],
+            "regulator_symbol": ["GAL4", "ACE2", "GAL80", "GAL4", "MIG1"],
+            "regulator_locus_tag": [
+                "YPL248C",
+                "YLR131C",
+                "YML051W",
+                "YPL248C",
+                "YGL035C",
+            ],
+        }
+    )
+
+
+class FakeSession:
+    """Records the dynamic route and input message sent by the update function."""
+
+    def __init__(self):
+        self.routes = {}
+        self.messages = {}
+
+    def dynamic_route(self, name, handler):
+        self.routes[name] = handler
+        return f"session/{name}"
+
+    def send_input_message(self, id, message):
+        self.messages[id] = message
+
+
+def request(**params):
+    query = "&".join(f"{k}={v}" for k, v in params.items())
+    return Request({"type": "http", "query_string": query.encode(), "headers": []})
+
+
+def test_choices_match_original_ordering(metadata):
+    index = RegulatorChoiceIndex.from_metadata(metadata)
+
+    for col in RegulatorChoiceIndex.label_columns:
+        expected = (
+            metadata[["regulator_id", col]]
+            .drop_duplicates()
+            .sort_values(by=col)
+            .set_index("regulator_id")[col]
+        )
+        expected.index = expected.index.astype(str)
+        assert index.choices(col) == expected.to_dict()
+
+
+def test_search(metadata):
+    index = RegulatorChoiceIndex.from_metadata(metadata)
+
+    assert [x["label"] for x in index.search("gal", "regulator_symbol")] == [
+        "GAL4",
+        "GAL80",
+    ]
+    assert index.search("gal 80", "regulator_symbol") == [
+        {"value": "2", "label": "GAL80"}
+    ]
+    assert len(index.search("gal 80", "regulator_symbol", conjunction="or")) == 2
+    assert len(index.search("", "regulator_locus_tag", max_options=2)) == 2
+    assert index.search("ypl", "regulator_locus_tag") == [
+        {"value": "3", "label": "YPL248C"}
+    ]
+
+
+def test_neighbors(metadata):
+    index = RegulatorChoiceIndex.from_metadata(metadata)
+
+    # ACE2 (1), GAL4 (3), GAL80 (2), MIG1 (4)
+    assert index.neighbors("3", "regulator_symbol") == ["2", "1"]
+    assert index.neighbors("3", "regulator_symbol", n=2) == ["2", "1", "4"]
+    assert index.neighbors("1", "regulator_symbol") == ["3"]
+    assert index.neighbors("5", "regulator_symbol") == []
+
+
+def test_index_is_shared(metadata):
+    assert get_regulator_choice_index(metadata) is get_regulator_choice_index(metadata)
+
+
+def test_update_regulator_selectize(metadata):
+    index = get_regulator_choice_index(metadata)
+    session = FakeSession()
+
+    update_regulator_selectize(session, "regulator", index, "regulator_symbol")
+
+    # the first choice is selected by default
+    assert session.messages["regulator"]["value"] == ["1"]
+    handler = session.routes["update_selectize_regulator"]
+    response = json.loads(handler(request(query="gal", maxop=10)).body)
+    assert response == [
+        {"value": "3", "label": "GAL4"},
+        {"value": "2", "label": "GAL80"},
+        {"value": "1", "label": "ACE2"},
+    ]
+
+
+def test_update_regulator_selectize_keeps_selection(metadata):
+    index = get_regulator_choice_index(metadata)
+    session = FakeSession()
+
+    update_regulator_selectize(
+        session, "regulator", index, "regulator_locus_tag", selected="4"
+    )
+
+    assert session.messages["regulator"]["value"] == ["4"]
+
+
+def test_update_regulator_selectize_multiple(metadata):
+    index = get_regulator_choice_index(metadata)
+    session = FakeSession()
+
+    update_regulator_selectize(
+        session, "compare", index, "regulator_symbol", selected=["2", "9", "4"]
+    )
+
+    # unknown ids are dropped, and there is no default selection
+    assert session.messages["compare"]["value"] == ["2", "4"]
+    handler = session.routes["update_selectize_compare"]
+    response = json.loads(handler(request(query="", maxop=10)).body)
+    assert [choice["value"] for choice in response] == ["1", "3", "2", "4"]
+
+    update_regulator_selectize(session, "compare", index, "regulator_symbol", [])
+    assert session.messages["compare"]["value"] == []
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tfbpshiny.utils.rename_dataframe_data_sources import (
+    relabel_series,
+    rename_dataframe_data_sources,
+)
+from tfbpshiny.utils.source_name_lookup import get_source_name_dict
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame(
+        {
+            "binding_source": [
+                "harbison_chip",
+                "brent_nf_cc",
+                None,
+                "unknown_source",
+                "harbison_chip",
+            ],
+            "expression_source": ["mcisaac_oe"] * 4 + ["kemmeren_tfko"],
+            "value": np.arange(5),
+        }
+    )
+
+
+def lambda_rename(values, mapping):
+    """The per-element relabeling that relabel_series replaces."""
+    return values.map(lambda x: mapping.get(x, x))
+
+
+def test_rename_matches_per_element_map(df):
+    result = rename_dataframe_data_sources(df)
+
+    for col, datatype in [
+        ("binding_source", "binding"),
+        ("expression_source", "perturbation_response"),
+    ]:
+        expected = lambda_rename(df[col], get_source_name_dict(datatype))
+        assert result[col].tolist() == expected.tolist()
+    pd.testing.assert_series_equal(result["value"], df["value"])
+    # the input is unchanged
+    assert df["binding_source"].iloc[0] == "harbison_chip"
+
+
+def test_rename_categorical_renames_categories(df):
+    categorical = df.astype({"binding_source": "category"})
+
+    result = rename_dataframe_data_sources(categorical)
+
+    assert isinstance(result["binding_source"].dtype, pd.CategoricalDtype)
+    np.testing.assert_array_equal(
+        result["binding_source"].cat.codes, categorical["binding_source"].cat.codes
+    )
+    assert (
+        result["binding_source"].tolist()
+        == rename_dataframe_data_sources(df)["binding_source"].tolist()
+    )
+
+
+def test_relabel_categorical_with_duplicate_labels():
+    values = pd.Series(["harbison_chip", "ChIP-chip", None], dtype="category")
+
+    result = relabel_series(values, get_source_name_dict("binding"))
+
+    assert result.iloc[:2].tolist() == ["ChIP-chip", "ChIP-chip"]
+    assert pd.isna(result.iloc[2])
+
+
+def test_source_name_dict_is_built_once():
+    assert get_source_name_dict("binding") is get_source_name_dict("binding")
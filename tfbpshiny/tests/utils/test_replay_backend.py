@@ -0,0 +1,89 @@
+import asyncio
+import time
+
+import pandas as pd
+import pytest
+
+from tfbpshiny.utils.replay_backend import ReplayBackend
+
+
+class FakeAPI:
+    """Stand-in for a tfbpapi API class which returns a frame of its params."""
+
+    reads = 0
+
+    def __init__(self, params=None):
+        self.params = params or {}
+
+    async def read(self, retrieve_files=False):
+        FakeAPI.reads += 1
+        return {"metadata": pd.DataFrame({"regulator_id": [self.params.get("id")]})}
+
+
+def record(tmp_path, params):
+    recorder = ReplayBackend(tmp_path, mode="record")
+    api = recorder.api_factory("binding", FakeAPI)(params=params)
+    return asyncio.run(api.read(retrieve_files=True))
+
+
+def test_record_and_replay(tmp_path):
+    FakeAPI.reads = 0
+    recorded = record(tmp_path, {"id": "1"})
+
+    backend = ReplayBackend(tmp_path)
+    api = backend.api_factory("binding", FakeAPI)(params={"id": "1"})
+    replayed = asyncio.run(api.read(retrieve_files=True))
+
+    pd.testing.assert_frame_equal(replayed["metadata"], recorded["metadata"])
+    assert api.params == {"id": "1"}
+    # the real API is only read while recording
+    assert FakeAPI.reads == 1
+
+
+def test_replay_unrecorded_request(tmp_path):
+    record(tmp_path, {"id": "1"})
+    factory = ReplayBackend(tmp_path).api_factory("binding", FakeAPI)
+
+    with pytest.raises(KeyError):
+        asyncio.run(factory(params={"id": "2"}).read(retrieve_files=True))
+    # the response to a different call of .read() was not recorded either
+    with pytest.raises(KeyError):
+        asyncio.run(factory(params={"id": "1"}).read())
+
+
+def test_replay_latency_and_bandwidth(tmp_path):
+    record(tmp_path, {"id": "1"})
+    size = next(tmp_path.glob("*.pkl")).stat().st_size
+    # the transfer takes as long as the latency
+    backend = ReplayBackend(tmp_path, latency=0.05, bandwidth=size / 0.05)
+    api = backend.api_factory("binding", FakeAPI)(params={"id": "1"})
+
+    start = time.monotonic()
+    asyncio.run(api.read(retrieve_files=True))
+    assert time.monotonic() - start >= 0.1
+
+
+def test_replay_injected_errors(tmp_path):
+    record(tmp_path, {"id": "1"})
+    backend = ReplayBackend(tmp_path, error_rate=0.5, seed=1)
+    api = backend.api_factory("binding", FakeAPI)(params={"id": "1"})
+
+    async def run():
+        failures = 0
+        for _ in range(100):
+            try:
+                await api.read(retrieve_files=True)
+            except ConnectionError:
+                failures += 1
+        return failures
+
+    assert 30 < asyncio.run(run()) < 70
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{"mode": "live"}, {"latency": -1}, {"bandwidth": -1}, {"error_rate": 1.5}],
+)
+def test_invalid_settings(tmp_path, kwargs):
+    with pytest.raises(ValueError):
+        ReplayBackend(tmp_path, **kwargs)
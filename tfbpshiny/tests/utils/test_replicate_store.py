@@ -0,0 +1,324 @@
+import asyncio
+import time
+
+import pandas as pd
+import pytest
+
+from tfbpshiny.utils.compute_pool import ComputePool
+from tfbpshiny.utils.disk_cache import DiskCache
+from tfbpshiny.utils.replicate_store import ReplicateStore, merge_replicate_data
+
+
+class FakeRankResponseAPI:
+    """Stand-in for RankResponseAPI that records the regulators which are read, and
+    the maximum number of reads in progress at once."""
+
+    reads: list[str] = []
+    running = 0
+    max_running = 0
+
+    def __init__(self, params):
+        self.params = params
+
+    async def read(self, retrieve_files=False):
+        regulator = self.params["regulator_id"]
+        FakeRankResponseAPI.reads.append(regulator)
+        FakeRankResponseAPI.running += 1
+        FakeRankResponseAPI.max_running = max(
+            FakeRankResponseAPI.max_running, FakeRankResponseAPI.running
+        )
+        try:
+            await asyncio.sleep(0.1 if regulator.startswith("slow") else 0.01)
+        finally:
+            FakeRankResponseAPI.running -= 1
+        if regulator.startswith("fail"):
+            raise RuntimeError("server error")
+        id = f"{regulator}:{self.params['expression_conditions']}"
+        return {
+            "metadata": pd.DataFrame({"regulator_id": [regulator], "id": [id]}),
+            "data": {id: pd.DataFrame({"rank_bin": [5]})},
+        }
+
+
+def count_rows(rr_dict: dict) -> dict:
+    return {"n": len(rr_dict["metadata"])}
+
+
+async def collect(store, requests):
+    return [part async for part in store.stream(requests)]
+
+
+@pytest.fixture(autouse=True)
+def reset_reads():
+    FakeRankResponseAPI.reads = []
+    FakeRankResponseAPI.max_running = 0
+
+
+@pytest.fixture
+def metadata():
+    return pd.DataFrame(
+        {
+            "id": [10, 11, 12, 13],
+            "regulator_id": [1, 1, 2, 3],
+        }
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ReplicateStore(
+        FakeRankResponseAPI,
+        DiskCache(tmp_path),
+        ComputePool(max_workers=0),
+        count_rows,
+        delay=0,
+    )
+
+
+def test_dataset_version(metadata):
+    assert ReplicateStore.dataset_version(metadata, "1") == ["10", "11"]
+    assert ReplicateStore.dataset_version(metadata, "4") == []
+
+
+def test_condition_replicates():
+    metadata = pd.DataFrame(
+        {
+            "regulator_id": [1, 1, 1, 1, 2],
+            "expression_source": [
+                "kemmeren_tfko",
+                "mcisaac_oe",
+                "mcisaac_oe",
+                "other",
+                "kemmeren_tfko",
+            ],
+            "expression_time": [None, 15.0, 45.0, None, None],
+        }
+    )
+    assert ReplicateStore.condition_replicates(metadata, "1") == 2
+    # without the columns, every replicate of the regulator counts
+    assert ReplicateStore.condition_replicates(metadata[["regulator_id"]], "1") == 4
+
+
+def test_stream_is_cached(store):
+    async def run():
+        assert await store.cached("1", ["10"]) is None
+        await collect(store, [("1", ["10"])])
+        return await store.cached("1", ["10"])
+
+    assert asyncio.run(run())["metadata"]["regulator_id"].tolist() == ["1", "1"]
+    # one request per expression condition
+    assert FakeRankResponseAPI.reads == ["1", "1"]
+
+
+def test_stream_shares_prefetch(store, metadata):
+    async def run():
+        store.prefetch(["1"], metadata)
+        while not FakeRankResponseAPI.running:
+            await asyncio.sleep(0.001)
+        # the prefetch is in progress, so its requests are shared
+        parts = await collect(store, [("1", ["10", "11"])])
+        await store.drain()
+        return parts
+
+    assert len(asyncio.run(run())) == 2
+    assert FakeRankResponseAPI.reads == ["1", "1"]
+    assert store.is_prepared(store.key("1", ["10", "11"]))
+
+
+def test_concurrent_streams_share_requests(store):
+    async def run():
+        # two sessions select the same regulator, which is not cached
+        return await asyncio.gather(
+            collect(store, [("1", ["10"])]), collect(store, [("1", ["10"])])
+        )
+
+    first, second = asyncio.run(run())
+    assert len(first) == len(second) == 2
+    assert FakeRankResponseAPI.reads == ["1", "1"]
+
+
+def test_cached_does_not_wait(store):
+    async def run():
+        stream = store.stream([("slow", ["slow"])])
+        first_part = asyncio.create_task(anext(stream))
+        while not FakeRankResponseAPI.running:
+            await asyncio.sleep(0.001)
+        result = await store.cached("slow", ["slow"], wait=False)
+        await first_part
+        await stream.aclose()
+        return result
+
+    assert asyncio.run(run()) is None
+
+
+def test_cancelled_stream_cancels_requests(store):
+    async def run():
+        stream = store.stream([("slow", ["slow"])])
+        first_part = asyncio.create_task(anext(stream))
+        while not FakeRankResponseAPI.running:
+            await asyncio.sleep(0.001)
+        first_part.cancel()
+        await asyncio.gather(first_part, return_exceptions=True)
+        await stream.aclose()
+        await asyncio.sleep(0.01)
+        return await store.cached("slow", ["slow"])
+
+    # nothing else was waiting on the requests, so nothing was cached
+    assert asyncio.run(run()) is None
+    assert FakeRankResponseAPI.running == 0
+
+
+def test_stream_skips_failed_regulator(store):
+    async def run():
+        parts = await collect(store, [("fail", ["fail"]), ("1", ["10"])])
+        return parts, await store.cached("fail", ["fail"])
+
+    parts, cached = asyncio.run(run())
+    # the other regulator is still streamed, and the failed one is not cached
+    assert [part["metadata"]["regulator_id"].tolist() for part in parts] == [
+        ["1"],
+        ["1"],
+    ]
+    assert cached is None
+
+
+def test_stream_after_cancel_starts_new_requests(store):
+    async def run():
+        stream = store.stream([("slow", ["slow"])])
+        first_part = asyncio.create_task(anext(stream))
+        while not FakeRankResponseAPI.running:
+            await asyncio.sleep(0.001)
+        first_part.cancel()
+        await asyncio.gather(first_part, return_exceptions=True)
+        await stream.aclose()
+        # the cancelled requests are not shared with a new stream
+        return await collect(store, [("slow", ["slow"])])
+
+    assert len(asyncio.run(run())) == 2
+    assert FakeRankResponseAPI.reads == ["slow"] * 4
+
+
+def test_stream_is_concurrent(store):
+    requests = [(regulator, [regulator]) for regulator in ["slow", "3"]]
+    store.fetch_concurrency = 3
+    arrivals = []
+
+    async def run():
+        start = time.monotonic()
+        async for part in store.stream(requests):
+            arrivals.append(part["metadata"]["regulator_id"].tolist())
+        return time.monotonic() - start, await store.cached("slow", ["slow"])
+
+    elapsed, cached = asyncio.run(run())
+
+    # one request per regulator and expression condition
+    assert len(FakeRankResponseAPI.reads) == 4
+    assert FakeRankResponseAPI.max_running == 3
+    # close to the slowest read, rather than the sum of the reads
+    assert elapsed < 0.2
+    # each part is yielded as it arrives, so the fast regulator comes first
+    assert arrivals == [["3"], ["3"], ["slow"], ["slow"]]
+    # the parts of a complete regulator are cached as one response
+    assert cached["metadata"]["regulator_id"].tolist() == ["slow", "slow"]
+    assert len(cached["data"]) == 2
+
+
+def test_stream_yields_cached_whole(store):
+    async def run():
+        await collect(store, [("1", ["10"])])
+        # wait for the merged response to be cached
+        await store.cached("1", ["10"])
+        FakeRankResponseAPI.reads = []
+        return await collect(store, [("1", ["10"])])
+
+    parts = asyncio.run(run())
+    assert len(parts) == 1
+    assert FakeRankResponseAPI.reads == []
+
+
+def test_keep_prepared(store):
+    async def run():
+        key = store.key_many([("1", ["10"]), ("2", ["12"])])
+        assert await store.prepare_part({"metadata": pd.DataFrame()}) == {"n": 0}
+        assert not store.is_prepared(key)
+        await store.keep_prepared(key, {"n": 2})
+        return await store.prepare(key, {})
+
+    assert asyncio.run(run()) == {"n": 2}
+
+
+def test_key_many(store):
+    assert store.key_many([("1", ["10"])]) == store.key("1", ["10"])
+    assert store.key_many([("1", ["10"]), ("2", ["12"])]) != store.key("1", ["10"])
+
+
+def test_merge_replicate_data():
+    result = {"metadata": pd.DataFrame({"id": [1]}), "data": {"1": "data"}}
+    assert merge_replicate_data([{}, result]) is result
+    assert merge_replicate_data([{}]) == {}
+
+    merged = merge_replicate_data(
+        [result, {"metadata": pd.DataFrame({"id": [2]}), "data": {"2": "data"}}]
+    )
+    assert merged["metadata"]["id"].tolist() == [1, 2]
+    assert list(merged["data"]) == ["1", "2"]
+
+
+def test_popular(store):
+    for regulator in ["1", "2", "2", "3", "2", "3"]:
+        store.record_access(regulator)
+    assert store.popular(2) == ["2", "3"]
+
+
+def test_prefetch_skips_prepared_and_unknown(store, metadata):
+    async def run():
+        store.prefetch(["1", "2", "4"], metadata)
+        await store.drain()
+        store.prefetch(["1", "2"], metadata)
+        await store.drain()
+
+    asyncio.run(run())
+    assert sorted(FakeRankResponseAPI.reads) == ["1", "1", "2", "2"]
+
+
+def test_prepare_returns_copies(store):
+    async def run():
+        key = store.key("1", ["10"])
+        rr_dict = merge_replicate_data(await collect(store, [("1", ["10"])]))
+        first = await store.prepare(key, rr_dict)
+        first["n"] = 100
+        return await store.prepare(key, rr_dict)
+
+    assert asyncio.run(run()) == {"n": 2}
+
+
+def test_prepared_memory_budget(store):
+    rr_dict = {"metadata": pd.DataFrame({"regulator_id": ["1"]})}
+
+    async def run():
+        keys = [store.key(str(i), [str(i)]) for i in range(3)]
+        await store.prepare(keys[0], rr_dict)
+        # room for two entries
+        store.max_bytes = 2 * store.prepared_bytes
+        for key in keys[1:]:
+            await store.prepare(key, rr_dict)
+        return keys
+
+    keys = asyncio.run(run())
+    assert [store.is_prepared(key) for key in keys] == [False, True, True]
+    assert store.prepared_bytes <= store.max_bytes
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{"max_concurrency": 0}, {"neighbors": -1}, {"max_bytes": -1}],
+)
+def test_invalid_limits(tmp_path, kwargs):
+    with pytest.raises(ValueError):
+        ReplicateStore(
+            FakeRankResponseAPI,
+            DiskCache(tmp_path),
+            ComputePool(max_workers=0),
+            count_rows,
+            **kwargs,
+        )
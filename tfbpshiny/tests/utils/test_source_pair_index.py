@@ -0,0 +1,78 @@
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tfbpshiny.utils.source_pair_index import SourcePairIndex, get_source_pair_index
+
+BINDING_SOURCES = ["harbison_chip", "chipexo_pugh_allevents", "brent_nf_cc"]
+EXPRESSION_SOURCES = ["mcisaac_oe", "kemmeren_tfko", "hu_reimann_tfko"]
+
+
+@pytest.fixture
+def metadata():
+    rng = np.random.default_rng(1)
+    n = 500
+    regulators = np.array([f"TF{i}" for i in range(40)] + [None], dtype=object)
+    return pd.DataFrame(
+        {
+            "binding_source": rng.choice(BINDING_SOURCES, n),
+            # hu_reimann_tfko is rare, so some pairs are missing
+            "expression_source": rng.choice(
+                EXPRESSION_SOURCES, n, p=[0.49, 0.49, 0.02]
+            ),
+            "regulator_symbol": rng.choice(regulators, n),
+            "rank_25": rng.random(n),
+        }
+    )
+
+
+def scan_filter(rr_local, binding_sources, expression_sources, only_shared):
+    """The filter that SourcePairIndex replaces."""
+    fltr_df = rr_local[
+        rr_local["binding_source"].isin(binding_sources)
+        & rr_local["expression_source"].isin(expression_sources)
+    ]
+    if only_shared:
+        regulator_sets = fltr_df.groupby(["binding_source", "expression_source"])[
+            "regulator_symbol"
+        ].apply(set)
+        if not regulator_sets.empty:
+            shared = set.intersection(*regulator_sets)
+            fltr_df = fltr_df[fltr_df["regulator_symbol"].isin(shared)]
+        else:
+            fltr_df = fltr_df.iloc[0:0]
+    return fltr_df
+
+
+def selections(sources):
+    return [list(c) for n in range(len(sources) + 1) for c in combinations(sources, n)]
+
+
+@pytest.mark.parametrize("only_shared", [False, True])
+def test_filter_matches_scan(metadata, only_shared):
+    index = SourcePairIndex(metadata)
+    for binding_sources in selections(BINDING_SOURCES):
+        for expression_sources in selections(EXPRESSION_SOURCES):
+            result = index.filter(binding_sources, expression_sources, only_shared)
+            expected = scan_filter(
+                metadata, binding_sources, expression_sources, only_shared
+            )
+            pd.testing.assert_frame_equal(result, expected)
+
+
+def test_filter_is_memoized_on_sorted_selection(metadata):
+    index = get_source_pair_index(metadata)
+    assert index is get_source_pair_index(metadata)
+
+    first = index.filter(["brent_nf_cc", "harbison_chip"], ["mcisaac_oe"], True)
+    second = index.filter(["harbison_chip", "brent_nf_cc"], ["mcisaac_oe"], True)
+    assert first is second
+
+
+def test_memoized_selections_are_bounded(metadata):
+    index = SourcePairIndex(metadata, max_selections=2)
+    for sources in selections(BINDING_SOURCES)[:4]:
+        index.filter(sources, EXPRESSION_SOURCES)
+    assert len(index._filtered) == 2
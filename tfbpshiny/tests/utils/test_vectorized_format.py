@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tfbpshiny.utils.safe_sci_notatation import safe_sci_notation
+from tfbpshiny.utils.vectorized_format import format_percentage, format_sci_notation
+
+VALUES = pd.Series(
+    [0.0001234, "1000", 42, "not_a_number", None, np.nan, np.inf, 0.125, 1e-300, -0.5],
+    dtype=object,
+)
+
+
+def percentage(x):
+    """The percentage format of the replicate details table, before it was
+    vectorized."""
+    if pd.isna(x):
+        return x
+    try:
+        return f"{round(float(x) * 100)}%"
+    except (TypeError, ValueError, OverflowError):
+        return x
+
+
+def assert_same_values(result, expected):
+    assert len(result) == len(expected)
+    for x, y in zip(result, expected):
+        assert (pd.isna(x) and pd.isna(y)) or x == y
+
+
+@pytest.mark.parametrize(
+    "vectorized,scalar",
+    [
+        (format_sci_notation, safe_sci_notation),
+        (format_percentage, percentage),
+    ],
+)
+def test_matches_scalar_format(vectorized, scalar):
+    result = vectorized(VALUES)
+    assert_same_values(result, [scalar(x) for x in VALUES])
+
+
+@pytest.mark.parametrize(
+    "vectorized,scalar",
+    [
+        (format_sci_notation, safe_sci_notation),
+        (format_percentage, percentage),
+    ],
+)
+def test_numeric_column(vectorized, scalar):
+    values = pd.Series(np.random.default_rng(0).random(1000), index=np.arange(1000) * 2)
+
+    result = vectorized(values)
+
+    assert result.index.equals(values.index)
+    assert result.tolist() == [scalar(x) for x in values]
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import multiprocessing
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, TypeVar
+
+logger = logging.getLogger("shiny")
+
+R = TypeVar("R")
+
+
+class ComputePool:
+    """
+    A process-wide pool of worker processes for CPU-bound work, e.g. preparing the rank
+    response plots.
+
+    Work submitted with :meth:`run` is executed in another process, so it does not
+    block the event loop which serves every session of this process. The pool is
+    created on first use and shared by all sessions.
+
+    If the awaiting task is cancelled (e.g. by ``ExtendedTask.cancel()``), a job which
+    has not started yet is removed from the queue. A job which is already running
+    cannot be interrupted; it runs to completion and its result is discarded.
+
+    """
+
+    def __init__(self, max_workers: int = 2, logger: logging.Logger = logger):
+        """
+        Initialize the pool.
+
+        :param max_workers: The number of worker processes. If 0, the work is run in a
+            thread of this process instead, which does not block the event loop but
+            does hold the GIL
+        :param logger: A logger object
+        :raises ValueError: If max_workers is negative
+
+        """
+        if not isinstance(max_workers, int) or max_workers < 0:
+            raise ValueError("max_workers must be a non-negative integer")
+        self.max_workers = max_workers
+        self.logger = logger
+        self._executor: Executor | None = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            self.logger.info(
+                f"Starting a compute pool with {self.max_workers} worker processes"
+            )
+            # spawn rather than fork: the server process runs an event loop and threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def run(self, fn: Callable[..., R], *args: Any) -> R:
+        """
+        Run `fn(*args)` in a worker process.
+
+        :param fn: A function which can be pickled, i.e. defined at the top level of a
+            module. The arguments and the return value must be picklable too
+        :param args: Positional arguments for `fn`
+        :return: The return value of `fn`
+
+        """
+        if self.max_workers == 0:
+            return await asyncio.to_thread(fn, *args)
+
+        executor = self._get_executor()
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            # a worker died, e.g. it was killed for using too much memory. Replace the
+            # pool so that later jobs can still run
+            self.logger.error("The compute pool is broken. Restarting it")
+            self.shutdown()
+            future = self._get_executor().submit(fn, *args)
+
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            if not future.cancel():
+                self.logger.debug(f"{fn.__name__} was cancelled while running")
+            raise
+
+    def shutdown(self) -> None:
+        """Stop the worker processes, cancelling any jobs which have not started."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -1,8 +1,11 @@
 import logging
 
+import numpy as np
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 from plotly.graph_objects import Figure
+from plotly.subplots import make_subplots
 
 from .plot_formatter import plot_formatter
 from .rename_dataframe_data_sources import rename_dataframe_data_sources
@@ -11,20 +14,181 @@ from .source_name_lookup import get_source_name_dict
 logger = logging.getLogger("shiny")
 
 
+GROUP_COLUMNS = ["binding_source", "expression_source"]
+
+
+def summarize_distribution(
+    df: pd.DataFrame,
+    y_column: str,
+    max_outliers: int = 50,
+    random_state: int = 0,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Compute the box plot statistics of `y_column` for each (binding_source,
+    expression_source) group. The statistics match those that plotly computes in the
+    browser for a box plot: linearly interpolated quartiles, whiskers which extend to
+    the furthest point within 1.5 IQR of the box, and the points beyond the whiskers
+    as outliers.
+
+    :param df: DataFrame with the columns 'binding_source', 'expression_source' and
+        the y_column. Rows where y_column is NaN are dropped
+    :param y_column: The column to summarize
+    :param max_outliers: The maximum number of outliers to keep for each group. If a
+        group has more, a random sample is kept
+    :param random_state: The seed for sampling the outliers
+    :return: A tuple of two DataFrames. The first has one row per group and the
+        columns 'binding_source', 'expression_source', 'q1', 'median', 'q3',
+        'lowerfence', 'upperfence' and 'n'. The second has the 'binding_source',
+        'expression_source' and y_column of the (sampled) outliers
+
+    """
+    data = df.loc[df[y_column].notna(), GROUP_COLUMNS + [y_column]]
+    if data.empty:
+        stats_columns = ["q1", "median", "q3", "n", "lowerfence", "upperfence"]
+        return pd.DataFrame(columns=GROUP_COLUMNS + stats_columns), data.reset_index(
+            drop=True
+        )
+    grouped = data.groupby(GROUP_COLUMNS, observed=True, sort=False)[y_column]
+
+    stats = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    stats.columns = ["q1", "median", "q3"]
+    stats["n"] = grouped.size()
+
+    # the whiskers extend to the furthest data point within 1.5 IQR of the box
+    iqr = stats["q3"] - stats["q1"]
+    bounds = pd.DataFrame(
+        {"low": stats["q1"] - 1.5 * iqr, "high": stats["q3"] + 1.5 * iqr}
+    )
+    row_bounds = bounds.reindex(pd.MultiIndex.from_frame(data[GROUP_COLUMNS]))
+    is_outlier = (data[y_column].to_numpy() < row_bounds["low"].to_numpy()) | (
+        data[y_column].to_numpy() > row_bounds["high"].to_numpy()
+    )
+
+    inlier_grouped = data.loc[~is_outlier].groupby(
+        GROUP_COLUMNS, observed=True, sort=False
+    )[y_column]
+    stats["lowerfence"] = inlier_grouped.min()
+    stats["upperfence"] = inlier_grouped.max()
+
+    outliers = data.loc[is_outlier]
+    if max_outliers is not None and not outliers.empty:
+        rng = np.random.default_rng(random_state)
+        shuffled = outliers.iloc[rng.permutation(len(outliers))]
+        outliers = shuffled.groupby(GROUP_COLUMNS, observed=True).head(max_outliers)
+
+    return stats.reset_index(), outliers.reset_index(drop=True)
+
+
+def _create_summary_box_plot(
+    df: pd.DataFrame,
+    y_column: str,
+    binding_levels: list[str],
+    perturbation_levels: list[str],
+    color_discrete_map: dict[str, str],
+    max_outliers: int,
+) -> Figure:
+    """Create the faceted box plot from server-side summary statistics."""
+    stats, outliers = summarize_distribution(df, y_column, max_outliers=max_outliers)
+    stats = rename_dataframe_data_sources(stats)
+    outliers = rename_dataframe_data_sources(outliers)
+
+    facets = [
+        level
+        for level in perturbation_levels
+        if level in set(stats["expression_source"])
+    ] + sorted(set(stats["expression_source"]) - set(perturbation_levels))
+
+    fig = make_subplots(
+        rows=1,
+        cols=max(len(facets), 1),
+        shared_yaxes=True,
+        horizontal_spacing=0.04,
+        subplot_titles=facets,
+    )
+
+    shown_in_legend: set[str] = set()
+    for col, facet in enumerate(facets, start=1):
+        facet_stats = stats[stats["expression_source"] == facet]
+        facet_outliers = outliers[outliers["expression_source"] == facet]
+        # order the boxes consistently with the category order
+        facet_stats = facet_stats.sort_values(
+            "binding_source",
+            key=lambda x: x.map(
+                {level: i for i, level in enumerate(binding_levels)}
+            ).fillna(len(binding_levels)),
+        )
+        for row in facet_stats.itertuples(index=False):
+            source = row.binding_source
+            color = color_discrete_map.get(source)
+            fig.add_trace(
+                go.Box(
+                    x=[source],
+                    q1=[row.q1],
+                    median=[row.median],
+                    q3=[row.q3],
+                    lowerfence=[row.lowerfence],
+                    upperfence=[row.upperfence],
+                    name=source,
+                    legendgroup=source,
+                    showlegend=source not in shown_in_legend,
+                    marker_color=color,
+                    offsetgroup=source,
+                    # the points are not sent, so the size of the group is shown
+                    # with its statistics
+                    hovertemplate=f"%{{y}}<br>n = {row.n}<extra>{source}</extra>",
+                ),
+                row=1,
+                col=col,
+            )
+            shown_in_legend.add(source)
+
+            source_outliers = facet_outliers.loc[
+                facet_outliers["binding_source"] == source, y_column
+            ]
+            if not source_outliers.empty:
+                fig.add_trace(
+                    go.Scatter(
+                        x=[source] * len(source_outliers),
+                        y=source_outliers,
+                        mode="markers",
+                        name=source,
+                        legendgroup=source,
+                        showlegend=False,
+                        marker=dict(color=color, size=4),
+                    ),
+                    row=1,
+                    col=col,
+                )
+
+    fig.update_layout(boxmode="overlay")
+    fig.update_xaxes(categoryorder="array", categoryarray=binding_levels)
+    return fig
+
+
 def create_distribution_plot(
     df: pd.DataFrame,
     y_column: str,
     y_axis_title: str,
+    summarize: bool = False,
+    max_outliers: int = 50,
     **kwargs,
 ) -> Figure:
     """
     Create consistently formatting distribution plots for DTO empirical pvalue, rank
     response 25 and univariate pvalue.
 
+    By default every row of `df` is sent to the browser, which computes the box plot
+    statistics. With `summarize=True`, the statistics are computed on the server with
+    `summarize_distribution` and only the precomputed boxes (and a capped sample of the
+    outliers) are sent, which keeps the figure small regardless of the number of rows.
+
     :param df: DataFrame containing the data to plot. Must have at minimum the columns
         'binding_source', 'expression_source' and the y_column
     :param y_column: The column name in the DataFrame to plot on the y-axis
     :param y_axis_title: The title for the y-axis
+    :param summarize: If True, compute the box plot statistics on the server
+    :param max_outliers: When summarize is True, the maximum number of outliers to plot
+        for each group
     :param kwargs: Additional keyword arguments to pass to plot_formatter
     :return: A Plotly Figure object containing the distribution plot
     :raises ValueError: If the DataFrame does not contain the required columns
@@ -56,8 +220,6 @@ def create_distribution_plot(
         logger.error("Input df is not a pandas DataFrame")
         raise TypeError("Input df must be a pandas DataFrame")
 
-    df_renamed = rename_dataframe_data_sources(df)
-
     # Determine consistent order from dict values
     binding_levels = list(binding_source_dict.values())
     perturbation_levels = list(perturbation_source_dict.values())
@@ -75,6 +237,19 @@ def create_distribution_plot(
         for i, name in enumerate(binding_levels)
     }
 
+    if summarize:
+        fig = _create_summary_box_plot(
+            df,
+            y_column,
+            binding_levels,
+            perturbation_levels,
+            color_discrete_map,
+            max_outliers,
+        )
+        return plot_formatter(fig, "Binding Data Source", y_axis_title, **kwargs)
+
+    df_renamed = rename_dataframe_data_sources(df)
+
     # Create plot
     fig = px.box(
         df_renamed,
@@ -0,0 +1,195 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger("shiny")
+
+
+class DiskCache:
+    """
+    A size-bounded, content-addressed cache of python objects (e.g. the dict of
+    DataFrames returned by ``RankResponseAPI.read(retrieve_files=True)``) stored as
+    pickle files on local disk.
+
+    Entries are addressed by a hash of the request parameters, so the same request
+    always maps to the same file. Files are written atomically, which makes the cache
+    safe to share between worker processes. When the total size of the cache exceeds
+    ``max_bytes``, the least recently used entries are removed.
+
+    All entries are stored in a subdirectory named after ``version``, so bumping the
+    version invalidates the whole cache. The subdirectories of other versions are left
+    to the processes which may still use them, e.g. during a rolling restart. When the
+    cache is created, those which have not been used for ``version_max_age`` seconds
+    are deleted.
+
+    """
+
+    suffix = ".pkl"
+
+    def __init__(
+        self,
+        cache_dir: str | Path,
+        max_bytes: int = 1024**3,
+        version: str = "1",
+        version_max_age: float = 7 * 24 * 3600,
+        logger: logging.Logger = logger,
+    ):
+        """
+        Initialize the cache.
+
+        :param cache_dir: The directory in which to store the cache. Created if it
+            does not exist
+        :param max_bytes: The maximum total size of the cache in bytes. If 0, the
+            cache is disabled and nothing is written
+        :param version: The dataset version. Entries written under a different version
+            are not read
+        :param version_max_age: The number of seconds after which the entries of
+            another version, none of which have been read or written since, are
+            removed. 0 to remove them right away
+        :param logger: A logger object
+        :raises ValueError: If max_bytes or version_max_age is negative
+
+        """
+        if not isinstance(max_bytes, int) or max_bytes < 0:
+            raise ValueError("max_bytes must be a non-negative integer")
+        if not isinstance(version_max_age, (int, float)) or version_max_age < 0:
+            raise ValueError("version_max_age must be a non-negative number")
+        self.max_bytes = max_bytes
+        self.version = str(version)
+        self.version_max_age = float(version_max_age)
+        self.logger = logger
+        self.root = Path(cache_dir).expanduser()
+        self.path = self.root / hashlib.sha256(self.version.encode()).hexdigest()[:16]
+        if self.enabled:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._remove_other_versions()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the cache stores anything."""
+        return self.max_bytes > 0
+
+    @staticmethod
+    def _last_used(path: Path) -> float:
+        # the mtime of an entry is its last access time, see get()
+        times = [path.stat().st_mtime]
+        for entry in path.iterdir():
+            try:
+                times.append(entry.stat().st_mtime)
+            except FileNotFoundError:
+                continue
+        return max(times)
+
+    def _remove_other_versions(self) -> None:
+        now = time.time()
+        for child in self.root.iterdir():
+            # only remove directories that were created by a DiskCache
+            is_version_dir = len(child.name) == 16 and all(
+                c in "0123456789abcdef" for c in child.name
+            )
+            if not child.is_dir() or not is_version_dir or child == self.path:
+                continue
+            try:
+                unused = now - self._last_used(child)
+            except FileNotFoundError:
+                continue
+            if unused >= self.version_max_age:
+                self.logger.info(
+                    f"Removing cache directory {child}, unused for {unused:.0f}s"
+                )
+                shutil.rmtree(child, ignore_errors=True)
+
+    @staticmethod
+    def key(**params: Any) -> str:
+        """
+        Create the content address for a set of request parameters.
+
+        :param params: The parameters which uniquely identify the request. Values must
+            be JSON serializable
+        :return: A hex digest which identifies the entry
+
+        """
+        payload = json.dumps(params, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _file(self, key: str) -> Path:
+        return self.path / f"{key}{self.suffix}"
+
+    def get(self, key: str) -> Any | None:
+        """
+        Retrieve an entry from the cache.
+
+        :param key: The key returned by :meth:`key`
+        :return: The cached object, or None if the entry does not exist
+
+        """
+        if not self.enabled:
+            return None
+        path = self._file(key)
+        try:
+            with path.open("rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as exc:
+            self.logger.warning(f"Removing unreadable cache entry {path}: {exc}")
+            path.unlink(missing_ok=True)
+            return None
+        # update the mtime, which is used as the last access time for eviction
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Add an entry to the cache, and evict the least recently used entries if the
+        cache is over its size limit.
+
+        :param key: The key returned by :meth:`key`
+        :param value: A picklable object
+
+        """
+        if not self.enabled:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._file(key))
+        except Exception:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove the least recently used entries until the cache fits in
+        max_bytes."""
+        entries = []
+        for path in self.path.glob(f"*{self.suffix}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda x: x[0]):
+            if total <= self.max_bytes:
+                break
+            self.logger.debug(f"Evicting cache entry {path}")
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self) -> None:
+        """Remove all entries from the cache."""
+        for path in self.path.glob(f"*{self.suffix}"):
+            path.unlink(missing_ok=True)
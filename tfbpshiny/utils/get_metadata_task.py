@@ -1,28 +1,28 @@
 from logging import Logger
 
 from shiny import reactive
-from tfbpapi.AbstractAPI import AbstractAPI
+
+from .metadata_store import MetadataStore
 
 
 def get_metadata_task(
-    api: AbstractAPI, label: str, logger: Logger
+    metadata_store: MetadataStore, label: str, logger: Logger
 ) -> reactive.ExtendedTask:
     """
-    This creates a reactive extended task that retrieves metadata from the database
-    using the API .read() method.
+    This creates a reactive extended task that retrieves metadata from the process-wide
+    MetadataStore. The store only hits the database (via the API .read() method) when
+    the dataset has not yet been fetched by any session, or when it is stale.
 
-    :param api: A child of AbstractAPI that has a .read() method
+    :param metadata_store: The MetadataStore with `label` registered
     :param label: A string that describes the API
     :param logger: A logger object
-    :return: A reactive extended task that retrieves metadata from the database
+    :return: A reactive extended task that retrieves metadata from the store
 
     """
 
     @reactive.extended_task()
     async def get_metadata():
-        logger.info(f"Retrieving {label} metadata")
-        res = await api.read()
-        logger.debug(f"Done getting {label} data")
-        return res.get("metadata")
+        logger.debug(f"Requesting {label} metadata from the metadata store")
+        return await metadata_store.get(label)
 
     return get_metadata
@@ -0,0 +1,233 @@
+import asyncio
+import logging
+import sys
+from dataclasses import asdict, dataclass
+from types import ModuleType
+from typing import Any
+
+import aiohttp
+
+logger = logging.getLogger("shiny")
+
+
+@dataclass
+class HttpPoolStats:
+    """Counts of the requests made through an HttpPool, and of their connections."""
+
+    requests: int = 0
+    errors: int = 0
+    connections_created: int = 0
+    connections_reused: int = 0
+
+    @property
+    def reuse_ratio(self) -> float:
+        """The fraction of connections which were reused from the pool."""
+        total = self.connections_created + self.connections_reused
+        return self.connections_reused / total if total else 0.0
+
+
+class HttpPool:
+    """
+    A process-wide pool of keep-alive HTTP connections, shared by every tfbpapi API
+    object which the app builds.
+
+    tfbpapi opens a new ``aiohttp.ClientSession`` in each ``.read()``, so without the
+    pool every request pays for its own TCP and TLS handshakes. :meth:`install` makes
+    the sessions which tfbpapi opens use one shared connector instead. The sessions
+    are still opened and closed by tfbpapi, but closing a session leaves its
+    connections open in the pool for the next request to the same host.
+
+    The connector belongs to the event loop it was created on, so it is created on
+    first use, and the pool is bound to that loop until it is closed. While it is
+    open, the usage of the pool is logged every `stats_interval` seconds.
+
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 10,
+        keepalive_timeout: float = 30.0,
+        stats_interval: float = 300.0,
+        logger: logging.Logger = logger,
+    ):
+        """
+        Initialize the pool.
+
+        :param limit: The maximum number of open connections. 0 for no limit
+        :param limit_per_host: The maximum number of open connections to each host.
+            0 for no limit
+        :param keepalive_timeout: The number of seconds an idle connection is kept
+            open
+        :param stats_interval: The number of seconds between the log lines of the
+            usage of the pool. 0 to not log the usage
+        :param logger: A logger object
+        :raises ValueError: If a limit or stats_interval is negative, or
+            keepalive_timeout is not positive
+
+        """
+        for name, value in [("limit", limit), ("limit_per_host", limit_per_host)]:
+            if not isinstance(value, int) or value < 0:
+                raise ValueError(f"{name} must be a non-negative integer")
+        if not isinstance(keepalive_timeout, (int, float)) or keepalive_timeout <= 0:
+            raise ValueError("keepalive_timeout must be a positive number")
+        if not isinstance(stats_interval, (int, float)) or stats_interval < 0:
+            raise ValueError("stats_interval must be a non-negative number")
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = float(keepalive_timeout)
+        self.stats_interval = float(stats_interval)
+        self.logger = logger
+        self._stats = HttpPoolStats()
+        self._connector: aiohttp.TCPConnector | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stats_task: asyncio.Task | None = None
+        self._trace_config = self._create_trace_config()
+
+    def _create_trace_config(self) -> aiohttp.TraceConfig:
+        stats = self._stats
+
+        async def on_request_start(session, context, params):
+            stats.requests += 1
+
+        async def on_request_exception(session, context, params):
+            stats.errors += 1
+
+        async def on_connection_create_end(session, context, params):
+            stats.connections_created += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            stats.connections_reused += 1
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_exception.append(on_request_exception)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace_config
+
+    @property
+    def connector(self) -> aiohttp.TCPConnector:
+        """
+        The shared connector. Opened on first use, in the running event loop.
+
+        :raises RuntimeError: If the pool is open in another event loop which is
+            still open. See :meth:`close`
+
+        """
+        loop = asyncio.get_running_loop()
+        if self._connector is not None and not self._connector.closed:
+            if self._loop is loop:
+                return self._connector
+            if self._loop is not None and not self._loop.is_closed():
+                raise RuntimeError(
+                    "The HTTP connection pool is open in another event loop. "
+                    "Close it there first"
+                )
+            # the loop of the connector was closed without closing the pool. Its
+            # connections can no longer be used, or closed, by aiohttp
+            self.logger.warning("Replacing the HTTP connection pool of a closed loop")
+        self.logger.info(
+            f"Opening an HTTP connection pool (limit {self.limit}, "
+            f"{self.limit_per_host} per host)"
+        )
+        self._connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        self._loop = loop
+        if self.stats_interval:
+            self._stats_task = loop.create_task(self._log_stats())
+        return self._connector
+
+    def session(self, *args: Any, **kwargs: Any) -> aiohttp.ClientSession:
+        """
+        Open a ClientSession which uses the shared connector. Takes the same arguments
+        as ``aiohttp.ClientSession``, except for `connector`, which is replaced.
+        Closing the session leaves the connections in the pool.
+
+        :return: An ``aiohttp.ClientSession``
+
+        """
+        kwargs.pop("connector", None)
+        trace_configs = [*(kwargs.pop("trace_configs", None) or []), self._trace_config]
+        return aiohttp.ClientSession(
+            *args,
+            connector=self.connector,
+            connector_owner=False,
+            trace_configs=trace_configs,
+            **kwargs,
+        )
+
+    def install(self, package: str) -> list[str]:
+        """
+        Make the modules of a package open their ClientSessions with :meth:`session`.
+
+        Each module of `package` which has imported ``aiohttp`` gets a copy of the
+        ``aiohttp`` namespace, in which ``ClientSession`` is :meth:`session`, and a
+        module which has imported ``ClientSession`` itself gets :meth:`session`. The
+        ``aiohttp`` module, and so every other user of it, is unchanged.
+
+        :param package: The name of an imported package, e.g. "tfbpapi"
+        :return: The names of the modules which were changed
+
+        """
+        installed = []
+        for name, module in list(sys.modules.items()):
+            if not (name == package or name.startswith(f"{package}.")):
+                continue
+            if getattr(module, "aiohttp", None) is aiohttp:
+                pooled_aiohttp = ModuleType("aiohttp")
+                pooled_aiohttp.__dict__.update(vars(aiohttp))
+                pooled_aiohttp.ClientSession = self.session  # type: ignore
+                module.aiohttp = pooled_aiohttp  # type: ignore
+                installed.append(name)
+            elif getattr(module, "ClientSession", None) is aiohttp.ClientSession:
+                module.ClientSession = self.session  # type: ignore
+                installed.append(name)
+        self.logger.info(f"HTTP connection pool installed in {installed}")
+        return installed
+
+    def stats(self) -> dict[str, Any]:
+        """
+        The usage of the pool since it was created.
+
+        :return: A dictionary with the number of requests, request errors, and
+            connections created and reused, and the fraction of connections which
+            were reused
+
+        """
+        return {**asdict(self._stats), "reuse_ratio": round(self._stats.reuse_ratio, 3)}
+
+    async def _log_stats(self) -> None:
+        logged = HttpPoolStats()
+        while True:
+            await asyncio.sleep(self.stats_interval)
+            interval = HttpPoolStats(
+                **{
+                    name: value - getattr(logged, name)
+                    for name, value in asdict(self._stats).items()
+                }
+            )
+            if not interval.requests:
+                continue
+            logged = HttpPoolStats(**asdict(self._stats))
+            self.logger.info(
+                f"HTTP connection pool: {interval.requests} requests, "
+                f"{interval.errors} errors, {interval.reuse_ratio:.0%} of connections "
+                f"reused in the last {self.stats_interval:g}s. "
+                f"Since start: {self.stats()}"
+            )
+
+    async def close(self) -> None:
+        """
+        Close the open connections, in the event loop of the pool. The pool is
+        reopened on next use, in any event loop.
+        """
+        if self._stats_task is not None:
+            self._stats_task.cancel()
+            self._stats_task = None
+        if self._connector is not None:
+            await self._connector.close()
+            self._connector = None
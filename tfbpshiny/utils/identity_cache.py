@@ -0,0 +1,61 @@
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class IdentityCache(Generic[T]):
+    """
+    A small LRU cache of values derived from an object, keyed on the identity of that
+    object.
+
+    This is used to share structures derived from the DataFrames which are themselves
+    shared by every session (e.g. the metadata from the MetadataStore). Those frames
+    are treated as immutable, and a refresh replaces the frame with a new object, so
+    the identity of the frame acts as its version. Each entry holds a reference to its
+    source object, so an id cannot be reused while its entry exists.
+
+    """
+
+    def __init__(self, maxsize: int = 4):
+        """
+        Initialize the cache.
+
+        :param maxsize: The maximum number of entries to keep
+        :raises ValueError: If maxsize is not a positive integer
+
+        """
+        if not isinstance(maxsize, int) or maxsize < 1:
+            raise ValueError("maxsize must be a positive integer")
+        self.maxsize = maxsize
+        self._entries: OrderedDict[tuple[int, Hashable], tuple[Any, T]] = OrderedDict()
+
+    def get(self, obj: Any, factory: Callable[[], T], key: Hashable = None) -> T:
+        """
+        Return the cached value for `obj`, creating it with `factory` if necessary.
+
+        :param obj: The object the value is derived from
+        :param factory: A callable with no arguments which creates the value
+        :param key: An optional additional key, for caching more than one value per
+            object
+        :return: The cached value
+
+        """
+        cache_key = (id(obj), key)
+        if cache_key in self._entries:
+            self._entries.move_to_end(cache_key)
+            return self._entries[cache_key][1]
+
+        value = factory()
+        self._entries[cache_key] = (obj, value)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return value
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        self._entries.clear()
@@ -0,0 +1,138 @@
+import logging
+from collections.abc import Iterable
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("shiny")
+
+# columns with few distinct values relative to the number of rows, which are stored as
+# categoricals
+CATEGORICAL_COLUMNS = [
+    "binding_source",
+    "expression_source",
+    "source_name",
+    "regulator_symbol",
+    "regulator_locus_tag",
+    "rank_response_status",
+    "dto_status",
+]
+
+# database ids. These are stored as nullable integers, since a missing foreign key
+# would otherwise turn the column into floats
+ID_COLUMNS = [
+    "id",
+    "regulator_id",
+    "binding",
+    "expression",
+    "promotersetsig",
+    "single_binding",
+    "composite_binding",
+]
+
+
+class MetadataSchema:
+    """
+    The dtypes applied to a metadata DataFrame when it is retrieved from the database.
+
+    - the `categorical` columns are converted to categoricals. The categories are
+      sorted, and are remembered between calls to :meth:`apply`. New values extend the
+      categories, so the dtype only changes when the data does
+    - the `ids` columns are converted to the nullable Int64 dtype
+    - other int64 columns are downcast to int32 when their values fit. Floats are left
+      as float64, since the p-values are often smaller than the smallest float32
+
+    Columns which are not in the DataFrame are ignored, so one schema can be used for
+    every metadata dataset.
+
+    """
+
+    def __init__(
+        self,
+        categorical: Iterable[str] = CATEGORICAL_COLUMNS,
+        ids: Iterable[str] = ID_COLUMNS,
+        logger: logging.Logger = logger,
+    ):
+        """
+        Initialize the schema.
+
+        :param categorical: The columns to store as categoricals
+        :param ids: The columns to store as nullable integers
+        :param logger: A logger object
+
+        """
+        self.categorical = list(categorical)
+        self.ids = list(ids)
+        self.logger = logger
+        self._dtypes: dict[str, pd.CategoricalDtype] = {}
+
+    def categorical_dtype(self, column: str, values: pd.Series) -> pd.CategoricalDtype:
+        """
+        Get the dtype for a categorical column, extending the categories of the
+        previous dtype with any new values.
+
+        :param column: The column name
+        :param values: The values of the column
+        :return: The CategoricalDtype for the column
+
+        """
+        dtype = self._dtypes.get(column)
+        observed = pd.Index(values.dropna().unique()).astype(str)
+        if dtype is None or not observed.isin(dtype.categories).all():
+            known = dtype.categories if dtype is not None else pd.Index([], dtype=str)
+            dtype = pd.CategoricalDtype(known.union(observed).sort_values())
+            self._dtypes[column] = dtype
+        return dtype
+
+    def apply(self, df: pd.DataFrame, label: str = "metadata") -> pd.DataFrame:
+        """
+        Apply the schema to a DataFrame.
+
+        :param df: The DataFrame, e.g. the metadata returned by an API .read()
+        :param label: A label for the DataFrame, used in the log message
+        :return: A new DataFrame with the schema applied
+        :raises TypeError: If an id column cannot be converted to integers
+
+        """
+        before = df.memory_usage(deep=True).sum()
+        converted: dict[str, pd.Series] = {}
+
+        for column in self.categorical:
+            if column in df.columns:
+                values = df[column]
+                # categories are strings, so the values must be too
+                values = values.where(values.isna(), values.astype(str))
+                converted[column] = values.astype(
+                    self.categorical_dtype(column, values)
+                )
+
+        for column in self.ids:
+            if column in df.columns:
+                try:
+                    converted[column] = pd.to_numeric(df[column]).astype("Int64")
+                except (TypeError, ValueError) as exc:
+                    self.logger.error(f"{label} column {column} is not an id: {exc}")
+                    raise TypeError(
+                        f"{label} column {column} cannot be converted to integers"
+                    ) from exc
+
+        int32 = np.iinfo(np.int32)
+        for column in df.columns.difference(converted.keys()):
+            values = df[column]
+            if (
+                values.dtype == np.int64
+                and not values.empty
+                and int32.min <= values.min()
+                and values.max() <= int32.max
+            ):
+                converted[column] = values.astype(np.int32)
+
+        typed = df.assign(**converted)
+
+        after = typed.memory_usage(deep=True).sum()
+        self.logger.info(
+            f"Applied the metadata schema to {label}: "
+            f"{before / 1024**2:.2f} MB -> {after / 1024**2:.2f} MB "
+            f"({(before - after) / 1024**2:.2f} MB saved)"
+        )
+        return typed
@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+import pandas as pd
+
+from .metadata_schema import MetadataSchema
+
+logger = logging.getLogger("shiny")
+
+
+@dataclass
+class MetadataEntry:
+    """The cached state of a single metadata dataset."""
+
+    value: pd.DataFrame | None = None
+    fetched_at: float = 0.0
+    version: int = 0
+    inflight: asyncio.Task | None = field(default=None, repr=False)
+
+
+class MetadataStore:
+    """
+    A process-wide store for the metadata frames returned by the tfbpapi ``.read()``
+    methods.
+
+    Every browser session shares the same store, so a dataset is fetched at most once
+    at a time regardless of how many sessions ask for it. Once a dataset has been
+    retrieved, it is served from memory. After ``ttl`` seconds the cached frame is
+    considered stale: it is still returned immediately, and a single background refresh
+    is started (stale-while-revalidate). If a refresh fails, the stale frame continues
+    to be served.
+
+    Each frame is typed with its dataset's :class:`MetadataSchema` when it is
+    retrieved. The schema remembers the categories of each categorical column, so the
+    dtypes stay the same across refreshes unless the data gains new values.
+
+    The frames returned by :meth:`get` are shared between sessions and must be treated
+    as read only.
+
+    """
+
+    def __init__(self, ttl: float = 3600.0, logger: logging.Logger = logger):
+        """
+        Initialize the store.
+
+        :param ttl: Number of seconds after which a cached frame is refreshed in the
+            background. Must be positive.
+        :param logger: A logger object
+        :raises ValueError: If ttl is not a positive number
+
+        """
+        if not isinstance(ttl, (int, float)) or ttl <= 0:
+            raise ValueError("ttl must be a positive number")
+        self.ttl = float(ttl)
+        self.logger = logger
+        self._api_factories: dict[str, Callable[[], Any]] = {}
+        self._schemas: dict[str, MetadataSchema] = {}
+        self._entries: dict[str, MetadataEntry] = {}
+
+    def register(
+        self,
+        label: str,
+        api_factory: Callable[[], Any],
+        schema: MetadataSchema | None = None,
+    ) -> None:
+        """
+        Register a dataset with the store.
+
+        :param label: A string that describes the API, e.g. "binding"
+        :param api_factory: A callable returning a child of AbstractAPI, e.g. the
+            ``BindingAPI`` class. It is called each time the dataset is fetched
+        :param schema: The schema to apply to the dataset. Defaults to a
+            MetadataSchema with the default columns
+        :raises ValueError: If the label is already registered
+
+        """
+        if label in self._api_factories:
+            raise ValueError(f"{label} is already registered")
+        self._api_factories[label] = api_factory
+        self._schemas[label] = (
+            schema if schema is not None else MetadataSchema(logger=self.logger)
+        )
+        self._entries[label] = MetadataEntry()
+
+    @property
+    def labels(self) -> list[str]:
+        """The labels of the registered datasets."""
+        return list(self._api_factories)
+
+    def _entry(self, label: str) -> MetadataEntry:
+        try:
+            return self._entries[label]
+        except KeyError:
+            raise KeyError(f"{label} is not registered with the MetadataStore")
+
+    def version(self, label: str) -> int:
+        """
+        Return the version of the cached dataset. The version starts at 0 and is
+        incremented each time a fetch succeeds, so it can be used to key derived
+        caches.
+
+        :param label: The dataset label
+        :return: The current version of the dataset
+
+        """
+        return self._entry(label).version
+
+    def is_stale(self, label: str) -> bool:
+        """
+        Return True if the dataset has not been fetched or is older than the ttl.
+
+        :param label: The dataset label
+        :return: Whether the cached dataset is missing or stale
+
+        """
+        entry = self._entry(label)
+        return entry.value is None or (time.monotonic() - entry.fetched_at) > self.ttl
+
+    async def _fetch(self, label: str) -> pd.DataFrame:
+        entry = self._entry(label)
+        self.logger.info(f"Retrieving {label} metadata")
+        try:
+            res = await self._api_factories[label]().read()
+            metadata = await asyncio.to_thread(
+                self._schemas[label].apply, res.get("metadata"), label
+            )
+            entry.value = metadata
+            entry.fetched_at = time.monotonic()
+            entry.version += 1
+            self.logger.debug(f"Done getting {label} data (version {entry.version})")
+            return metadata
+        finally:
+            entry.inflight = None
+
+    def _start_fetch(self, label: str) -> asyncio.Task:
+        entry = self._entry(label)
+        if entry.inflight is None:
+            entry.inflight = asyncio.create_task(self._fetch(label))
+            entry.inflight.add_done_callback(
+                lambda task: self._log_refresh_failure(label, task)
+            )
+        return entry.inflight
+
+    def _log_refresh_failure(self, label: str, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.error(
+                f"Failed to retrieve {label} metadata: {task.exception()}"
+            )
+
+    async def get(self, label: str) -> pd.DataFrame:
+        """
+        Return the metadata for a dataset.
+
+        If the dataset has never been fetched, this waits on the (shared) in-flight
+        fetch. If the cached frame is stale, it is returned immediately and a
+        background refresh is started if one is not already running.
+
+        :param label: The dataset label
+        :return: The metadata DataFrame
+        :raises KeyError: If the label is not registered
+
+        """
+        entry = self._entry(label)
+        if entry.value is None:
+            # shield so that a cancelled session does not cancel the shared fetch
+            return await asyncio.shield(self._start_fetch(label))
+        if self.is_stale(label):
+            self.logger.debug(f"{label} metadata is stale. Refreshing in background")
+            self._start_fetch(label)
+        return entry.value
+
+    def invalidate(self, label: str | None = None) -> None:
+        """
+        Mark one or all datasets as stale so that the next :meth:`get` triggers a
+        refresh. The cached frames are kept and served until the refresh completes.
+
+        :param label: The dataset label. If None, all datasets are invalidated
+
+        """
+        labels = [label] if label is not None else self.labels
+        for lbl in labels:
+            self._entry(lbl).fetched_at = float("-inf")
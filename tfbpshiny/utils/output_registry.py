@@ -0,0 +1,102 @@
+import logging
+from collections.abc import Iterable
+
+from shiny import Outputs, reactive
+from shiny.render.renderer import Renderer
+
+logger = logging.getLogger("shiny")
+
+
+class OutputRegistry:
+    """
+    The outputs which a session registers dynamically, e.g. one plot per replicate of
+    the selected regulator, along with the effects which belong to them.
+
+    Shiny keeps an output until it is removed, or the session ends, so without this
+    a long session accumulates an output (and its figure) for every plot it has ever
+    shown. Outputs which are no longer displayed are removed with :meth:`retain`,
+    which destroys their effects and lets their objects be freed.
+
+    """
+
+    def __init__(
+        self, output: Outputs, name: str = "dynamic", logger: logging.Logger = logger
+    ):
+        """
+        Initialize the registry.
+
+        :param output: The session's (or module's) outputs
+        :param name: A name for the outputs, used in log messages
+        :param logger: A logger object
+
+        """
+        self._output = output
+        self.name = name
+        self.logger = logger
+        self._effects: dict[str, list[reactive.Effect_]] = {}
+        # the number of registered outputs, for monitoring
+        self.count = reactive.value(0)
+
+    def __len__(self) -> int:
+        return len(self._effects)
+
+    def __contains__(self, id: str) -> bool:
+        return id in self._effects
+
+    def register(
+        self, id: str, renderer: Renderer, *effects: reactive.Effect_
+    ) -> Renderer:
+        """
+        Register a renderer as an output, replacing any output with the same id.
+
+        :param id: The output id
+        :param renderer: The renderer, e.g. a function decorated with
+            `@render_plotly`
+        :param effects: Effects which belong to the output. They are destroyed when
+            the output is replaced or removed
+        :return: The renderer
+
+        """
+        self._destroy_effects(id)
+        self._output(id=id)(renderer)
+        self._effects[id] = list(effects)
+        self._update_count()
+        return renderer
+
+    def remove(self, id: str) -> None:
+        """
+        Remove an output and destroy its effects. Ids which are not registered are
+        ignored.
+
+        :param id: The output id
+
+        """
+        if id in self._effects:
+            self._destroy_effects(id)
+            self._output.remove(id)
+            del self._effects[id]
+            self._update_count()
+
+    def retain(self, ids: Iterable[str]) -> None:
+        """
+        Remove every output which is not in `ids`.
+
+        :param ids: The ids of the outputs to keep
+
+        """
+        keep = set(ids)
+        stale = [id for id in self._effects if id not in keep]
+        for id in stale:
+            self.remove(id)
+        if stale:
+            self.logger.info(f"Removed {len(stale)} stale {self.name} outputs")
+
+    def _destroy_effects(self, id: str) -> None:
+        for effect in self._effects.get(id, []):
+            effect.destroy()
+
+    def _update_count(self) -> None:
+        with reactive.isolate():
+            if self.count.get() != len(self):
+                self.count.set(len(self))
+                self.logger.debug(f"{len(self)} {self.name} outputs registered")
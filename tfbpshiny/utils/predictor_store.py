@@ -0,0 +1,169 @@
+import glob
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("shiny")
+
+
+def _store_paths(csv_path: Path, version: str) -> tuple[Path, Path]:
+    stem = f"{csv_path.stem}.{version}"
+    return csv_path.with_name(f"{stem}.npy"), csv_path.with_name(f"{stem}.index.json")
+
+
+def _pointer_path(csv_path: Path) -> Path:
+    return csv_path.with_suffix(".store.json")
+
+
+def _current_version(csv_path: Path) -> str | None:
+    """The version of the store, or None if there is none which is newer than the
+    CSV."""
+    pointer_path = _pointer_path(csv_path)
+    try:
+        if pointer_path.stat().st_mtime < csv_path.stat().st_mtime:
+            return None
+        return json.loads(pointer_path.read_text())["version"]
+    except FileNotFoundError:
+        return None
+
+
+def _remove_other_versions(csv_path: Path, version: str, before: float) -> None:
+    # only the versions written before this one was started are removed, so that a
+    # version which another process is still writing is kept
+    prefix = glob.escape(csv_path.stem)
+    for suffix in (".npy", ".index.json"):
+        for path in csv_path.parent.glob(f"{prefix}.*{suffix}"):
+            other = path.name[len(csv_path.stem) + 1 : -len(suffix)]
+            if len(other) != 16 or other == version:
+                continue
+            try:
+                if path.stat().st_mtime < before:
+                    path.unlink()
+            except FileNotFoundError:
+                continue
+
+
+def _atomic_write(path: Path, write) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except Exception:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+def convert_csv_to_store(
+    csv_path: str | Path, index_col: str = "target_symbol"
+) -> tuple[Path, Path]:
+    """
+    Convert a numeric gene x TF CSV matrix into a binary store which can be memory
+    mapped. The store is two files written next to the CSV: a ``.npy`` file with the
+    values and a ``.index.json`` file with the row and column labels. Both are named
+    after a new version, and a ``.store.json`` file, which names the current version,
+    is replaced once both are written. Concurrent worker processes therefore never
+    see a partial file, or the values of one version with the labels of another. The
+    files of the previous versions are then removed.
+
+    :param csv_path: Path to the CSV file
+    :param index_col: The column to use as the row index
+    :return: A tuple of the paths to the ``.npy`` and ``.index.json`` files
+    :raises ValueError: If the index column is missing, or if the remaining
+        columns are not numeric
+
+    """
+    csv_path = Path(csv_path)
+    started = time.time()
+    version = uuid.uuid4().hex[:16]
+    npy_path, index_path = _store_paths(csv_path, version)
+
+    logger.info(f"Converting {csv_path} to a memory mapped store")
+    df = pd.read_csv(csv_path)
+    if index_col not in df.columns:
+        raise ValueError(f"{csv_path} does not have the index column {index_col}")
+    df.set_index(index_col, inplace=True)
+    non_numeric = [
+        col for col in df.columns if not pd.api.types.is_numeric_dtype(df[col])
+    ]
+    if non_numeric:
+        raise ValueError(f"{csv_path} has non-numeric columns: {non_numeric}")
+
+    values = np.ascontiguousarray(df.to_numpy(dtype=np.float64))
+    labels = {
+        "index_name": index_col,
+        "index": df.index.astype(str).tolist(),
+        "columns": df.columns.astype(str).tolist(),
+    }
+
+    _atomic_write(npy_path, lambda f: np.save(f, values))
+    _atomic_write(index_path, lambda f: f.write(json.dumps(labels).encode()))
+    # the values and labels are swapped in together
+    _atomic_write(
+        _pointer_path(csv_path),
+        lambda f: f.write(json.dumps({"version": version}).encode()),
+    )
+    _remove_other_versions(csv_path, version, started)
+
+    return npy_path, index_path
+
+
+@lru_cache(maxsize=None)
+def load_predictor_matrix(
+    csv_path: str | Path, index_col: str = "target_symbol"
+) -> pd.DataFrame:
+    """
+    Load a numeric gene x TF CSV matrix as a DataFrame backed by a read-only memory
+    map.
+
+    The CSV is converted with `convert_csv_to_store` the first time it is loaded, and
+    again whenever the CSV is newer than the store. The values are then memory mapped
+    rather than read into memory, so every process on the host shares the same pages
+    of the page cache. The result is memoized, so every session in a process receives
+    the same DataFrame, which must be treated as read only.
+
+    :param csv_path: Path to the CSV file
+    :param index_col: The column to use as the row index
+    :return: A DataFrame with `index_col` as the index
+    :raises RuntimeError: If the store keeps being replaced while it is opened
+    :raises ValueError: If the labels do not match the shape of the values
+
+    """
+    csv_path = Path(csv_path)
+
+    for _ in range(3):
+        version = _current_version(csv_path)
+        if version is None:
+            npy_path, index_path = convert_csv_to_store(csv_path, index_col)
+        else:
+            npy_path, index_path = _store_paths(csv_path, version)
+        try:
+            labels = json.loads(index_path.read_text())
+            values = np.load(npy_path, mmap_mode="r")
+            break
+        except FileNotFoundError:
+            # another process replaced the store, and removed this version, while
+            # it was being opened
+            continue
+    else:
+        raise RuntimeError(f"The store of {csv_path} could not be opened")
+
+    if values.shape != (len(labels["index"]), len(labels["columns"])):
+        raise ValueError(f"The labels in {index_path} do not match {npy_path}")
+
+    logger.debug(f"Memory mapped {npy_path} with shape {values.shape}")
+
+    return pd.DataFrame(
+        values,
+        index=pd.Index(labels["index"], name=labels["index_name"]),
+        columns=labels["columns"],
+        copy=False,
+    )
@@ -1,8 +1,11 @@
 # %%
 import logging
+from functools import lru_cache
 
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
+from scipy import special
 from scipy.stats import binom, binomtest
 from scipy.stats._result_classes import BinomTestResult
 
@@ -50,6 +53,170 @@ def parse_binomtest_results(binomtest_obj: BinomTestResult, **kwargs):
     )
 
 
+def _vectorized_binary_search(a, d: np.ndarray, lo: np.ndarray, hi: np.ndarray):
+    """
+    A vectorized version of scipy's ``_binary_search_for_binom_tst``. Each element of
+    `d`, `lo` and `hi` is an independent search. The comparisons and the update rules
+    are the same as scipy's, so the result is identical to running the scalar search
+    on each element.
+
+    :param a: A callable ``a(x, idx)`` which evaluates the (ascending) search function
+        at `x` for the searches with integer positions `idx`
+    :param d: The value to search for, one per search
+    :param lo: The lower end of the range to search, one per search
+    :param hi: The upper end of the range to search, one per search
+    :return: An array of indices i such that a(i) <= d < a(i + 1)
+
+    """
+    lo = lo.astype(float)
+    hi = hi.astype(float)
+    result = np.full(lo.shape, np.nan)
+    done = np.zeros(lo.shape, dtype=bool)
+
+    active = np.flatnonzero(lo < hi)
+    while active.size:
+        mid = lo[active] + (hi[active] - lo[active]) // 2
+        midval = a(mid, active)
+        below = midval < d[active]
+        above = midval > d[active]
+        found = ~below & ~above
+        lo[active[below]] = mid[below] + 1
+        hi[active[above]] = mid[above] - 1
+        result[active[found]] = mid[found]
+        done[active[found]] = True
+        active = active[~found]
+        active = active[lo[active] < hi[active]]
+
+    remaining = np.flatnonzero(~done)
+    if remaining.size:
+        lo_remaining = lo[remaining]
+        result[remaining] = np.where(
+            a(lo_remaining, remaining) <= d[remaining],
+            lo_remaining,
+            lo_remaining - 1,
+        )
+    return result
+
+
+def vectorized_binomtest(
+    k,
+    n,
+    p,
+    alternative: str = "two-sided",
+    confidence_level: float = 0.95,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Batched equivalent of ``scipy.stats.binomtest`` followed by
+    ``proportion_ci(method="exact")``, computed for whole arrays of (successes,
+    trials, probability) at once.
+
+    The p-values are computed with the same algorithm as scipy and are identical to
+    the scalar results. The exact (Clopper-Pearson) confidence interval bounds are
+    computed in closed form from the beta quantiles (``scipy.special.betaincinv``)
+    rather than with scipy's root finder, and agree with it to within the root finder
+    tolerance (~1e-12).
+
+    :param k: Array-like of the number of successes
+    :param n: Array-like of the number of trials
+    :param p: Array-like of the hypothesized probability of success
+    :param alternative: One of "two-sided", "less" or "greater"
+    :param confidence_level: The confidence level of the interval. Default is 0.95
+    :return: A tuple of arrays containing the response ratio (k / n), p-value, and
+        confidence interval bounds
+    :raises ValueError: If the alternative is not recognized, or k, n or p are
+        out of range
+
+    :examples:
+
+    .. code-block:: python
+
+        vectorized_binomtest([1, 3], [2, 10], [0.5, 0.1])
+        # Output: (array([0.5, 0.3]), <p-values>, <ci_lower>, <ci_upper>)
+
+    """
+    k, n, p = np.broadcast_arrays(
+        np.asarray(k, dtype=np.int64),
+        np.asarray(n, dtype=np.int64),
+        np.asarray(p, dtype=float),
+    )
+
+    if alternative not in ("two-sided", "less", "greater"):
+        raise ValueError(
+            f"alternative ('{alternative}') not recognized; "
+            "must be 'two-sided', 'less' or 'greater'"
+        )
+    if np.any(n < 1):
+        raise ValueError("n must be >= 1")
+    if np.any((k < 0) | (k > n)):
+        raise ValueError("k must be in the range [0, n]")
+    if np.any((p < 0) | (p > 1)):
+        raise ValueError("p must be in the range [0, 1]")
+
+    statistic = k / n
+
+    # ---- p-values ----
+    if alternative == "less":
+        pvalue = binom.cdf(k, n, p)
+    elif alternative == "greater":
+        pvalue = binom.sf(k - 1, n, p)
+    else:
+        pvalue = np.ones(k.shape)
+        d = binom.pmf(k, n, p) * (1 + 1e-7)
+        pn = p * n
+
+        # k below the mode: find the number of terms on the upper side <= d
+        lower = np.flatnonzero(k < pn)
+        if lower.size:
+            kl, nl, pl = k[lower], n[lower], p[lower]
+            ix = _vectorized_binary_search(
+                lambda x, idx: -binom.pmf(x, nl[idx], pl[idx]),
+                -d[lower],
+                np.ceil(pn[lower]),
+                nl,
+            )
+            y = nl - ix + (d[lower] == binom.pmf(ix, nl, pl)).astype(int)
+            pvalue[lower] = binom.cdf(kl, nl, pl) + binom.sf(nl - y, nl, pl)
+
+        # k above the mode: find the number of terms on the lower side <= d
+        upper = np.flatnonzero(k > pn)
+        if upper.size:
+            ku, nu, pu = k[upper], n[upper], p[upper]
+            ix = _vectorized_binary_search(
+                lambda x, idx: binom.pmf(x, nu[idx], pu[idx]),
+                d[upper],
+                np.zeros(upper.size),
+                np.floor(pn[upper]),
+            )
+            pvalue[upper] = binom.cdf(ix, nu, pu) + binom.sf(ku - 1, nu, pu)
+
+        pvalue = np.minimum(1.0, pvalue)
+
+    # ---- exact (Clopper-Pearson) confidence interval ----
+    alpha = 1 - confidence_level
+    if alternative == "two-sided":
+        alpha = alpha / 2
+    # the shape parameters are clipped to 1 where the bound is fixed at 0 or 1 to
+    # avoid evaluating betaincinv outside of its domain
+    if alternative == "less":
+        ci_lower = np.zeros(k.shape)
+    else:
+        ci_lower = np.where(
+            k == 0,
+            0.0,
+            special.betaincinv(np.maximum(k, 1), n - k + 1, alpha),
+        )
+    if alternative == "greater":
+        ci_upper = np.ones(k.shape)
+    else:
+        ci_upper = np.where(
+            k == n,
+            1.0,
+            special.betaincinv(k + 1, np.maximum(n - k, 1), 1 - alpha),
+        )
+
+    return statistic, pvalue, ci_lower, ci_upper
+
+
 def compute_rank_response(df: pd.DataFrame, **kwargs) -> pd.DataFrame:
     """
     Computes rank-based statistics and binomial test results for a DataFrame.
@@ -67,7 +234,9 @@ def compute_rank_response(df: pd.DataFrame, **kwargs) -> pd.DataFrame:
     :param kwargs: Additional keyword arguments are passed
         to the binomtest function, including arguments to the
         proportional_ci method of the BinomTestResults object (see scipy
-        documentation for details)
+        documentation for details). When the (default) "exact" method is
+        used, the statistics for all rank bins are computed in one batch
+        with `vectorized_binomtest`
 
     :return: A DataFrame indexed by 'rank_bin' with columns for the
             number of responsive items in each bin ('n_responsive_in_rank'),
@@ -97,21 +266,33 @@ def compute_rank_response(df: pd.DataFrame, **kwargs) -> pd.DataFrame:
 
     rank_response_df["n_successes"] = rank_response_df["n_responsive_in_rank"].cumsum()
 
+    stat_cols = ["response_ratio", "pvalue", "ci_lower", "ci_upper"]
+
     # Binomial Test and Confidence Interval
-    rank_response_df[["response_ratio", "pvalue", "ci_lower", "ci_upper"]] = (
-        rank_response_df.apply(
-            lambda row: parse_binomtest_results(
-                binomtest(
-                    int(row["n_successes"]),
-                    int(row.rank_bin),
-                    float(row["random"]),
-                    alternative=kwargs.get("alternative", "two-sided"),
-                ),
-                **kwargs,
-            ),
-            axis=1,
-            result_type="expand",
+    if kwargs.get("method", "exact") == "exact":
+        stats = vectorized_binomtest(
+            rank_response_df["n_successes"].to_numpy(dtype=np.int64),
+            rank_response_df["rank_bin"].to_numpy(dtype=np.int64),
+            rank_response_df["random"].to_numpy(dtype=float),
+            alternative=kwargs.get("alternative", "two-sided"),
+            confidence_level=kwargs.get("confidence_level", 0.95),
         )
+        for col, values in zip(stat_cols, stats):
+            rank_response_df[col] = values
+        return rank_response_df
+
+    rank_response_df[stat_cols] = rank_response_df.apply(
+        lambda row: parse_binomtest_results(
+            binomtest(
+                int(row["n_successes"]),
+                int(row.rank_bin),
+                float(row["random"]),
+                alternative=kwargs.get("alternative", "two-sided"),
+            ),
+            **kwargs,
+        ),
+        axis=1,
+        result_type="expand",
     )
 
     return rank_response_df
@@ -134,6 +315,36 @@ def binom_ci(trials, random_prob, alpha=0.05):
     return lower_bound, upper_bound
 
 
+@lru_cache(maxsize=256)
+def random_expectation_ci(
+    n_bins: int, step: int, random_prob: float, alpha: float = 0.05
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Calculate the binomial confidence band around the random expectation for every
+    plotted rank bin. This is equivalent to calling `binom_ci` on each bin of
+    ``range(5, n_bins + 1, step)``, but both quantiles for all bins are computed in a
+    single vectorized ``binom.ppf`` call.
+
+    The band only depends on the arguments, so results are memoized and shared by
+    every replicate with the same random expectation. The returned arrays are read
+    only.
+
+    :param n_bins: The number of bins to consider
+    :param step: The step size for the x-axis
+    :param random_prob: The probability of success (p), ie the random expectation
+    :param alpha: The significance level (default is 0.05)
+    :return: A tuple of arrays containing the lower and upper bounds of the
+        confidence interval for each bin
+
+    """
+    trials = np.arange(5, n_bins + 1, step)
+    quantiles = np.array([[alpha / 2], [1 - alpha / 2]])
+    lower_bound, upper_bound = binom.ppf(quantiles, trials, random_prob) / trials
+    lower_bound.flags.writeable = False
+    upper_bound.flags.writeable = False
+    return lower_bound, upper_bound
+
+
 def process_plot_data(data: pd.DataFrame, n_bins: int = 150, step: int = 5) -> dict:
     """
     Process the data for plotting. This function filters the data for a specific key,
@@ -164,7 +375,7 @@ def process_plot_data(data: pd.DataFrame, n_bins: int = 150, step: int = 5) -> d
         # ensure that the vector of random is the same length as x
         "random_y": random_vector,
         "ci": (
-            bin_vector.apply(lambda n: binom_ci(n, rr_summary["random"][0]))
+            random_expectation_ci(n_bins, step, float(rr_summary["random"][0]))
             if "random" in rr_summary
             else None
         ),
@@ -234,8 +445,7 @@ def add_traces_to_plot(fig, promotersetsig, add_random, **kwargs):
         )
 
         if kwargs["ci"] is not None:
-            ci_lower = kwargs["ci"].apply(lambda x: x[0])
-            ci_upper = kwargs["ci"].apply(lambda x: x[1])
+            ci_lower, ci_upper = kwargs["ci"]
 
             # Add confidence interval lower bound
             fig.add_trace(
@@ -262,9 +472,19 @@ def add_traces_to_plot(fig, promotersetsig, add_random, **kwargs):
             )
 
 
-def create_rank_response_replicate_plot(plots_dict):
-    """Generate a dictionary of Plotly figures from the prepared rank response data."""
+def create_rank_response_replicate_plot(plots_dict, regulator_labels=None):
+    """
+    Generate a dictionary of Plotly figures from the prepared rank response data.
+
+    :param plots_dict: The dictionary returned by `prepare_rank_response_data`
+    :param regulator_labels: An optional dictionary of expression id to regulator
+        label. If given, the label is added to the title of the plot, e.g. when the
+        plots of several regulators are shown together
+    :return: A dictionary of expression id to figure
+
+    """
     output_dict = {}
+    regulator_labels = regulator_labels or {}
 
     for expression_id, promotersetsig_dict in plots_dict.items():
         fig = go.Figure()
@@ -275,9 +495,12 @@ def create_rank_response_replicate_plot(plots_dict):
             add_random = False  # Add random line only once
 
         # Update the layout of the figure
+        title = f"Rank Response for Expression ID {expression_id}"
+        if expression_id in regulator_labels:
+            title = f"{regulator_labels[expression_id]}: {title}"
         fig.update_layout(
             title={
-                "text": f"Rank Response for Expression ID {expression_id}",
+                "text": title,
                 "x": 0.5,
             },
             yaxis_title="# Responsive / # Genes",
@@ -293,6 +516,85 @@ def create_rank_response_replicate_plot(plots_dict):
     return output_dict
 
 
+def create_rank_response_replicate_plots_by_source(
+    rr_dict: dict, label_regulators: bool | None = None
+) -> dict:
+    """
+    Prepare the data and create the rank response replicate plots for each expression
+    source. This is CPU bound, and is run in a ComputePool worker process, so the
+    arguments and return value are plain picklable objects.
+
+    :param rr_dict: The dictionary returned by ``RankResponseAPI.read()``, with the
+        keys "metadata" and "data". May hold the replicates of more than one
+        regulator, in which case each plot is titled with its regulator
+    :param label_regulators: Whether to title each plot with its regulator. If None,
+        the plots are titled when `rr_dict` holds more than one regulator. Set this
+        when `rr_dict` is part of a response, so that every part is titled alike
+    :return: A dictionary keyed on expression source, in sorted order, where each value
+        is the dictionary of figures returned by `create_rank_response_replicate_plot`
+
+    """
+    metadata = rr_dict.get("metadata")
+    regulator_labels = None
+    label_col = next(
+        (
+            col
+            for col in ["regulator_symbol", "regulator_locus_tag", "regulator_id"]
+            if col in metadata.columns
+        ),
+        None,
+    )
+    if label_regulators is None:
+        label_regulators = label_col is not None and metadata[label_col].nunique() > 1
+    if label_regulators and label_col is not None:
+        regulator_labels = dict(
+            zip(metadata["expression"].astype(str), metadata[label_col].astype(str))
+        )
+
+    plots_by_source = {}
+    for source in sorted(metadata["expression_source"].unique()):
+        plots_dict = prepare_rank_response_data(
+            {
+                "metadata": metadata[metadata["expression_source"] == source],
+                "data": rr_dict.get("data"),
+            }
+        )
+        plots_by_source[source] = create_rank_response_replicate_plot(
+            plots_dict, regulator_labels
+        )
+    return plots_by_source
+
+
+def replicate_trace_visibility(
+    traces, selected_promotersetsigs: set | None
+) -> list[bool | str | None]:
+    """
+    The visibility of each trace of a rank response replicate plot for a selection of
+    promotersetsigs.
+
+    :param traces: The traces of the figure, e.g. ``fig["data"]``
+    :param selected_promotersetsigs: The selected promotersetsig ids. If empty or None,
+        every replicate is shown
+    :return: A list with one entry per trace. The replicate traces are True if they
+        are selected, and "legendonly" otherwise. Other traces (e.g. the random
+        expectation) are None, since their visibility does not depend on the selection
+
+    """
+    visibility: list[bool | str | None] = []
+    for trace in traces:
+        meta = trace["meta"] if "meta" in trace else None
+        if not meta:
+            visibility.append(None)
+        elif (
+            not selected_promotersetsigs
+            or int(meta["promotersetsig"]) in selected_promotersetsigs
+        ):
+            visibility.append(True)
+        else:
+            visibility.append("legendonly")
+    return visibility
+
+
 # ## Example
 
 # Set up the environment
@@ -0,0 +1,233 @@
+import json
+import re
+from typing import Literal
+
+import numpy as np
+import pandas as pd
+from shiny import Session
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+from .identity_cache import IdentityCache
+
+LabelColumn = Literal["regulator_symbol", "regulator_locus_tag"]
+
+
+class RegulatorChoiceIndex:
+    """
+    The choices for a regulator selector, ordered by both regulator symbol and locus
+    tag.
+
+    The index is built once per metadata frame (see `get_regulator_choice_index`) and
+    shared by every session. Choices are searched on the server (see
+    `update_regulator_selectize`), so the browser only ever receives the choices which
+    match what the user has typed.
+
+    """
+
+    label_columns: tuple[LabelColumn, ...] = ("regulator_symbol", "regulator_locus_tag")
+
+    def __init__(self, regulators: pd.DataFrame):
+        """
+        Initialize the index. Use `from_metadata` to build an index from a metadata
+        DataFrame.
+
+        :param regulators: DataFrame with one row per regulator and the columns
+            'regulator_id', 'regulator_symbol' and 'regulator_locus_tag'
+
+        """
+        self.values = regulators["regulator_id"].astype(str).to_numpy()
+        self._labels: dict[str, np.ndarray] = {}
+        self._search_labels: dict[str, pd.Series] = {}
+        self._order: dict[str, np.ndarray] = {}
+        for col in self.label_columns:
+            labels = regulators[col].astype(str)
+            self._labels[col] = labels.to_numpy()
+            self._search_labels[col] = labels.str.lower().reset_index(drop=True)
+            self._order[col] = np.argsort(self._labels[col], kind="stable")
+
+    @classmethod
+    def from_metadata(cls, metadata: pd.DataFrame) -> "RegulatorChoiceIndex":
+        """
+        Build the index from a metadata DataFrame.
+
+        :param metadata: DataFrame with (at least) the columns 'regulator_id',
+            'regulator_symbol' and 'regulator_locus_tag'. May have more than one row
+            per regulator
+        :return: A RegulatorChoiceIndex
+
+        """
+        regulators = metadata[["regulator_id", *cls.label_columns]].drop_duplicates(
+            subset="regulator_id", keep="last"
+        )
+        return cls(regulators)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def choices(self, label_col: LabelColumn) -> dict[str, str]:
+        """
+        All of the choices, sorted by label.
+
+        :param label_col: The column to use as the label
+        :return: A dictionary of regulator id to label
+
+        """
+        order = self._order[label_col]
+        return dict(zip(self.values[order], self._labels[label_col][order]))
+
+    def label(self, value: str, label_col: LabelColumn) -> str | None:
+        """
+        The label of a regulator.
+
+        :param value: The regulator id
+        :param label_col: The column to use as the label
+        :return: The label, or None if the regulator is not in the index
+
+        """
+        positions = np.flatnonzero(self.values == str(value))
+        if len(positions) == 0:
+            return None
+        return self._labels[label_col][positions[0]]
+
+    def neighbors(self, value: str, label_col: LabelColumn, n: int = 1) -> list[str]:
+        """
+        The regulators next to a regulator in the order of the choices.
+
+        :param value: The regulator id
+        :param label_col: The column which orders the choices
+        :param n: The number of regulators on either side
+        :return: The regulator ids, nearest first and alternating after and before.
+            Empty if the regulator is not in the index
+
+        """
+        order = self._order[label_col]
+        positions = np.flatnonzero(self.values[order] == str(value))
+        if len(positions) == 0:
+            return []
+        position = positions[0]
+        neighbors = []
+        for distance in range(1, n + 1):
+            for neighbor in (position + distance, position - distance):
+                if 0 <= neighbor < len(order):
+                    neighbors.append(self.values[order[neighbor]])
+        return neighbors
+
+    def search(
+        self,
+        query: str,
+        label_col: LabelColumn,
+        max_options: int = 1000,
+        conjunction: Literal["and", "or"] = "and",
+    ) -> list[dict[str, str]]:
+        """
+        Find the choices whose label contains the words in `query`, ignoring case.
+
+        :param query: The search string. Words are separated by whitespace
+        :param label_col: The column to use as the label
+        :param max_options: The maximum number of choices to return
+        :param conjunction: Whether a label must contain all ("and") or any ("or") of
+            the words
+        :return: A list of {"value": ..., "label": ...} dictionaries, sorted by label
+
+        """
+        search_labels = self._search_labels[label_col]
+        keywords = [x for x in re.split(r"\s+", query.lower()) if x]
+        if keywords:
+            matches = [
+                search_labels.str.contains(x, regex=False).to_numpy() for x in keywords
+            ]
+            combine = np.logical_and if conjunction == "and" else np.logical_or
+            mask = combine.reduce(matches)
+        else:
+            mask = np.ones(len(self), dtype=bool)
+
+        order = self._order[label_col]
+        positions = order[mask[order]][:max_options]
+        labels = self._labels[label_col]
+        return [
+            {"value": self.values[i], "label": labels[i]} for i in positions.tolist()
+        ]
+
+
+_choice_index_cache: IdentityCache[RegulatorChoiceIndex] = IdentityCache()
+
+
+def get_regulator_choice_index(metadata: pd.DataFrame) -> RegulatorChoiceIndex:
+    """
+    Get the process-wide RegulatorChoiceIndex for a metadata DataFrame. The index is
+    built once per metadata frame, and shared by every session.
+
+    :param metadata: DataFrame with the columns 'regulator_id', 'regulator_symbol' and
+        'regulator_locus_tag'. Must not be mutated
+    :return: The RegulatorChoiceIndex for `metadata`
+
+    """
+    return _choice_index_cache.get(
+        metadata, lambda: RegulatorChoiceIndex.from_metadata(metadata)
+    )
+
+
+def update_regulator_selectize(
+    session: Session,
+    id: str,
+    index: RegulatorChoiceIndex,
+    label_col: LabelColumn,
+    selected: str | list[str] | None = None,
+) -> None:
+    """
+    Update a selectize input to search the choices in `index` on the server.
+
+    This is the equivalent of ``ui.update_selectize(..., server=True)``, except that
+    the search is done by the shared, precomputed index rather than a loop over every
+    choice in every session.
+
+    :param session: The session of the input. In a module, the module's session
+    :param id: The id of the selectize input
+    :param index: The RegulatorChoiceIndex to search
+    :param label_col: The column to use as the label
+    :param selected: The id of the selected regulator. If None, or not in the index,
+        the first choice is selected. For an input which allows multiple selections,
+        a list of ids, which may be empty. Ids which are not in the index are dropped
+
+    """
+    if isinstance(selected, list):
+        selected_values = [x for x in selected if index.label(x, label_col) is not None]
+    else:
+        if selected is None or index.label(selected, label_col) is None:
+            first = index.search("", label_col, max_options=1)
+            selected = first[0]["value"] if first else None
+        selected_values = [selected] if selected is not None else []
+
+    selected_choices = [
+        {"value": value, "label": index.label(value, label_col)}
+        for value in selected_values
+    ]
+
+    def selectize_choices_json(request: Request) -> JSONResponse:
+        # see shiny.ui.update_selectize for the query parameters sent by shiny.js
+        params = request.query_params
+        search_fields = json.loads(params.get("field", '["label"]'))
+        if search_fields and isinstance(search_fields[0], list):
+            search_fields = search_fields[0]
+        if "label" not in search_fields:
+            return JSONResponse(selected_choices, status_code=200)
+
+        choices = [
+            choice
+            for choice in index.search(
+                params.get("query", ""),
+                label_col,
+                max_options=int(params.get("maxop", 1000)),
+                conjunction="or" if params.get("conju", "and") == "or" else "and",
+            )
+            if choice["value"] not in selected_values
+        ]
+        return JSONResponse(choices + selected_choices, status_code=200)
+
+    message = {
+        "url": session.dynamic_route(f"update_selectize_{id}", selectize_choices_json),
+    }
+    if selected_values or isinstance(selected, list):
+        message["value"] = selected_values
+    session.send_input_message(id, message)
@@ -1,30 +1,59 @@
+from collections.abc import Mapping
+
+import numpy as np
 import pandas as pd
 
 from .source_name_lookup import get_source_name_dict
 
 
+def relabel_series(values: pd.Series, mapping: Mapping[str, str]) -> pd.Series:
+    """
+    Replace the values of a Series which are keys in `mapping` with the corresponding
+    value. Other values are unchanged.
+
+    The mapping is applied to the distinct values only. A categorical Series keeps its
+    codes and only its categories are renamed. Any other Series is factorized, and the
+    relabeled distinct values are taken by code.
+
+    :param values: The Series to relabel
+    :param mapping: A dictionary of old value to new value
+    :return: A new Series with the values relabeled
+
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = [mapping.get(x, x) for x in values.cat.categories]
+        # rename_categories requires the new categories to be unique
+        if len(set(categories)) == len(categories):
+            return values.cat.rename_categories(categories)
+
+    codes, uniques = pd.factorize(values)
+    # append a missing value, which is selected by the code -1 of missing values
+    lookup = np.array([mapping.get(x, x) for x in uniques] + [np.nan], dtype=object)
+    dtype = None if isinstance(values.dtype, pd.CategoricalDtype) else values.dtype
+    return pd.Series(lookup[codes], index=values.index, name=values.name, dtype=dtype)
+
+
 def rename_dataframe_data_sources(df: pd.DataFrame) -> pd.DataFrame:
     """
     Rename the data sources in the DataFrame.
 
     :param df: A dataframe that has the columns "binding_source" and/or
         "expression_source" that need to be renamed.
-    :return: A copy of the dataframe with the data sources renamed.
+    :return: A new dataframe with the data sources renamed. The other columns are
+        not copied.
 
     """
-    df_copy = df.copy()
+    renamed = {}
     # Map binding sources to display names
-    if "binding_source" in df_copy.columns:
-        source_name_dict = get_source_name_dict("binding")
-        df_copy["binding_source"] = df_copy["binding_source"].map(
-            lambda x: source_name_dict.get(x, x)
+    if "binding_source" in df.columns:
+        renamed["binding_source"] = relabel_series(
+            df["binding_source"], get_source_name_dict("binding")
         )
 
     # Map expression sources to display names
-    if "expression_source" in df_copy.columns:
-        source_name_dict = get_source_name_dict("perturbation_response")
-        df_copy["expression_source"] = df_copy["expression_source"].map(
-            lambda x: source_name_dict.get(x, x)
+    if "expression_source" in df.columns:
+        renamed["expression_source"] = relabel_series(
+            df["expression_source"], get_source_name_dict("perturbation_response")
         )
 
-    return df_copy
+    return df.assign(**renamed)
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import os
+import pickle
+import random
+import tempfile
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any, Literal
+
+from .disk_cache import DiskCache
+
+logger = logging.getLogger("shiny")
+
+ReplayMode = Literal["record", "replay"]
+
+
+class RecordingAPI:
+    """Wraps a tfbpapi API object, and records the responses of its ``.read()``."""
+
+    def __init__(self, backend: "ReplayBackend", label: str, api: Any):
+        self._backend = backend
+        self._label = label
+        self._api = api
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._api, name)
+
+    async def read(self, retrieve_files: bool = False, **kwargs: Any) -> Any:
+        result = await self._api.read(retrieve_files=retrieve_files, **kwargs)
+        await asyncio.to_thread(
+            self._backend.record,
+            self._label,
+            dict(self._api.params),
+            retrieve_files,
+            result,
+        )
+        return result
+
+
+class ReplayAPI:
+    """Stands in for a tfbpapi API object, and replays the recorded responses of
+    ``.read()``."""
+
+    def __init__(
+        self,
+        backend: "ReplayBackend",
+        label: str,
+        params: dict | None = None,
+        **kwargs: Any,
+    ):
+        self._backend = backend
+        self._label = label
+        self.params = dict(params or {})
+
+    async def read(self, retrieve_files: bool = False, **kwargs: Any) -> Any:
+        return await self._backend.replay(self._label, self.params, retrieve_files)
+
+
+class ReplayBackend:
+    """
+    A local stand-in for the tfbpapi database, so that the app can be run, and its
+    performance measured, without the network.
+
+    In "record" mode, the app uses the real API classes, and the response of every
+    ``.read()`` is saved to `directory`. In "replay" mode, the API classes are
+    replaced by :class:`ReplayAPI`, which returns the saved responses. Each replayed
+    response can be delayed by a fixed latency, plus the time to transfer it at
+    `bandwidth`, and can fail at random with `error_rate`, to reproduce a slow or
+    unreliable backend.
+
+    Responses are matched on the API, the request parameters and `retrieve_files`.
+    A request which was not recorded raises a KeyError.
+
+    """
+
+    suffix = ".pkl"
+
+    def __init__(
+        self,
+        directory: str | Path,
+        mode: ReplayMode = "replay",
+        latency: float = 0.0,
+        bandwidth: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int | None = None,
+        logger: logging.Logger = logger,
+    ):
+        """
+        Initialize the backend.
+
+        :param directory: The directory of the recorded responses. Created if it does
+            not exist
+        :param mode: "record" to save the responses of the real API, or "replay" to
+            serve the saved responses
+        :param latency: The number of seconds added to each replayed response
+        :param bandwidth: The transfer rate of replayed responses, in bytes per
+            second of the pickled response. 0 for no limit
+        :param error_rate: The probability that a replayed request fails with a
+            ConnectionError
+        :param seed: The seed of the random injected errors
+        :param logger: A logger object
+        :raises ValueError: If the mode is not "record" or "replay", latency or
+            bandwidth is negative, or error_rate is not between 0 and 1
+
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError("mode must be 'record' or 'replay'")
+        for name, value in [("latency", latency), ("bandwidth", bandwidth)]:
+            if not isinstance(value, (int, float)) or value < 0:
+                raise ValueError(f"{name} must be a non-negative number")
+        if not isinstance(error_rate, (int, float)) or not 0 <= error_rate <= 1:
+            raise ValueError("error_rate must be between 0 and 1")
+        self.mode = mode
+        self.latency = float(latency)
+        self.bandwidth = float(bandwidth)
+        self.error_rate = float(error_rate)
+        self.logger = logger
+        self.path = Path(directory).expanduser()
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._random = random.Random(seed)
+
+    def _file(self, label: str, params: dict, retrieve_files: bool) -> Path:
+        key = DiskCache.key(label=label, params=params, retrieve_files=retrieve_files)
+        return self.path / f"{label}-{key}{self.suffix}"
+
+    def api_factory(self, label: str, api_class: Callable[..., Any]) -> Callable:
+        """
+        Wrap an API class for the mode of the backend.
+
+        :param label: A string that describes the API, e.g. "binding". Responses are
+            recorded and replayed per label
+        :param api_class: The tfbpapi API class, e.g. ``BindingAPI``. Not called in
+            "replay" mode
+        :return: A callable which takes the arguments of `api_class`, and returns an
+            API object with the ``params`` attribute and ``.read()`` method
+
+        """
+        if self.mode == "record":
+            return lambda **kwargs: RecordingAPI(self, label, api_class(**kwargs))
+        return lambda **kwargs: ReplayAPI(self, label, **kwargs)
+
+    def record(
+        self, label: str, params: dict, retrieve_files: bool, result: Any
+    ) -> None:
+        """
+        Save the response of a request. Replaces an earlier response to the same
+        request.
+
+        :param label: The API label
+        :param params: The request parameters
+        :param retrieve_files: The `retrieve_files` argument of ``.read()``
+        :param result: The response. Must be picklable
+
+        """
+        path = self._file(label, params, retrieve_files)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        self.logger.debug(f"Recorded {label} response for {params} to {path}")
+
+    async def replay(self, label: str, params: dict, retrieve_files: bool) -> Any:
+        """
+        Serve the saved response of a request, after the injected latency and
+        transfer time.
+
+        :param label: The API label
+        :param params: The request parameters
+        :param retrieve_files: The `retrieve_files` argument of ``.read()``
+        :return: The recorded response
+        :raises KeyError: If the request was not recorded
+        :raises ConnectionError: If the request fails at random, see `error_rate`
+
+        """
+        if self.error_rate and self._random.random() < self.error_rate:
+            await asyncio.sleep(self.latency)
+            raise ConnectionError(f"Injected error for {label} request {params}")
+        path = self._file(label, params, retrieve_files)
+        try:
+            payload = await asyncio.to_thread(path.read_bytes)
+        except FileNotFoundError:
+            raise KeyError(f"No {label} response was recorded for {params}")
+        delay = self.latency
+        if self.bandwidth:
+            delay += len(payload) / self.bandwidth
+        await asyncio.sleep(delay)
+        return await asyncio.to_thread(pickle.loads, payload)
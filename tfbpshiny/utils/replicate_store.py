@@ -0,0 +1,547 @@
+import asyncio
+import logging
+import pickle
+from collections import Counter, OrderedDict
+from collections.abc import AsyncIterator, Callable, Iterable
+from dataclasses import dataclass
+from typing import Any
+
+import pandas as pd
+from pandas.errors import EmptyDataError
+
+from .compute_pool import ComputePool
+from .disk_cache import DiskCache
+
+logger = logging.getLogger("shiny")
+
+# the expression conditions of the rank response replicate plots
+EXPRESSION_CONDITIONS = (
+    "expression_source=kemmeren_tfko;expression_source=mcisaac_oe,time=15"
+)
+
+
+def merge_replicate_data(results: Iterable[dict]) -> dict:
+    """
+    Merge the replicate data of several regulators.
+
+    :param results: Responses of ``RankResponseAPI.read(retrieve_files=True)``, with
+        the keys "metadata" and "data". Empty responses are skipped
+    :return: One response with the metadata of every regulator, and the data of every
+        replicate. A single response is returned as is
+
+    """
+    results = [result for result in results if result]
+    if len(results) <= 1:
+        return results[0] if results else {}
+    return {
+        "metadata": pd.concat(
+            [result["metadata"] for result in results], ignore_index=True
+        ),
+        "data": {
+            id: data
+            for result in results
+            for id, data in (result.get("data") or {}).items()
+        },
+    }
+
+
+@dataclass
+class ReplicateFetch:
+    """The requests in progress for one regulator's replicate data."""
+
+    # the key of the regulator's data, see ReplicateStore.key
+    key: str
+    # one task per expression condition, which returns the part of the response, or
+    # None if it is empty. A task fails if its request fails
+    parts: list[asyncio.Task]
+    # the task which merges the parts, and caches the response once all of them
+    # have arrived
+    merged: asyncio.Task
+    # the number of streams and prefetches using the requests. They are cancelled
+    # when there are none left
+    waiters: int = 0
+
+
+class ReplicateStore:
+    """
+    A process-wide store for the rank response replicate data of each regulator, and
+    the plots prepared from it.
+
+    - the responses of ``RankResponseAPI.read(retrieve_files=True)`` are stored in
+      the `replicate_cache` DiskCache. A regulator's data is requested once per
+      expression condition, and the requests of a regulator which is already being
+      retrieved, by a session or a prefetch, are shared rather than sent again
+    - the prepared plots are kept in memory, pickled, up to `max_bytes`. The least
+      recently used are dropped first. Each :meth:`prepare` returns a new copy, so
+      sessions can modify the plots they are given
+    - :meth:`stream` retrieves the data of several regulators concurrently, at most
+      `fetch_concurrency` requests at a time, and yields each part as it arrives
+    - the store counts how often each regulator is selected. :meth:`prefetch`
+      retrieves the data and prepares the plots of likely selections in the
+      background, at most `max_concurrency` at a time, and only while no session is
+      waiting on a fetch
+
+    The counts are per process, so with several workers each worker prefetches the
+    regulators which are popular with its own sessions.
+
+    """
+
+    def __init__(
+        self,
+        api_factory: Callable[..., Any],
+        replicate_cache: DiskCache,
+        compute_pool: ComputePool,
+        prepare_fn: Callable[..., Any],
+        max_concurrency: int = 1,
+        fetch_concurrency: int = 5,
+        popular_regulators: int = 5,
+        neighbors: int = 1,
+        max_bytes: int = 256 * 1024**2,
+        delay: float = 1.0,
+        logger: logging.Logger = logger,
+    ):
+        """
+        Initialize the store.
+
+        :param api_factory: A callable which is passed the request `params` and
+            returns an object with an async ``read(retrieve_files=True)`` method, e.g.
+            the ``RankResponseAPI`` class
+        :param replicate_cache: The DiskCache in which to store the responses
+        :param compute_pool: The ComputePool in which to prepare the plots
+        :param prepare_fn: A picklable function which prepares the plots from a
+            response, e.g. ``create_rank_response_replicate_plots_by_source``
+        :param max_concurrency: The maximum number of regulators prefetched at a time
+        :param fetch_concurrency: The maximum number of requests in progress at a time
+            in each call to :meth:`stream`
+        :param popular_regulators: The number of most frequently selected regulators
+            to prefetch. If 0 (and `neighbors` is 0), nothing is prefetched
+        :param neighbors: The number of regulators on either side of the selected
+            regulator, in the order of the regulator selector, to prefetch
+        :param max_bytes: The maximum total size of the prepared plots kept in memory,
+            in bytes. If 0, prepared plots are not kept
+        :param delay: The number of seconds a prefetch waits before it starts, so that
+            it does not compete with the fetch of the selection which scheduled it
+        :param logger: A logger object
+        :raises ValueError: If max_concurrency or fetch_concurrency is not positive,
+            or any of the other limits is negative
+
+        """
+        for name, value in [
+            ("max_concurrency", max_concurrency),
+            ("fetch_concurrency", fetch_concurrency),
+        ]:
+            if not isinstance(value, int) or value < 1:
+                raise ValueError(f"{name} must be a positive integer")
+        for name, value in [
+            ("popular_regulators", popular_regulators),
+            ("neighbors", neighbors),
+            ("max_bytes", max_bytes),
+        ]:
+            if not isinstance(value, int) or value < 0:
+                raise ValueError(f"{name} must be a non-negative integer")
+
+        self.api_factory = api_factory
+        self.replicate_cache = replicate_cache
+        self.compute_pool = compute_pool
+        self.prepare_fn = prepare_fn
+        self.max_concurrency = max_concurrency
+        self.fetch_concurrency = fetch_concurrency
+        self.popular_regulators = popular_regulators
+        self.neighbors = neighbors
+        self.max_bytes = max_bytes
+        self.delay = delay
+        self.logger = logger
+
+        self._access_counts: Counter[str] = Counter()
+        self._inflight: dict[str, ReplicateFetch] = {}
+        self._prefetching: dict[str, asyncio.Task] = {}
+        self._prepared: OrderedDict[str, bytes] = OrderedDict()
+        self._prepared_bytes = 0
+        # the number of fetches which a session is waiting on. Prefetching waits until
+        # there are none
+        self._foreground = 0
+        self._semaphore: asyncio.Semaphore | None = None
+        self._idle: asyncio.Event | None = None
+
+    @staticmethod
+    def params(regulator: str) -> dict[str, str]:
+        """The RankResponseAPI parameters of a regulator's replicate data."""
+        return {
+            "regulator_id": str(regulator),
+            "expression_conditions": EXPRESSION_CONDITIONS,
+        }
+
+    @staticmethod
+    def dataset_version(metadata: pd.DataFrame, regulator: str) -> list[str]:
+        """
+        The version of a regulator's replicate data, which is the sorted ids of its
+        rank response replicates. Adding or removing a replicate changes the version.
+
+        :param metadata: The rank response metadata, with the columns 'regulator_id'
+            and 'id'
+        :param regulator: The regulator id
+        :return: The sorted replicate ids, as strings
+
+        """
+        replicate_ids = metadata.loc[
+            metadata["regulator_id"].astype(str) == str(regulator), "id"
+        ]
+        return sorted(replicate_ids.astype(str).tolist())
+
+    @staticmethod
+    def condition_replicates(metadata: pd.DataFrame, regulator: str) -> int:
+        """
+        The number of a regulator's replicates in the expression conditions which are
+        retrieved, see `EXPRESSION_CONDITIONS`. A condition on a column which is not
+        in `metadata` is ignored.
+
+        :param metadata: The rank response metadata, with the column 'regulator_id'
+            and, for the conditions, 'expression_source' and 'expression_time'
+        :param regulator: The regulator id
+        :return: The number of replicates
+
+        """
+        rows = metadata[metadata["regulator_id"].astype(str) == str(regulator)]
+        columns = {"time": "expression_time"}
+        in_conditions = pd.Series(False, index=rows.index)
+        for condition in EXPRESSION_CONDITIONS.split(";"):
+            in_condition = pd.Series(True, index=rows.index)
+            for term in condition.split(","):
+                name, value = term.split("=")
+                column = columns.get(name, name)
+                if column not in rows:
+                    continue
+                try:
+                    matches = pd.to_numeric(rows[column], errors="coerce") == float(
+                        value
+                    )
+                except ValueError:
+                    matches = rows[column].astype(str) == value
+                in_condition &= matches
+            in_conditions |= in_condition
+        return int(in_conditions.sum())
+
+    def key(self, regulator: str, dataset_version: list[str]) -> str:
+        """The cache key of a regulator's replicate data and plots."""
+        return self.replicate_cache.key(
+            **self.params(regulator), dataset_version=dataset_version
+        )
+
+    def key_many(self, requests: list[tuple[str, list[str]]]) -> str:
+        """
+        The cache key of the merged data and plots of several regulators.
+
+        :param requests: (regulator, dataset_version) pairs
+        :return: The key. For a single regulator, this is the same as :meth:`key`
+
+        """
+        keys = [self.key(regulator, version) for regulator, version in requests]
+        if len(keys) == 1:
+            return keys[0]
+        return self.replicate_cache.key(keys=keys)
+
+    def record_access(self, regulator: str) -> None:
+        """Count a selection of `regulator`."""
+        self._access_counts[str(regulator)] += 1
+
+    def popular(self, n: int | None = None) -> list[str]:
+        """
+        The most frequently selected regulators.
+
+        :param n: The number of regulators. Defaults to `popular_regulators`
+        :return: The regulator ids, most frequently selected first
+
+        """
+        n = self.popular_regulators if n is None else n
+        return [regulator for regulator, _ in self._access_counts.most_common(n)]
+
+    async def cached(
+        self, regulator: str, dataset_version: list[str], wait: bool = True
+    ) -> dict | None:
+        """
+        Return a regulator's replicate data if it is in the disk cache, or is already
+        being retrieved.
+
+        :param regulator: The regulator id
+        :param dataset_version: The version returned by :meth:`dataset_version`
+        :param wait: Whether to wait for data which is being retrieved. If False, it
+            is treated as not retrieved
+        :return: The response of ``read(retrieve_files=True)``, or None if it has not
+            been retrieved
+
+        """
+        key = self.key(regulator, dataset_version)
+        fetch = self._inflight.get(key)
+        if fetch is not None:
+            return await self._join(fetch) if wait else None
+        return await asyncio.to_thread(self.replicate_cache.get, key)
+
+    async def _read_part(
+        self, regulator: str, condition: str, semaphore: asyncio.Semaphore
+    ) -> dict | None:
+        async with semaphore:
+            params = {**self.params(regulator), "expression_conditions": condition}
+            api = self.api_factory(params=params)
+            self.logger.info(
+                f"Fetching data from RankResponseAPI with params: {api.params}"
+            )
+            try:
+                return await api.read(retrieve_files=True)
+            except EmptyDataError as exc:
+                self.logger.error(
+                    f"Failed to fetch data for regulator {regulator}: {exc}"
+                )
+                return None
+            except Exception as exc:
+                self.logger.error(
+                    f"Failed to fetch data for regulator {regulator} and expression "
+                    f"conditions {condition}: {exc}"
+                )
+                raise
+
+    async def _merge_parts(self, key: str, parts: list[asyncio.Task]) -> dict:
+        try:
+            results = await asyncio.gather(*parts)
+            merged = merge_replicate_data(results)
+            if None not in results:
+                # every part arrived, so the regulator is cached as one response
+                await asyncio.to_thread(self.replicate_cache.set, key, merged)
+            return merged
+        finally:
+            fetch = self._inflight.get(key)
+            if fetch is not None and fetch.merged is asyncio.current_task():
+                del self._inflight[key]
+
+    def _start(
+        self, regulator: str, key: str, semaphore: asyncio.Semaphore
+    ) -> ReplicateFetch:
+        """Request a regulator's data, unless it is already being retrieved."""
+        fetch = self._inflight.get(key)
+        if fetch is None:
+            parts = [
+                asyncio.create_task(self._read_part(regulator, condition, semaphore))
+                for condition in EXPRESSION_CONDITIONS.split(";")
+            ]
+            fetch = ReplicateFetch(
+                key, parts, asyncio.create_task(self._merge_parts(key, parts))
+            )
+            # the errors are logged by _read_part, and need not be retrieved by
+            # every stream or prefetch
+            for task in [*parts, fetch.merged]:
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = fetch
+        return fetch
+
+    def _release(self, fetch: ReplicateFetch) -> None:
+        fetch.waiters -= 1
+        if fetch.waiters == 0 and not all(part.done() for part in fetch.parts):
+            # nothing is waiting on the requests any more, e.g. the session which
+            # started them changed its selection. Once every part has arrived, the
+            # response is left to be cached
+            fetch.merged.cancel()
+            # the requests are cancelled, so they are not shared with the next stream
+            if self._inflight.get(fetch.key) is fetch:
+                del self._inflight[fetch.key]
+
+    async def _join(self, fetch: ReplicateFetch) -> dict | None:
+        fetch.waiters += 1
+        try:
+            # shield so that a cancelled waiter does not cancel the shared requests
+            return await asyncio.shield(fetch.merged)
+        except asyncio.CancelledError:
+            if not fetch.merged.cancelled():
+                raise
+            return None
+        finally:
+            self._release(fetch)
+
+    async def stream(
+        self, requests: list[tuple[str, list[str]]]
+    ) -> AsyncIterator[dict]:
+        """
+        Retrieve the replicate data of several regulators, and yield it in parts as
+        each part arrives.
+
+        The data of a regulator which is cached is yielded first, in one part. The
+        other regulators are requested once per expression condition, at most
+        `fetch_concurrency` requests at a time, so the replicates of the first
+        condition to arrive can be shown while the others are still being
+        retrieved. A regulator which is already being retrieved, by another session
+        or a prefetch, is not requested again, and its parts are yielded as they
+        arrive. Once every part of a regulator has arrived, its merged response is
+        cached.
+
+        :param requests: (regulator, dataset_version) pairs, see
+            :meth:`dataset_version`
+        :return: An async iterator of responses, each with the keys "metadata" and
+            "data". Parts which are empty, or whose request fails, are left out, so
+            the other regulators are still shown when one of them fails
+
+        """
+        keys = [self.key(*request) for request in requests]
+        unclaimed = [key for key in keys if key not in self._inflight]
+        cached = await asyncio.gather(
+            *[asyncio.to_thread(self.replicate_cache.get, key) for key in unclaimed]
+        )
+        stored = dict(zip(unclaimed, cached))
+
+        semaphore = asyncio.Semaphore(self.fetch_concurrency)
+        fetches = []
+        for (regulator, _), key in zip(requests, keys):
+            if stored.get(key) is None:
+                fetch = self._start(regulator, key, semaphore)
+                fetch.waiters += 1
+                fetches.append(fetch)
+        self._foreground += 1
+        self._get_idle().clear()
+        try:
+            for result in stored.values():
+                if result:
+                    yield result
+            parts = [asyncio.shield(part) for fetch in fetches for part in fetch.parts]
+            for next_part in asyncio.as_completed(parts):
+                try:
+                    part = await next_part
+                except Exception:
+                    # logged by _read_part. The response is not cached
+                    continue
+                # an expression condition may have no replicates
+                if part and len(part["metadata"]):
+                    yield part
+        finally:
+            for fetch in fetches:
+                self._release(fetch)
+            self._foreground -= 1
+            if self._foreground == 0:
+                self._get_idle().set()
+
+    async def prepare_part(self, rr_dict: dict, *args: Any) -> Any:
+        """
+        Prepare the plots of part of a response, without keeping them. See
+        :meth:`keep_prepared`.
+
+        :param rr_dict: A part yielded by :meth:`stream`
+        :param args: Additional arguments for `prepare_fn`
+        :return: The return value of `prepare_fn`
+
+        """
+        return await self.compute_pool.run(self.prepare_fn, rr_dict, *args)
+
+    async def keep_prepared(self, key: str, prepared: Any) -> None:
+        """
+        Keep prepared plots in memory, e.g. once every part of a response has been
+        prepared, so that :meth:`prepare` returns them.
+
+        :param key: The key returned by :meth:`key` or :meth:`key_many`
+        :param prepared: The plots
+
+        """
+        if self.max_bytes > 0:
+            payload = await asyncio.to_thread(
+                pickle.dumps, prepared, pickle.HIGHEST_PROTOCOL
+            )
+            self._store_prepared(key, payload)
+
+    async def prepare(self, key: str, rr_dict: dict) -> Any:
+        """
+        Return the plots prepared from a regulator's replicate data, from memory if
+        possible.
+
+        :param key: The key returned by :meth:`key`
+        :param rr_dict: The response of :meth:`cached`, or the merged parts of
+            :meth:`stream`
+        :return: The return value of `prepare_fn`. A new copy is returned each time
+
+        """
+        if key in self._prepared:
+            self._prepared.move_to_end(key)
+            return await asyncio.to_thread(pickle.loads, self._prepared[key])
+
+        prepared = await self.compute_pool.run(self.prepare_fn, rr_dict)
+        await self.keep_prepared(key, prepared)
+        return prepared
+
+    def _store_prepared(self, key: str, payload: bytes) -> None:
+        if len(payload) > self.max_bytes:
+            self.logger.debug(
+                f"Not keeping prepared plots of {len(payload)} bytes in memory"
+            )
+            return
+        if key in self._prepared:
+            self._prepared_bytes -= len(self._prepared.pop(key))
+        self._prepared[key] = payload
+        self._prepared_bytes += len(payload)
+        while self._prepared_bytes > self.max_bytes:
+            _, evicted = self._prepared.popitem(last=False)
+            self._prepared_bytes -= len(evicted)
+
+    def is_prepared(self, key: str) -> bool:
+        """Whether the plots for `key` are in memory."""
+        return key in self._prepared
+
+    @property
+    def prepared_bytes(self) -> int:
+        """The total size of the prepared plots in memory, in bytes."""
+        return self._prepared_bytes
+
+    def _get_idle(self) -> asyncio.Event:
+        # created on first use, in the event loop which serves the sessions
+        if self._idle is None:
+            self._idle = asyncio.Event()
+            self._idle.set()
+        return self._idle
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _prefetch(
+        self, regulator: str, dataset_version: list[str], key: str
+    ) -> None:
+        try:
+            await asyncio.sleep(self.delay)
+            async with self._get_semaphore():
+                await self._get_idle().wait()
+                if self.is_prepared(key):
+                    return
+                rr_dict = await self.cached(regulator, dataset_version)
+                if rr_dict is None:
+                    semaphore = asyncio.Semaphore(self.fetch_concurrency)
+                    rr_dict = await self._join(self._start(regulator, key, semaphore))
+                if rr_dict:
+                    await self.prepare(key, rr_dict)
+                self.logger.debug(f"Prefetched rank response data for {regulator}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            self.logger.warning(f"Failed to prefetch regulator {regulator}: {exc}")
+        finally:
+            self._prefetching.pop(key, None)
+
+    def prefetch(self, regulators: Iterable[str], metadata: pd.DataFrame) -> None:
+        """
+        Retrieve the data and prepare the plots of `regulators` in the background.
+        Regulators which are already prepared, or being prefetched, are skipped. Must
+        be called from the event loop.
+
+        :param regulators: The regulator ids, most likely to be selected first
+        :param metadata: The rank response metadata, used for the dataset version of
+            each regulator
+
+        """
+        for regulator in dict.fromkeys(str(x) for x in regulators):
+            dataset_version = self.dataset_version(metadata, regulator)
+            if not dataset_version:
+                continue
+            key = self.key(regulator, dataset_version)
+            if self.is_prepared(key) or key in self._prefetching:
+                continue
+            self._prefetching[key] = asyncio.create_task(
+                self._prefetch(regulator, dataset_version, key)
+            )
+
+    async def drain(self) -> None:
+        """Wait for the scheduled prefetches to finish."""
+        while self._prefetching:
+            await asyncio.gather(*self._prefetching.values(), return_exceptions=True)
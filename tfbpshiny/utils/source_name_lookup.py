@@ -1,5 +1,6 @@
 import logging
 from enum import Enum
+from functools import lru_cache
 from typing import Literal
 
 logger = logging.getLogger("shiny")
@@ -17,6 +18,7 @@ class PerturbationSource(str, Enum):
     hu_reimann_tfko = "2007 TFKO"
 
 
+@lru_cache(maxsize=None)
 def get_source_name_dict(
     datatype: Literal["binding", "perturbation_response"] | None = None,
     reverse: bool = False,
@@ -27,7 +29,8 @@ def get_source_name_dict(
 
     This function provides a consistent dictionary mapping for source names,
     derived from enum classes. It supports filtering by datatype and reversing the
-    direction of the mapping.
+    direction of the mapping. The dictionaries are built once and shared, so they
+    must not be modified.
 
     :param datatype: Optional; one of "binding", "perturbation_response", or None.
         If provided, limits the dictionary to that specific datatype.
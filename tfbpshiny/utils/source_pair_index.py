@@ -0,0 +1,127 @@
+from collections import OrderedDict
+from collections.abc import Iterable
+
+import numpy as np
+import pandas as pd
+
+from .identity_cache import IdentityCache
+
+
+class SourcePairIndex:
+    """
+    An index of the rows of the rank response metadata by (binding_source,
+    expression_source) pair.
+
+    For each pair, the index stores the positions of its rows and which regulators it
+    has. Filtering the metadata to a selection of sources, optionally keeping only the
+    regulators which are present in every selected pair, is then a lookup rather than a
+    scan of the whole frame. Filtered frames are memoized on the sorted selection, and
+    the index is shared by every session (see `get_source_pair_index`), so the filtered
+    frames are shared too and must be treated as read only.
+
+    """
+
+    def __init__(
+        self,
+        metadata: pd.DataFrame,
+        regulator_col: str = "regulator_symbol",
+        max_selections: int = 64,
+    ):
+        """
+        Initialize the index.
+
+        :param metadata: DataFrame with (at least) the columns 'binding_source',
+            'expression_source' and `regulator_col`. Must not be mutated
+        :param regulator_col: The column which identifies the regulator
+        :param max_selections: The maximum number of filtered frames to memoize
+
+        """
+        self.metadata = metadata
+        self.max_selections = max_selections
+
+        # missing regulators are their own category, as they are with set()
+        self._regulator_codes, regulators = pd.factorize(
+            metadata[regulator_col], use_na_sentinel=False
+        )
+        groups = metadata.groupby(
+            ["binding_source", "expression_source"], sort=False
+        ).indices
+        self.pairs: list[tuple[str, str]] = list(groups)
+        self._positions: dict[tuple[str, str], np.ndarray] = dict(groups)
+        self._membership: dict[tuple[str, str], np.ndarray] = {}
+        for pair, positions in self._positions.items():
+            mask = np.zeros(len(regulators), dtype=bool)
+            mask[self._regulator_codes[positions]] = True
+            self._membership[pair] = mask
+
+        self._filtered: OrderedDict[tuple, pd.DataFrame] = OrderedDict()
+
+    def _positions_for(
+        self,
+        binding_sources: Iterable[str],
+        expression_sources: Iterable[str],
+        only_shared_regulators: bool,
+    ) -> np.ndarray:
+        binding_sources = set(binding_sources)
+        expression_sources = set(expression_sources)
+        selected = [
+            pair
+            for pair in self.pairs
+            if pair[0] in binding_sources and pair[1] in expression_sources
+        ]
+        if not selected:
+            return np.array([], dtype=np.intp)
+
+        positions = np.sort(np.concatenate([self._positions[p] for p in selected]))
+        if only_shared_regulators:
+            shared = np.logical_and.reduce([self._membership[p] for p in selected])
+            positions = positions[shared[self._regulator_codes[positions]]]
+        return positions
+
+    def filter(
+        self,
+        binding_sources: Iterable[str],
+        expression_sources: Iterable[str],
+        only_shared_regulators: bool = False,
+    ) -> pd.DataFrame:
+        """
+        Filter the metadata to the selected sources.
+
+        :param binding_sources: The binding sources to keep
+        :param expression_sources: The expression sources to keep
+        :param only_shared_regulators: If True, keep only the regulators which are
+            present in every (binding_source, expression_source) pair in the selection
+        :return: The rows of the metadata which match the selection, in their original
+            order. The frame is shared and must not be mutated
+
+        """
+        key = (
+            tuple(sorted(binding_sources)),
+            tuple(sorted(expression_sources)),
+            bool(only_shared_regulators),
+        )
+        if key in self._filtered:
+            self._filtered.move_to_end(key)
+            return self._filtered[key]
+
+        result = self.metadata.iloc[self._positions_for(*key)]
+        self._filtered[key] = result
+        if len(self._filtered) > self.max_selections:
+            self._filtered.popitem(last=False)
+        return result
+
+
+_pair_index_cache: IdentityCache[SourcePairIndex] = IdentityCache()
+
+
+def get_source_pair_index(metadata: pd.DataFrame) -> SourcePairIndex:
+    """
+    Get the process-wide SourcePairIndex for a metadata DataFrame. The index is built
+    once per metadata frame, and shared by every session.
+
+    :param metadata: DataFrame with the columns 'binding_source', 'expression_source'
+        and 'regulator_symbol'. Must not be mutated
+    :return: The SourcePairIndex for `metadata`
+
+    """
+    return _pair_index_cache.get(metadata, lambda: SourcePairIndex(metadata))
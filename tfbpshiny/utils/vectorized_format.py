@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+
+def _format_numeric(
+    values: pd.Series, format_numbers, allow_inf: bool = True
+) -> pd.Series:
+    """
+    Apply `format_numbers` to the numeric values of a Series in one pass. Other values
+    (NaN, values which cannot be converted to a number and, unless `allow_inf`, inf)
+    are returned as is.
+    """
+    numeric = pd.to_numeric(values, errors="coerce").to_numpy(
+        dtype=float, na_value=np.nan
+    )
+    mask = ~np.isnan(numeric) if allow_inf else np.isfinite(numeric)
+    result = values.astype(object).to_numpy(copy=True)
+    if mask.any():
+        result[mask] = format_numbers(numeric[mask])
+    return pd.Series(result, index=values.index, name=values.name, dtype=object)
+
+
+def format_sci_notation(values: pd.Series) -> pd.Series:
+    """
+    Format a Series of numbers in scientific notation with 2 decimal places. This is
+    the vectorized equivalent of `safe_sci_notation`.
+
+    :param values: The Series to format
+    :return: A Series of strings. Values which are NaN or cannot be converted to a
+        float are returned as is
+
+    """
+    return _format_numeric(values, lambda x: np.char.mod("%.2e", x))
+
+
+def format_percentage(values: pd.Series) -> pd.Series:
+    """
+    Format a Series of fractions as percentages with no decimal places, e.g. 0.125 as
+    "12%".
+
+    :param values: The Series to format
+    :return: A Series of strings. Values which are NaN or cannot be converted to a
+        float are returned as is
+
+    """
+    # np.round rounds half to even, as does the builtin round()
+    return _format_numeric(
+        values,
+        lambda x: np.char.add(np.round(x * 100).astype(np.int64).astype(str), "%"),
+        allow_inf=False,
+    )